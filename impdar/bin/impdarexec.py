@@ -151,7 +151,7 @@ def _get_args():
                                 help='File(s) to convert')
     parser_convert.add_argument('out_fmt',
                                 type=str,
-                                choices=['shp', 'mat', 'segy'])
+                                choices=['shp', 'mat', 'segy', 'parquet'])
     parser_convert.add_argument('-in_fmt',
                                 type=str,
                                 default=None,
@@ -159,6 +159,8 @@ def _get_args():
                                 help='Input format type. If none, guess from extension, but  be warned, we are bad at guessing!')
     parser_convert.add_argument('-t_srs', type=str, default=None,
                                 help='Target srs, in a format recognized by gdal. Default None (write raw input)')
+    parser_convert.add_argument('-survey_fn', type=str, default=None,
+                                help='With shp output, write all the files as one layer in this .shp or .gpkg')
     return parser
 
 
@@ -6,22 +6,29 @@
 #
 # Distributed under terms of the GNU GPL3.0 license.
 
-"""An executable to start the picker."""
+"""An executable to start the picker, or to pick layers from seed points."""
 
+import os
 import sys
 import argparse
-from PyQt5 import QtWidgets
+try:
+    from PyQt5 import QtWidgets
+    from impdar.gui import pickgui
+    QT = True
+except ImportError:
+    QT = False
 
 from matplotlib import rc
 
-from impdar.gui import pickgui
-from impdar.lib import load, Picks
+from impdar.lib import load, Picks, picklib
 
 rc('text', usetex=False)
 
 
 def pick(radardata, xd=False, yd=False):
     """Fire up the picker."""
+    if not QT:
+        raise ImportError('Need PyQt5 for interactive picking')
     if xd:
         x = 'dist'
     else:
@@ -40,11 +47,63 @@ def pick(radardata, xd=False, yd=False):
     sys.exit(app.exec_())
 
 
+def auto_pick(fns, seed_fn, o=None, freq=None, pol=None, jobs=1, extend=True):
+    """Track layers from the seeds in a csv through some files and save them.
+
+    Parameters
+    ----------
+    fns: list of str
+        The ImpDAR .mat files to pick
+    seed_fn: str
+        csv of seed points. See `impdar.lib.picklib.load_seeds`.
+    o: str, optional
+        Output to this file (folder if multiple inputs). Default is to
+        append _pick to the input names.
+    freq: float, optional
+        Frequency of the layers (MHz). Default is what is in the files.
+    pol: int, optional
+        Polarity of the layers (1 or -1). Default is what is in the files.
+    jobs: int, optional
+        Number of processes to use. Default 1.
+    extend: bool, optional
+        Follow layers past the first and last seeds. Default True.
+    """
+    seeds = picklib.load_seeds(seed_fn)
+    radar_data = load.load('mat', fns)
+    file_seeds = []
+    for dat, fn in zip(radar_data, fns):
+        if dat.picks is None:
+            dat.picks = Picks.Picks(dat)
+        if freq is not None:
+            dat.picks.pickparams.freq_update(freq)
+        if pol is not None:
+            dat.picks.pickparams.pol = pol
+        dat_seeds = dict(seeds.get(None, {}))
+        dat_seeds.update(seeds.get(os.path.basename(fn), {}))
+        file_seeds.append(dat_seeds)
+    picklib.auto_pick(radar_data, file_seeds, extend=extend, jobs=jobs)
+
+    for dat, fn in zip(radar_data, fns):
+        if o is None:
+            out_fn = os.path.splitext(fn)[0] + '_pick.mat'
+        elif len(fns) > 1:
+            out_fn = os.path.join(o, os.path.split(os.path.splitext(fn)[0])[1] + '_pick.mat')
+        else:
+            out_fn = o
+        dat.save(out_fn)
+
+
 def main():
     """Get arguments, start picking."""
     parser = _get_args()
     args = parser.parse_args(sys.argv[1:])
-    radardata = load.load('mat', [args.fn])[0]
+    if args.auto is not None:
+        auto_pick(args.fn, args.auto, o=args.o, freq=args.freq, pol=args.pol,
+                  jobs=args.jobs, extend=not args.no_extend)
+        return
+    if len(args.fn) > 1:
+        parser.error('Only one file at a time for interactive picking')
+    radardata = load.load('mat', args.fn)[0]
     pick(radardata, xd=args.xd, yd=args.yd)
 
 
@@ -53,9 +112,26 @@ def _get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('fn',
                         type=str,
-                        help='The file to pick. One file at a time.')
+                        nargs='+',
+                        help='The file to pick. One file at a time, unless using --auto.')
     parser.add_argument('-xd', action='store_true', help='Distance on the x')
     parser.add_argument('-yd', action='store_true', help='Depth on the y')
+    parser.add_argument('--auto',
+                        type=str,
+                        default=None,
+                        help='Pick without the gui, from the seeds in this csv \
+                        (columns pick, tnum, snum, and optionally fn)')
+    parser.add_argument('-o',
+                        type=str,
+                        help='With --auto, output to this file (folder if multiple inputs)')
+    parser.add_argument('-freq', type=float, default=None,
+                        help='With --auto, frequency of the layers (MHz)')
+    parser.add_argument('-pol', type=int, default=None, choices=[1, -1],
+                        help='With --auto, polarity of the layers')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='With --auto, number of processes to use')
+    parser.add_argument('--no_extend', action='store_true',
+                        help='With --auto, only pick between the first and last seeds')
     return parser
 
 
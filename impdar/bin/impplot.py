@@ -10,6 +10,7 @@
 
 import sys
 import argparse
+import matplotlib.pyplot as plt
 from impdar.lib import plot
 from impdar.lib.load import FILETYPE_OPTIONS
 
@@ -126,6 +127,10 @@ def _add_def_args(parser, xd=False, yd=False, other_ftypes=True):
                         type=int,
                         default=300,
                         help='Save file with this resolution (default 300)')
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=1,
+                        help='When saving, plot this many files at once (default 1)')
 
     if xd:
         parser.add_argument('-xd',
@@ -145,33 +150,33 @@ def _add_def_args(parser, xd=False, yd=False, other_ftypes=True):
 
 def plot_radargram(fns=None, s=False, o=None, xd=False, yd=False, o_fmt='png',
                    dpi=300, in_fmt='mat', picks=False, clims=None, cmap='gray',
-                   flatten_layer=None, **kwargs):
+                   flatten_layer=None, jobs=1, **kwargs):
     """Plot data as a radio echogram."""
     plot.plot(fns, xd=xd, yd=yd, s=s, o=o, ftype=o_fmt, dpi=dpi,
               filetype=in_fmt, pick_colors=picks, cmap=cmap, clims=clims,
-              flatten_layer=flatten_layer)
+              flatten_layer=flatten_layer, jobs=jobs)
 
 
 def plot_ft(fns=None, s=False, o=None, xd=False, yd=False, o_fmt='png',
-            dpi=300, in_fmt='mat', **kwargs):
+            dpi=300, in_fmt='mat', jobs=1, **kwargs):
     """
     Plot the fourier spectrum of the data.
 
     Can be useful if you have mystery data of unknown frequency.
     """
     plot.plot(fns, xd=xd, yd=yd, s=s, o=o, ftype=o_fmt, dpi=dpi,
-              filetype=in_fmt, ft=True)
+              filetype=in_fmt, ft=True, jobs=jobs)
 
 
 def plot_hft(fns=None, s=False, o=None, xd=False, yd=False, o_fmt='png',
-             dpi=300, in_fmt='mat', **kwargs):
+             dpi=300, in_fmt='mat', jobs=1, **kwargs):
     """
     Plot the fourier spectrum of the data in the horizontal.
 
     Might be useful for guessing how to horizontally filter.
     """
     plot.plot(fns, xd=xd, yd=yd, s=s, o=o, ftype=o_fmt, dpi=dpi,
-              filetype=in_fmt, hft=True)
+              filetype=in_fmt, hft=True, jobs=jobs)
 
 
 def plot_power(fns=None, layer=None, s=False, o=None, o_fmt='png',
@@ -182,15 +187,15 @@ def plot_power(fns=None, layer=None, s=False, o=None, o_fmt='png',
 
 
 def plot_traces(fns=None, t_start=None, t_end=None, yd=False, s=False, o=None,
-                o_fmt='png', dpi=300, in_fmt='mat', **kwargs):
+                o_fmt='png', dpi=300, in_fmt='mat', jobs=1, **kwargs):
     """Plot traces in terms of amplitude vs some vertical variable."""
     plot.plot(fns, tr=(t_start, t_end), yd=yd, s=s, o=o, ftype=o_fmt, dpi=dpi,
-              filetype=in_fmt)
+              filetype=in_fmt, jobs=jobs)
 
 
 def plot_spectrogram(fns=None, freq_lower=None, freq_upper=None, window=None,
                      scaling='spectrum', yd=False, s=False, o=None,
-                     o_fmt='png', dpi=300, in_fmt='mat', **kwargs):
+                     o_fmt='png', dpi=300, in_fmt='mat', jobs=1, **kwargs):
     """Plot a spectrogram."""
     plot.plot(fns,
               spectra=(freq_lower, freq_upper),
@@ -201,7 +206,8 @@ def plot_spectrogram(fns=None, freq_lower=None, freq_upper=None, window=None,
               o=o,
               ftype=o_fmt,
               dpi=dpi,
-              filetype=in_fmt)
+              filetype=in_fmt,
+              jobs=jobs)
 
 
 def main():
@@ -211,6 +217,9 @@ def main():
     if not hasattr(args, 'func'):
         parser.parse_args(['-h'])
         return
+    if args.s:
+        # Nothing is shown, so do not bother with a gui backend
+        plt.switch_backend('Agg')
     args.func(**vars(args))
 
 
@@ -265,6 +265,11 @@ def _get_args():
     parser_geolocate.add_argument('--guess',
                                   action='store_true',
                                   help='Guess at offset')
+    parser_geolocate.add_argument('--jobs',
+                                  type=int,
+                                  default=1,
+                                  help='Number of processes to use when \
+                                        guessing offsets for several files')
     _add_def_args(parser_geolocate)
 
     # Denoise
@@ -381,6 +386,9 @@ def main():
         args.fns = [bn + '.mat']
     elif args.name == 'interp':
         interp(radar_data, **vars(args))
+    elif args.name == 'geolocate':
+        # all at once, so offsets can be guessed in parallel
+        geolocate(radar_data, **vars(args))
     else:
         for dat in radar_data:
             args.func(dat, **vars(args))
@@ -482,13 +490,14 @@ def interp(dats, spacing, gps_fn, offset=0.0, minmove=1.0e-2,
                extrapolate=extrapolate)
 
 
-def geolocate(dats, gps_fn, extrapolate=False, guess=False, **kwargs):
+def geolocate(dats, gps_fn, extrapolate=False, guess=False, jobs=1, **kwargs):
     """Attach precision gps, with option to constant space."""
     interpdeep(dats,
                spacing=None,
                fn=gps_fn,
                extrapolate=extrapolate,
-               guess_offset=guess)
+               guess_offset=guess,
+               jobs=jobs)
 
 
 def denoise(dat, vert_win=1, hor_dim=10, noise=None, ftype='wiener', **kwargs):
@@ -15,7 +15,7 @@ from PyQt5.QtWidgets import QFileDialog, QMessageBox, QDialog
 
 from .ui import RawPickGUI
 from ..lib import RadarData, picklib
-from ..lib.plot import plot_radargram, get_offset
+from ..lib.plot import plot_radargram, get_offset, get_pyramid
 
 SYMBOLS_FOR_CPS = ['o', 'd', 's']
 
@@ -84,6 +84,8 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
         self.tline = []
         #: That matplotlib line objects for bottom picks, retained in this way for select mode
         self.bline = []
+        # The y values of the lines of each pick, so we can update just part of them
+        self._line_buffers = {}
 
         # pick_pts contains our picked points,
         # which may differ from what we want to save in the file.
@@ -102,6 +104,11 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
         if self.dat.picks is not None and self.dat.picks.samp1 is not None:
             self.pick_pts = [p[~np.isnan(p)].tolist() for p in self.dat.picks.samp1]
 
+        #: Decimated copies of the data, so that we only draw as many traces as fit on screen.
+        #: The data are as they are on disk, so these can be cached.
+        self.pyramid = get_pyramid(self.dat, flatten_layer=flatten_layer, cache=True)
+        #: Whether the data have been processed since they were loaded
+        self._processed = False
         (self.im, self.xd, self.yd,
          self.x_range, self.lims) = plot_radargram(self.dat,
                                                    xdat=xdat,
@@ -111,7 +118,8 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                                                    fig=self.fig,
                                                    ax=self.ax,
                                                    flatten_layer=flatten_layer,
-                                                   return_plotinfo=True)
+                                                   return_plotinfo=True,
+                                                   pyramid=self.pyramid)
 
         # Store some info that we need for later
         self.y = ydat
@@ -138,6 +146,14 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                 self.pickNumberBox.setValue(self.dat.picks.picknums[i])
                 self.update_lines(colors=colors, picker=5)
 
+        # The figure without the current pick, saved after each draw for blitting
+        self._background = None
+        self._set_animated_pick(self._pick_ind)
+        # Zooming swaps the image for one at the right resolution, not the other way around
+        self.ax.set_autoscale_on(False)
+        self.xlid = self.ax.callbacks.connect('xlim_changed', self._update_view)
+        self.drid = self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
         self.kpid = self.fig.canvas.mpl_connect('key_press_event', self._press)
         self.krid = self.fig.canvas.mpl_connect('key_release_event', self._release)
         self.bpid = self.fig.canvas.mpl_connect('pick_event', self._click)
@@ -266,6 +282,10 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
         """
         tnum = np.argmin(np.abs(self.xd - event.xdata))
         snum = np.argmin(np.abs(self.yd - event.ydata)) - self.offset[tnum]
+        # If there is no line yet, we need to redraw everything, not just blit
+        new_line = len(self._current_lines()) == 0
+        # The traces that the click changes
+        trace_range = (0, 0)
         if len(self.cline) == 0:
             self._add_pick(snum=snum, tnum=tnum)
         else:
@@ -273,13 +293,20 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                 if self._n_pressed:
                     self._add_nanpick(snum, tnum)
                 else:
+                    last_tnum = self.dat.picks.lasttrace.tnum[self._pick_ind]
+                    trace_range = (min(last_tnum, tnum), max(last_tnum, tnum) + 1)
                     self._add_point_pick(snum, tnum)
             elif event.button == 3:
                 self._delete_picks(snum, tnum)
+                trace_range = (tnum, None)
 
-        self.update_lines()
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        self.update_lines(trace_range=trace_range)
+        if new_line:
+            self._set_animated_pick(self._pick_ind)
+            self.fig.canvas.draw()
+            self.fig.canvas.flush_events()
+        else:
+            self._blit_lines()
         self._saved = False
 
     def _add_point_pick(self, snum, tnum):
@@ -307,9 +334,12 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
     def _delete_picks(self, snum, tnum):
         self.current_pick[:, tnum:] = np.nan
 
-    def update_lines(self, colors='gmm', picker=None):
+    def update_lines(self, colors='gmm', picker=None, trace_range=(0, None)):
         """Update the plotting of the current pick.
 
+        The display values of each pick are kept, so only the traces that
+        changed need to be redone.
+
         Parameters
         ----------
         colors: str
@@ -317,28 +347,34 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
         picker:
             argument to pass to plot of cline (if new) for selection tolerance
             (use if plotting in select mode)
+        trace_range: 2-tuple, optional
+            The traces (start, end) of the current pick that changed.
+            Default is all of them (0, None).
         """
-        c = np.zeros(self.xd.shape)
-        c[:] = np.nan
-        comb_mask = np.logical_and(~self.offset_mask, ~np.isnan(self.current_pick[1, :]))
-        c[comb_mask] = self.yd[(self.current_pick[1, :] + self.offset)[comb_mask].astype(int)]
-        t = np.zeros(self.xd.shape)
-        t[:] = np.nan
-        comb_mask = np.logical_and(~self.offset_mask, ~np.isnan(self.current_pick[0, :]))
-        t[comb_mask] = self.yd[(self.current_pick[0, :] + self.offset)[comb_mask].astype(int)]
-        b = np.zeros(self.xd.shape)
-        b[:] = np.nan
-        comb_mask = np.logical_and(~self.offset_mask, ~np.isnan(self.current_pick[2, :]))
-        b[comb_mask] = self.yd[(self.current_pick[2, :] + self.offset)[comb_mask].astype(int)]
+        if self.cline[self._pick_ind] is None or self._pick_ind not in self._line_buffers:
+            # A new line, so we need all of it
+            trace_range = (0, None)
+            self._line_buffers[self._pick_ind] = np.zeros((3, len(self.xd)))
+            self._line_buffers[self._pick_ind][:, :] = np.nan
+        # Display y values of the top, center, and bottom of the pick
+        lines = self._line_buffers[self._pick_ind]
+        start = trace_range[0]
+        end = lines.shape[1] if trace_range[1] is None else trace_range[1]
+        if end > start:
+            rows = self.current_pick[:3, start:end] + self.offset[start:end]
+            comb_mask = np.logical_and(~self.offset_mask[start:end], ~np.isnan(rows))
+            lines[:, start:end] = np.nan
+            lines[:, start:end][comb_mask] = self.yd[rows[comb_mask].astype(int)]
+
         if self.cline[self._pick_ind] is None:
-            self.cline[self._pick_ind], = self.ax.plot(self.xd, c, color=colors[0], picker=picker)
-            self.tline[self._pick_ind], = self.ax.plot(self.xd, t, color=colors[1])
-            self.bline[self._pick_ind], = self.ax.plot(self.xd, b, color=colors[2])
-        else:
-            # This is a little complicated to avoid plotting NaN regions
-            self.cline[self._pick_ind].set_data(self.xd, c)
-            self.tline[self._pick_ind].set_data(self.xd, t)
-            self.bline[self._pick_ind].set_data(self.xd, b)
+            self.cline[self._pick_ind], = self.ax.plot(self.xd, lines[1], color=colors[0], picker=picker)
+            self.tline[self._pick_ind], = self.ax.plot(self.xd, lines[0], color=colors[1])
+            self.bline[self._pick_ind], = self.ax.plot(self.xd, lines[2], color=colors[2])
+        elif end > start:
+            # NaNs leave gaps in the lines where there is no pick
+            self.cline[self._pick_ind].set_ydata(lines[1])
+            self.tline[self._pick_ind].set_ydata(lines[0])
+            self.bline[self._pick_ind].set_ydata(lines[2])
 
     def _select_lines_click(self, event):
         thisline = event.artist
@@ -361,9 +397,57 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                                        self.dat.picks.time[self._pick_ind, :],
                                        self.dat.picks.power[self._pick_ind, :]))
 
+        self._set_animated_pick(self._pick_ind)
         self.fig.canvas.draw()
         self.fig.canvas.flush_events()
 
+    #######
+    # Level of detail and blitting
+    #######
+    def _update_view(self, ax=None):
+        """Show the traces within the x limits at the resolution of the screen."""
+        xlim = self.ax.get_xlim()
+        visible = np.where((self.xd >= min(xlim)) & (self.xd <= max(xlim)))[0]
+        if len(visible) == 0:
+            return
+        start = max(visible[0] - 1, 0)
+        end = min(visible[-1] + 2, len(self.xd))
+        window, _ = self.pyramid.get_window((start + self.x_range[0], end + self.x_range[0]),
+                                            self.ax.get_window_extent().width)
+        extent = self.im.get_extent()
+        self.im.set_data(window)
+        self.im.set_extent([self.xd[start], self.xd[end - 1], extent[2], extent[3]])
+
+    def _current_lines(self):
+        """The center, top, and bottom lines of the current pick, if they exist."""
+        if self._pick_ind >= len(self.cline) or self.cline[self._pick_ind] is None:
+            return []
+        return [self.cline[self._pick_ind], self.tline[self._pick_ind], self.bline[self._pick_ind]]
+
+    def _set_animated_pick(self, ind):
+        """Animate the lines of pick ind, so they are left out of the background and blitted."""
+        for i, lines in enumerate(zip(self.cline, self.tline, self.bline)):
+            for line in lines:
+                if line is not None:
+                    line.set_animated(i == ind)
+
+    def _on_draw(self, event):
+        """After a full draw, save the background and then draw the current pick over it."""
+        self._background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self._current_lines():
+            self.ax.draw_artist(line)
+
+    def _blit_lines(self):
+        """Redraw just the current pick, over the saved background."""
+        if self._background is None or not self.fig.canvas.supports_blit:
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.restore_region(self._background)
+            for line in self._current_lines():
+                self.ax.draw_artist(line)
+            self.fig.canvas.blit(self.ax.bbox)
+        self.fig.canvas.flush_events()
+
     #######
     # Logistics of saving and closing
     #######
@@ -492,7 +576,10 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
     ######
     def update_radardata(self):
         """Make the plot reflect updates to the data."""
-        self.im.set_data(self.dat.data[:, self.x_range[0]:self.x_range[-1]])
+        # Processed data no longer match the file, so do not cache them
+        self._processed = True
+        self.pyramid = get_pyramid(self.dat, flatten_layer=self.flatten_layer)
+        self._update_view()
         self.fig.canvas.draw()
         self.fig.canvas.flush_events()
         self._saved = False
@@ -556,10 +643,15 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
             self.offset, self.offset_mask = get_offset(self.dat, self.flatten_layer)
             self.ax.clear()
 
+            self.pyramid = get_pyramid(self.dat, flatten_layer=self.flatten_layer,
+                                       cache=not self._processed)
             self.im, self.xd, self.yd, self.x_range, self.lims = plot_radargram(
                 self.dat, xdat=self.x, ydat=self.y, x_range=self.x_range,
                 cmap=plt.cm.gray, fig=self.fig, ax=self.ax, flatten_layer=self.flatten_layer,
-                clims=self.lims, return_plotinfo=True)
+                clims=self.lims, return_plotinfo=True, pyramid=self.pyramid)
+            # Clearing the axes dropped the callback
+            self.ax.set_autoscale_on(False)
+            self.xlid = self.ax.callbacks.connect('xlim_changed', self._update_view)
             self.fig.canvas.draw()
             self.fig.canvas.flush_events()
             self.progressBar.setProperty("value", 50)
@@ -567,6 +659,7 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
 
             # cache selected pick then update lines.
             pi = self._pick_ind
+            self._line_buffers = {}
             if self.dat.picks.samp1 is not None:
                 self.cline = [None for i in range(self.dat.picks.samp1.shape[0])]
                 self.bline = [None for i in range(self.dat.picks.samp1.shape[0])]
@@ -585,6 +678,7 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                     self.update_lines(colors=colors, picker=5)
 
             self.pick_ind = pi
+            self._set_animated_pick(self._pick_ind)
             self.fig.canvas.draw()
             self.fig.canvas.flush_events()
 
@@ -613,8 +707,10 @@ class InteractivePicker(QtWidgets.QMainWindow, RawPickGUI.Ui_MainWindow):
                 c_line.set_color('b')
                 b_line.set_color('y')
                 t_line.set_color('y')
-                self.fig.canvas.draw()
-                self.fig.canvas.flush_events()
+        # The old current pick goes into the background
+        self._set_animated_pick(None)
+        self.fig.canvas.draw()
+        self.fig.canvas.flush_events()
 
         self.cline.append(None)
         self.bline.append(None)
@@ -27,6 +27,29 @@ Sept 23 2019
 import numpy as np
 import re
 
+#: One key=value (or key="value") line of a header. Handles both the raw
+#: header and its str(bytes) form, in which line breaks are escaped
+HEADER_RE = re.compile(r'(?:^|\n|\\n)([^=\r\n\\]+)="?([^"\r\n\\]*)')
+
+
+def parse_header(header):
+    """
+    Find all the values in a burst header, in one pass
+
+    Parameters
+    ---------
+    header: bytes or string
+        the header, raw or as the string from read_header
+
+    Output
+    ---------
+    values: dict
+        the value (string) for each key. If a key is repeated, the first value is kept.
+    """
+    if isinstance(header, bytes):
+        header = header.decode('latin-1')
+    return dict(reversed(HEADER_RE.findall(header)))
+
 # --------------------------------------------------------------------------------------------
 
 class ApresHeader():
@@ -129,74 +152,56 @@ class ApresHeader():
         if self.file_format is None:
             self.get_file_format()
 
-        loc1 = [m.start() for m in re.finditer('Reg0', self.header_string)]
-        loc2 = [m.start() for m in re.finditer('="', self.header_string)]
-
-        for k in range(len(loc1)):
-            case = self.header_string[loc1[k]:loc2[k]]
-
-            if case == 'Reg01':
-                # Control Function Register 2 (CFR2) Address 0x01 Four bytes
-                # Bit 19 (Digital ramp enable)= 1 = Enables digital ramp generator functionality.
-                # Bit 18 (Digital ramp no-dwell high) 1 = enables no-dwell high functionality.
-                # Bit 17 (Digital ramp no-dwell low) 1 = enables no-dwell low functionality.
-                # With no-dwell high, a positive transition of the DRCTL pin initiates a positive slope ramp, which
-                # continues uninterrupted (regardless of any activity on the DRCTL pin) until the upper limit is reached.
-                # Setting both no-dwell bits invokes a continuous ramping mode of operation;
-                loc3 = self.header_string[loc2[k]+2:].find('"')
-                val = self.header_string[loc2[k]+2:loc2[k]+loc3+2]
-                val = bin(int(val, 16))
-                val = val[::-1]
-                self.noDwellHigh = int(val[18])
-                self.noDwellLow = int(val[17])
-
-            #elif case == 'Reg08':
-            #    # Phase offset word Register (POW) Address 0x08. 2 Bytes dTheta = 360*POW/2^16.
-            #    val = char(reg{1,2}(k));
-            #    H.phaseOffsetDeg = hex2dec(val(1:4))*360/2^16;
-
-            elif case == 'Reg0B':
-                # Digital Ramp Limit Register Address 0x0B
-                # Digital ramp upper limit 32-bit digital ramp upper limit value.
-                # Digital ramp lower limit 32-bit digital ramp lower limit value.
-                loc3 = self.header_string[loc2[k]+2:].find('"')
-                val = self.header_string[loc2[k]+2:loc2[k]+loc3+2]
-                self.f0 = int(val[8:], 16)*self.fsysclk/(2**32)
-                self.f_stop = int(val[:8], 16)*self.fsysclk/(2**32)
-
-            elif case == 'Reg0C':
-                # Digital Ramp Step Size Register Address 0x0C
-                # Digital ramp decrement step size 32-bit digital ramp decrement step size value.
-                # Digital ramp increment step size 32-bit digital ramp increment step size value.
-                loc3 = self.header_string[loc2[k]+2:].find('"')
-                val = self.header_string[loc2[k]+2:loc2[k]+loc3+2]
-                self.ramp_up_step = int(val[8:], 16)*self.fsysclk/(2**32)
-                self.ramp_down_step = int(val[:8], 16)*self.fsysclk/(2**32)
-
-            elif case == 'Reg0D':
-                # Digital Ramp Rate Register Address 0x0D
-                # Digital ramp negative slope rate 16-bit digital ramp negative slope value that defines the time interval between decrement values.
-                # Digital ramp positive slope rate 16-bit digital ramp positive slope value that defines the time interval between increment values.
-                loc3 = self.header_string[loc2[k]+2:].find('"')
-                val = self.header_string[loc2[k]+2:loc2[k]+loc3+2]
-                self.tstep_up = int(val[4:], 16)*4/self.fsysclk
-                self.tstep_down = int(val[:4], 16)*4/self.fsysclk
-
-        strings = ['SamplingFreqMode=','N_ADC_SAMPLES=']
-        output = np.empty((len(strings))).astype(str)
-        for i,string in enumerate(strings):
-            if string in self.header_string:
-                search_start = self.header_string.find(string)
-                search_end = self.header_string[search_start:].find('\\')
-                output[i] = self.header_string[search_start+len(string):search_end+search_start]
-
-        self.fs = output[0]
-        if self.fs == 1:        # if self.fs > 70e3:
-            self.fs = 8e4       #     self.fs = 80e3
-        else:                   # else
-            self.fs = 4e4       #     self.fs = 40e3
-
-        self.snum = int(output[1])
+        values = parse_header(self.header_string)
+
+        if 'Reg01' in values:
+            # Control Function Register 2 (CFR2) Address 0x01 Four bytes
+            # Bit 19 (Digital ramp enable)= 1 = Enables digital ramp generator functionality.
+            # Bit 18 (Digital ramp no-dwell high) 1 = enables no-dwell high functionality.
+            # Bit 17 (Digital ramp no-dwell low) 1 = enables no-dwell low functionality.
+            # With no-dwell high, a positive transition of the DRCTL pin initiates a positive slope ramp, which
+            # continues uninterrupted (regardless of any activity on the DRCTL pin) until the upper limit is reached.
+            # Setting both no-dwell bits invokes a continuous ramping mode of operation;
+            val = bin(int(values['Reg01'], 16))
+            val = val[::-1]
+            self.noDwellHigh = int(val[18])
+            self.noDwellLow = int(val[17])
+
+        #if 'Reg08' in values:
+        #    # Phase offset word Register (POW) Address 0x08. 2 Bytes dTheta = 360*POW/2^16.
+        #    val = char(reg{1,2}(k));
+        #    H.phaseOffsetDeg = hex2dec(val(1:4))*360/2^16;
+
+        if 'Reg0B' in values:
+            # Digital Ramp Limit Register Address 0x0B
+            # Digital ramp upper limit 32-bit digital ramp upper limit value.
+            # Digital ramp lower limit 32-bit digital ramp lower limit value.
+            val = values['Reg0B']
+            self.f0 = int(val[8:], 16)*self.fsysclk/(2**32)
+            self.f_stop = int(val[:8], 16)*self.fsysclk/(2**32)
+
+        if 'Reg0C' in values:
+            # Digital Ramp Step Size Register Address 0x0C
+            # Digital ramp decrement step size 32-bit digital ramp decrement step size value.
+            # Digital ramp increment step size 32-bit digital ramp increment step size value.
+            val = values['Reg0C']
+            self.ramp_up_step = int(val[8:], 16)*self.fsysclk/(2**32)
+            self.ramp_down_step = int(val[:8], 16)*self.fsysclk/(2**32)
+
+        if 'Reg0D' in values:
+            # Digital Ramp Rate Register Address 0x0D
+            # Digital ramp negative slope rate 16-bit digital ramp negative slope value that defines the time interval between decrement values.
+            # Digital ramp positive slope rate 16-bit digital ramp positive slope value that defines the time interval between increment values.
+            val = values['Reg0D']
+            self.tstep_up = int(val[4:], 16)*4/self.fsysclk
+            self.tstep_down = int(val[:4], 16)*4/self.fsysclk
+
+        if values.get('SamplingFreqMode') == '1':     # if self.fs > 70e3:
+            self.fs = 8e4                               #     self.fs = 80e3
+        else:                                           # else
+            self.fs = 4e4                               #     self.fs = 40e3
+
+        self.snum = int(values['N_ADC_SAMPLES'])
 
         self.nsteps_DDS = round(abs((self.f_stop - self.f0)/self.ramp_up_step)) # abs as ramp could be down
         self.chirp_length = int(self.nsteps_DDS * self.tstep_up)
@@ -0,0 +1,304 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3 license.
+
+"""
+Range differencing through a time series of ApRES acquisitions.
+
+Each burst is reduced to a single stacked, range-processed profile as soon as
+it is loaded, so long deployments can be handled without keeping every raw
+chirp in memory. The profiles can be cached to disk, and the range
+differences between acquisitions are found for many pairs at once.
+"""
+
+import os
+import copy
+import hashlib
+import numpy as np
+
+from .ApresHeader import ApresHeader
+from ._ApresDataProcessing import apres_range, range_diff
+
+
+class ApresTimeSeries():
+    """Stacked, range-processed profiles of many ApRES bursts, in time order.
+
+    Parameters
+    ----------
+    dats: list of str or ApresData
+        The acquisitions, in time order. Strings are files (raw ApRES or
+        ImpDAR .mat) which are loaded and reduced one at a time.
+        Every burst of every acquisition becomes one profile.
+    p: int, optional
+        pad factor for the range fft. Default 2.
+    max_range: float, optional
+        crop the profiles to this range (m). Default 4000.
+    winfun: str, optional
+        window function for the range fft. Default blackman.
+    single_precision: bool, optional
+        do the range fft in float32/complex64. Default False.
+    cache_fn: str, optional
+        A .npz file in which to cache the profiles of files (not ApresData
+        objects). Keyed on the file name, size, modification time, and the
+        processing parameters. Default is no caching.
+
+    Attributes
+    ----------
+    decday: np.ndarray (nacq,)
+        The time of each acquisition (mean time of its chirps)
+    Rcoarse: np.ndarray (snum,)
+        The range to each bin (m)
+    profiles: np.ndarray (nacq, snum)
+        The stacked, reference-phase corrected spectrum of each acquisition
+    header: ApresHeader
+        Holds lambdac, chirp_grad, and ci, which are needed for differencing
+    """
+
+    def __init__(self, dats, p=2, max_range=4000, winfun='blackman',
+                 single_precision=False, cache_fn=None):
+        self.p = p
+        self.max_range = max_range
+        self.winfun = winfun
+        self.single_precision = single_precision
+        self.cache_fn = cache_fn
+        self.pairs = None
+
+        cache = {}
+        if cache_fn is not None and os.path.exists(cache_fn):
+            with np.load(cache_fn) as cache_file:
+                cache = {key: cache_file[key] for key in cache_file.files}
+        new_keys = False
+
+        decday = []
+        profiles = []
+        header_vals = None
+        self.Rcoarse = None
+        for dat in dats:
+            if isinstance(dat, str):
+                key = self._cache_key(dat)
+                if key + '_profiles' in cache:
+                    vals = (cache[key + '_decday'], cache[key + '_Rcoarse'],
+                            cache[key + '_profiles'], cache[key + '_header'])
+                else:
+                    vals = self._file_profiles(dat)
+                    for name, val in zip(['_decday', '_Rcoarse', '_profiles', '_header'], vals):
+                        cache[key + name] = val
+                    new_keys = True
+            else:
+                vals = _range_profiles(dat, p, max_range, winfun, single_precision)
+
+            if self.Rcoarse is None:
+                self.Rcoarse = vals[1]
+                header_vals = vals[3]
+            elif len(vals[1]) != len(self.Rcoarse) or not np.allclose(vals[1], self.Rcoarse):
+                raise ValueError('Need the same range bins for every acquisition')
+            decday.append(vals[0])
+            profiles.append(vals[2])
+
+        if new_keys and cache_fn is not None:
+            np.savez(cache_fn, **cache)
+
+        self.decday = np.hstack(decday)
+        self.profiles = np.vstack(profiles)
+        self.header = ApresHeader()
+        self.header.lambdac, self.header.chirp_grad, self.header.ci = header_vals
+
+    def _file_profiles(self, fn):
+        """Load and reduce a file, one burst at a time for raw ApRES files."""
+        from .load_apres import load_apres_single_file, iter_bursts
+        if fn[-4:] == '.mat':
+            dats = [load_apres_single_file(fn)]
+        else:
+            dats = iter_bursts(fn)
+        vals = [_range_profiles(dat, self.p, self.max_range, self.winfun, self.single_precision)
+                for dat in dats]
+        return (np.hstack([val[0] for val in vals]), vals[0][1],
+                np.vstack([val[2] for val in vals]), vals[0][3])
+
+    def _cache_key(self, fn):
+        """Hash the file and processing parameters so we know if the cache is stale."""
+        stat = os.stat(fn)
+        sha = hashlib.sha1()
+        sha.update('{:s}_{:d}_{:f}_{:s}_{:s}_{:s}_{:s}'.format(
+            os.path.abspath(fn), stat.st_size, stat.st_mtime, str(self.p),
+            str(self.max_range), self.winfun, str(self.single_precision)).encode())
+        return sha.hexdigest()
+
+    def range_diffs(self, win, step, pairs='consecutive', chunk_size=256, jobs=1):
+        """Find the range difference between many pairs of acquisitions.
+
+        Pairs are done in chunks, with all the pairs in a chunk done at once.
+
+        Parameters
+        ----------
+        win: int
+            window size over which to do the correlation coefficient calculation
+        step: int
+            step size for the window to move between calculations
+        pairs: str or np.ndarray, optional
+            'consecutive' (default), 'all' (every earlier-later pair), or
+            an (npairs, 2) array of the indices of the acquisitions to compare
+        chunk_size: int, optional
+            The number of pairs to do at once. Default 256.
+        jobs: int, optional
+            The number of processes to use for the chunks. Default 1.
+
+        Returns
+        -------
+        ds: np.ndarray (ndepth,)
+            depths at which the range difference is calculated
+        r_diff: np.ndarray (npairs, ndepth)
+            range difference (later minus earlier acquisition, m)
+        r_diff_unc: np.ndarray (npairs, ndepth)
+            uncertainty in r_diff (m), from the Cramer-Rao bound
+        """
+        nacq = self.profiles.shape[0]
+        if isinstance(pairs, str):
+            if pairs == 'consecutive':
+                pairs = np.vstack((np.arange(nacq - 1), np.arange(1, nacq))).transpose()
+            elif pairs == 'all':
+                pairs = np.vstack(np.triu_indices(nacq, 1)).transpose()
+            else:
+                raise ValueError('pairs must be consecutive, all, or an array of indices')
+        self.pairs = np.atleast_2d(np.asarray(pairs, dtype=int))
+
+        # Only pull out the profiles for a chunk when we get to it
+        args = ((self.header, self.Rcoarse, self.profiles[self.pairs[i:i + chunk_size, 0]],
+                 self.profiles[self.pairs[i:i + chunk_size, 1]], win, step)
+                for i in range(0, len(self.pairs), chunk_size))
+        if jobs > 1 and len(self.pairs) > chunk_size:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+            except ImportError:
+                # No process pools on python 2, so do one chunk at a time
+                jobs = 1
+        if jobs > 1 and len(self.pairs) > chunk_size:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_pair_diffs, args))
+        else:
+            results = [_pair_diffs(arg) for arg in args]
+
+        self.ds = results[0][0]
+        self.co = np.vstack([result[1] for result in results])
+        self.r_diff = np.vstack([result[2] for result in results])
+        self.r_diff_unc = np.vstack([result[3] for result in results])
+        return self.ds, self.r_diff, self.r_diff_unc
+
+    @property
+    def pair_time(self):
+        """The time (decday) between the acquisitions of each pair"""
+        return self.decday[self.pairs[:, 1]] - self.decday[self.pairs[:, 0]]
+
+    def velocity(self):
+        """Get the vertical velocity (m/yr) at each depth from each pair.
+
+        Returns
+        -------
+        np.ndarray (npairs, ndepth)
+            The range difference divided by the time between acquisitions
+        """
+        if self.pairs is None:
+            raise AttributeError('Do range_diffs first')
+        return self.r_diff / (self.pair_time[:, None] / 365.25)
+
+    def strain_rate(self):
+        """Get the vertical strain rate (1/yr) at each depth through time.
+
+        The velocity at each acquisition is the time derivative of the
+        displacement, so this works with any set of pairs that
+        displacement does.
+
+        Returns
+        -------
+        np.ndarray (nacq, ndepth)
+            The depth gradient of the velocity at each acquisition time
+        """
+        vel = np.gradient(self.displacement(), self.decday / 365.25, axis=0)
+        return np.gradient(vel, self.ds, axis=1)
+
+    def displacement(self):
+        """Get the displacement at each depth through time.
+
+        With consecutive pairs, this is just the cumulative range difference.
+        Otherwise, the displacements are the least-squares fit to the range
+        differences of all the pairs (which need to connect every acquisition).
+
+        Returns
+        -------
+        np.ndarray (nacq, ndepth)
+            Displacement (m) at each depth relative to the first acquisition
+        """
+        if self.pairs is None:
+            raise AttributeError('Do range_diffs first')
+        nacq = self.profiles.shape[0]
+        disp = np.zeros((nacq, len(self.ds)))
+        consecutive = np.vstack((np.arange(nacq - 1), np.arange(1, nacq))).transpose()
+        if np.array_equal(self.pairs, consecutive):
+            disp[1:, :] = np.cumsum(self.r_diff, axis=0)
+            return disp
+
+        # d_j - d_i = r_ij, with d_0 = 0
+        design = np.zeros((len(self.pairs), nacq))
+        design[np.arange(len(self.pairs)), self.pairs[:, 1]] = 1.
+        design[np.arange(len(self.pairs)), self.pairs[:, 0]] = -1.
+        design = design[:, 1:]
+        finite = np.all(np.isfinite(self.r_diff), axis=0)
+        # all the depths without gaps share a single solve
+        disp[1:, finite] = np.linalg.lstsq(design, self.r_diff[:, finite], rcond=None)[0]
+        for i in np.where(~finite)[0]:
+            mask = np.isfinite(self.r_diff[:, i])
+            disp[1:, i] = np.linalg.lstsq(design[mask], self.r_diff[mask, i], rcond=None)[0]
+        return disp
+
+
+def _range_profiles(dat, p, max_range, winfun, single_precision):
+    """Stack the chirps of each burst and range process them.
+
+    The fft is linear, so stacking the raw chirps first gives the same answer
+    as stacking the spectra, with cnum times less work.
+
+    Returns
+    -------
+    decday: np.ndarray (nb,)
+    Rcoarse: np.ndarray (n,)
+    profiles: np.ndarray (nb, n)
+    header: np.ndarray (3,)
+        lambdac, chirp_grad, ci
+    """
+    data = np.reshape(dat.data, (-1, dat.cnum, np.shape(dat.data)[-1]))
+    decday = np.mean(np.reshape(dat.chirp_time, (data.shape[0], -1)), axis=1)
+    if dat.flags.range != 0:
+        profiles = np.mean(data, axis=1)
+        Rcoarse = dat.Rcoarse
+    else:
+        # Do not modify the input
+        stacked = copy.copy(dat)
+        stacked.flags = copy.deepcopy(dat.flags)
+        stacked.data = np.mean(data, axis=1, keepdims=True)
+        stacked.bnum = data.shape[0]
+        stacked.cnum = 1
+        stacked.snum = data.shape[2]
+        apres_range(stacked, p, max_range=max_range, winfun=winfun,
+                    single_precision=single_precision)
+        profiles = stacked.data[:, 0, :]
+        Rcoarse = stacked.Rcoarse
+    return decday, Rcoarse, profiles, np.array([dat.header.lambdac, dat.header.chirp_grad,
+                                                dat.header.ci])
+
+
+class _RangeInfo():
+    """Just the parts of an ApresData that range_diff needs"""
+
+    def __init__(self, header, Rcoarse):
+        self.header = header
+        self.Rcoarse = Rcoarse
+
+
+def _pair_diffs(args):
+    """Do range_diff on a chunk of pairs. Module level so it can go to a process pool."""
+    header, Rcoarse, acq1, acq2, win, step = args
+    return range_diff(_RangeInfo(header, Rcoarse), acq1, acq2, win, step)
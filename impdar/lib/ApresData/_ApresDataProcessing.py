@@ -21,7 +21,7 @@ Sept 23 2019
 
 import numpy as np
 
-def apres_range(self,p,max_range=4000,winfun='blackman'):
+def apres_range(self,p,max_range=4000,winfun='blackman',single_precision=False):
     """
 
     Parameters
@@ -32,6 +32,9 @@ def apres_range(self,p,max_range=4000,winfun='blackman'):
         pad factor, level of interpolation for fft
     winfun: str
         window function for fft
+    single_precision: bool; optional
+        keep the data in float32/complex64, which halves the memory
+        needed. Default False (float64/complex128).
 
     Output
     --------
@@ -89,42 +92,36 @@ def apres_range(self,p,max_range=4000,winfun='blackman'):
     # Brennan et al. (2014) eq. 17 measured at t=T/2
     self.phiref = 2.*np.pi*self.header.fc*tau -(self.header.chirp_grad*tau**2.)/2
 
-    # --- Loop through for each chirp in burst --- #
+    # Crop output variables to useful depth range only
+    n = np.argmin(self.Rcoarse<=max_range)
+    self.Rcoarse = self.Rcoarse[:n]
 
-    # preallocate
-    spec = np.zeros((self.bnum,self.cnum,nf)).astype(np.cdouble)
-    spec_cor = np.zeros((self.bnum,self.cnum,nf)).astype(np.cdouble)
+    if single_precision:
+        real_dtype, complex_dtype = np.float32, np.complex64
+    else:
+        real_dtype, complex_dtype = np.float64, np.complex128
 
-    for ib in range(self.bnum):
-        for ic in range(self.cnum):
-            # isolate the chirp and preprocess before transform
-            chirp = self.data[ib,ic,:].copy()
-            chirp = chirp-np.mean(chirp) # de-mean
-            chirp *= win # windowed
+    # --- Transform every chirp in every burst at once --- #
 
-            # fourier transform
-            fft_chirp = (np.sqrt(2.*p)/len(chirp))*np.fft.fft(chirp,p*self.snum) # fft and scale for padding
-            fft_chirp /= np.sqrt(np.mean(win**2.)) # scale with rms of window
+    # de-mean and window each chirp
+    chirps = np.asarray(self.data, dtype=real_dtype)
+    chirps = (chirps - np.mean(chirps, axis=-1, keepdims=True)) * win.astype(real_dtype)
 
-            # output
-            spec[ib,ic,:] = fft_chirp[:nf] # positive frequency half of spectrum up to (nyquist minus deltaf)
-            comp = np.exp(-1j*(self.phiref)) # unit phasor with conjugate of phiref phase
-            spec_cor[ib,ic,:] = comp*fft_chirp[:nf] # positive frequency half of spectrum with ref phase subtracted
+    # fft, scaled for padding and with the rms of the window
+    scale = (np.sqrt(2.*p)/self.snum) / np.sqrt(np.mean(win**2.))
+    # positive frequency half of spectrum up to (nyquist minus deltaf), cropped
+    spec = np.fft.fft(chirps, p*self.snum, axis=-1)[:,:,:n].astype(complex_dtype) * real_dtype(scale)
+    del chirps
 
-    self.data = spec_cor.copy()
-    self.spec = spec.copy()
+    # unit phasor with conjugate of phiref phase, to subtract the ref phase
+    comp = np.exp(-1j*(self.phiref[:n])).astype(spec.dtype)
+    self.spec = spec
+    self.data = spec*comp
 
     # precise range measurement
     self.Rfine = phase2range(np.angle(self.data),self.header.lambdac,
-            np.tile(self.Rcoarse,(self.bnum,self.cnum,1)),
+            self.Rcoarse,
             self.header.chirp_grad,self.header.ci)
-
-    # Crop output variables to useful depth range only
-    n = np.argmin(self.Rcoarse<=max_range)
-    self.Rcoarse = self.Rcoarse[:n]
-    self.Rfine = self.Rfine[:,:,:n]
-    self.data = self.data[:,:,:n]
-    self.spec = self.spec[:,:,:n]
     self.snum = n
 
     self.flags.range = max_range
@@ -221,9 +218,10 @@ def range_diff(self,acq1,acq2,win,step,Rcoarse=None,r_uncertainty=None,uncertain
     self: class
         data object
     acq1: array
-        first acquisition for comparison
+        first acquisition for comparison. Can be (npairs, snum) to do
+        a batch of acquisition pairs at once.
     acq2: array
-        second acquisition for comparison
+        second acquisition for comparison, same shape as acq1
     win: int
         window size over which to do the correlation coefficient calculation
     step: int
@@ -251,20 +249,21 @@ def range_diff(self,acq1,acq2,win,step,Rcoarse=None,r_uncertainty=None,uncertain
     if np.shape(acq1) != np.shape(acq2):
         raise TypeError('Acquisition inputs must be of the same shape.')
 
-    idxs = np.arange(win//2,(len(acq1)-win//2),step)
+    idxs = np.arange(win//2,(np.shape(acq1)[-1]-win//2),step)
     if Rcoarse is not None:
         ds = Rcoarse[idxs]
     else:
         ds = self.Rcoarse[idxs]
-    co = np.empty_like(ds).astype(np.complex)
-    for i,idx in enumerate(idxs):
-        # index two sub_arrays to compare
-        arr1 = acq1[idx-win//2:idx+win//2]
-        arr2 = acq2[idx-win//2:idx+win//2]
-        # correlation coefficient to get the motion
-        # the amplitude indicates how well the reflections match between acquisitions
-        # the phase is a measure of the offset
-        co[i] = np.corrcoef(arr1,arr2)[1,0]
+
+    # correlation coefficient of every window pair at once (as np.corrcoef)
+    # the amplitude indicates how well the reflections match between acquisitions
+    # the phase is a measure of the offset
+    arr1 = _windows(acq1,win,idxs)
+    arr1 = arr1 - np.mean(arr1,axis=-1,keepdims=True)
+    arr2 = _windows(acq2,win,idxs)
+    arr2 = arr2 - np.mean(arr2,axis=-1,keepdims=True)
+    co = np.sum(arr2*np.conj(arr1),axis=-1)/np.sqrt(
+            np.sum(np.abs(arr1)**2.,axis=-1)*np.sum(np.abs(arr2)**2.,axis=-1))
 
     # convert the phase offset to a distance vector
     r_diff = phase2range(np.angle(co),
@@ -286,10 +285,24 @@ def range_diff(self,acq1,acq2,win,step,Rcoarse=None,r_uncertainty=None,uncertain
     elif uncertainty == 'noise_phasor':
         # Uncertainty from Noise Phasor as in Kingslake et al. (2014)
         # r_uncertainty should be calculated using the function phase_uncertainty defined in this script
-        r_diff_unc = np.array([np.nanmean(r_uncertainty[i-win//2:i+win//2]) for i in idxs])
+        r_diff_unc = np.nanmean(_windows(r_uncertainty,win,idxs),axis=-1)
+
+    else:
+        raise ValueError('uncertainty must be CR or noise_phasor')
 
     return ds, co, r_diff, r_diff_unc
 
+
+def _windows(arr,win,idxs):
+    """Get the windows (idx-win//2:idx+win//2) along the last axis of arr, from a strided view."""
+    arr = np.ascontiguousarray(arr)
+    nwin = arr.shape[-1]-2*(win//2)+1
+    windows = np.lib.stride_tricks.as_strided(arr,
+            shape=arr.shape[:-1]+(nwin,2*(win//2)),
+            strides=arr.strides+(arr.strides[-1],),
+            writeable=False)
+    return windows[...,idxs-win//2,:]
+
 # --------------------------------------------------------------------------------------------
 
 def stacking(self,num_chirps=None):
@@ -24,10 +24,21 @@ Sept 23 2019
 
 """
 
+import os
 import numpy as np
 import datetime
-import re
 from . import ApresData
+from .ApresHeader import parse_header
+
+#: The string that ends each burst header
+END_HEADER = b'*** End Header ***'
+
+#: Bytes per sample, and how they are stored, for each averaging mode
+_SAMPLE_DTYPES = {0: '<u2', 1: '<f4', 2: '<u4'}
+
+#: Attributes of the burst index
+INDEX_ATTRS = ['header_offset', 'data_offset', 'snum', 'cnum', 'average', 'n_subbursts',
+               'n_attenuators', 'decday', 'temperature1', 'temperature2', 'battery_voltage']
 
 # -----------------------------------------------------------------------------------------------------
 
@@ -91,6 +102,10 @@ def load_apres_single_file(fn_apres,burst=1,fs=40000, *args, **kwargs):
         number of bursts to load
     fs: int
         sampling frequency
+    max_header_len: int, optional
+        maximum length to read for header (can be too long). Default 2000.
+    index: dict, optional
+        burst index of the file from index_bursts, if already built
 
     ### Original Matlab Notes ###
 
@@ -113,7 +128,9 @@ def load_apres_single_file(fn_apres,burst=1,fs=40000, *args, **kwargs):
     else:
         apres_data = ApresData(None)
         apres_data.header.update_parameters(fn_apres)
-        start_ind,end_ind = load_burst(apres_data, burst, fs)
+        start_ind,end_ind = load_burst(apres_data, burst, fs,
+                                       max_header_len=kwargs.get('max_header_len',2000),
+                                       index=kwargs.get('index',None))
 
     # Extract just good chirp data from voltage record and rearrange into
     # matrix with one chirp per row
@@ -160,26 +177,149 @@ def load_apres_single_file(fn_apres,burst=1,fs=40000, *args, **kwargs):
 
     return apres_data
 
+def iter_bursts(fn_apres,fs=40000,max_header_len=2000):
+    """
+    Lazily load the bursts of a long ApRES recording, one at a time
+
+    Parameters
+    ---------
+    fn_apres: string
+        file name
+    fs: int
+        sampling frequency
+    max_header_len: int
+        maximum length to read for header (can be too long)
+
+    Yields
+    ---------
+    ApresData
+        Each burst in the file, in order, with bnum=1
+    """
+    # Index once, rather than for every burst
+    index = index_bursts(fn_apres,max_header_len=max_header_len)
+    for burst in range(len(index['data_offset'])):
+        yield load_apres_single_file(fn_apres,burst=burst+1,fs=fs,max_header_len=max_header_len,
+                                     index=index)
+
 # -----------------------------------------------------------------------------------------------------
 
-def load_burst(self,burst=1,fs=40000,max_header_len=2000,burst_pointer=0):
+def index_bursts(fn_apres,max_header_len=2000,cache=True):
+    """
+    Find where every burst is in an ApRES file, in one pass.
+
+    Only the header of each burst is read; we jump straight over the data.
+    The index is cached next to the file (as fn_apres.index.npz), and is
+    redone if the file changes.
+
+    Parameters
+    ---------
+    fn_apres: string
+        file name
+    max_header_len: int
+        maximum length to read for header (can be too long)
+    cache: bool
+        read and write the cached index. Default True.
+
+    Output
+    ---------
+    index: dict
+        np.ndarray (nbursts,) for each of INDEX_ATTRS. Offsets are in bytes,
+        and decday is the (matlab) time stamp of the burst.
+    """
+    stat = os.stat(fn_apres)
+    cache_fn = fn_apres + '.index.npz'
+    if cache and os.path.exists(cache_fn):
+        with np.load(cache_fn) as cached:
+            if cached['file_size'] == stat.st_size and cached['file_mtime'] == stat.st_mtime \
+                    and cached['max_header_len'] == max_header_len:
+                return {attr: cached[attr] for attr in INDEX_ATTRS}
+
+    index = {attr: [] for attr in INDEX_ATTRS}
+    burst_pointer = 0
+    with open(fn_apres,'rb') as fid:
+        while burst_pointer < stat.st_size:
+            fid.seek(burst_pointer)
+            header = fid.read(max_header_len)
+            end_ind = header.find(END_HEADER)
+            if end_ind < 0:
+                break
+            vals = parse_header(header[:end_ind])
+            try:
+                snum = int(vals['N_ADC_SAMPLES'])
+                average = int(vals['Average'])
+                n_subbursts = int(vals['NSubBursts'])
+                n_attenuators = int(vals['nAttenuators'])
+                if average != 0:
+                    cnum = 1
+                else:
+                    cnum = n_subbursts*n_attenuators*vals['TxAnt'].count('1')*vals['RxAnt'].count('1')
+            except (KeyError, ValueError):
+                # Corrupt header, so we cannot know where the next burst is
+                break
+            data_offset = burst_pointer + end_ind + len(END_HEADER)
+            next_pointer = data_offset + cnum*snum*np.dtype(_SAMPLE_DTYPES[average]).itemsize
+            if next_pointer > stat.st_size:
+                # Truncated burst
+                break
+
+            for attr, val in zip(INDEX_ATTRS, [burst_pointer, data_offset, snum, cnum, average,
+                                               n_subbursts, n_attenuators]):
+                index[attr].append(val)
+            index['decday'].append(_decday(vals.get('Time stamp', '')))
+            for attr, key in [('temperature1', 'Temp1'), ('temperature2', 'Temp2'),
+                              ('battery_voltage', 'BatteryVoltage')]:
+                try:
+                    index[attr].append(float(vals[key]))
+                except (KeyError, ValueError):
+                    index[attr].append(np.nan)
+            burst_pointer = next_pointer
+
+    index = {attr: np.array(val, dtype=float if attr in INDEX_ATTRS[7:] else int)
+             for attr, val in index.items()}
+    if cache:
+        try:
+            np.savez(cache_fn, file_size=stat.st_size, file_mtime=stat.st_mtime,
+                     max_header_len=max_header_len, **index)
+        except OSError:
+            # Read-only directories just do not get a cache
+            pass
+    return index
+
+
+def _decday(time_stamp):
+    """Convert a time stamp to a matlab datenum, nan if we cannot."""
+    try:
+        offset = datetime.datetime.strptime(time_stamp.strip(), '%Y-%m-%d %H:%M:%S') - datetime.datetime(1, 1, 1, 0, 0, 0)
+    except ValueError:
+        return np.nan
+    return offset.days + offset.seconds/86400. + 377. # Matlab compatable
+
+# -----------------------------------------------------------------------------------------------------
+
+def load_burst(self,burst=1,fs=40000,max_header_len=2000,burst_pointer=0,index=None):
     """
     Load bursts from the apres acquisition.
     Normally, this should be called from the load_apres function.
+    The file is indexed (see index_bursts) so we can jump right to the burst.
 
     Parameters
     ---------
     burst: int
-        number of bursts to load
+        which burst to load (from 1)
     fs: int
         sampling frequency
     max_header_len: int
         maximum length to read for header (can be too long)
     burst_pointer: int
-        where to start reading the file for bursts
+        where to start reading the file for bursts (in bytes)
+    index: dict
+        burst index of the file from index_bursts, if already built.
+        Default None (build it, or read it from the cache).
 
     Output
     ---------
+    start_ind, end_ind: np.ndarray (cnum,)
+        where each chirp starts and ends in self.data
 
     ### Original Matlab Script Notes ###
     Read FMCW data file from after Oct 2014 (RMB2b + VAB Iss C, SW Issue >= 101)
@@ -195,134 +335,69 @@ def load_burst(self,burst=1,fs=40000,max_header_len=2000,burst_pointer=0):
                         Look back to the original Matlab scripts if you need to implement earlier formats.')
 
     try:
-        fid = open(self.header.fn,'rb')
-    except:
+        if index is None:
+            index = index_bursts(self.header.fn,max_header_len=max_header_len)
+    except OSError:
         # Unknown file
         self.flags.file_read_code = 'Unable to read file' + self.header.fn
         raise TypeError('Cannot open file', self.header.fn)
 
-    # Get the total length of the file
-    fid.seek(0,2)
-    file_len = fid.tell()
-    burst_count = 1
-
-    # --- Read bursts in a loop --- #
-    while burst_count <= burst and burst_pointer <= file_len - max_header_len:
-        # Go to burst pointer and read the header for the burst
-        fid.seek(burst_pointer)
-        self.header.read_header(self.header.fn,max_header_len)
-
-        try:
-            # Read header values
-            strings = ['N_ADC_SAMPLES=','NSubBursts=','Average=','nAttenuators=','Attenuator1=',
-                      'AFGain=','TxAnt=','RxAnt=']
-            output = np.empty((len(strings))).astype(str)
-            for i,string in enumerate(strings):
-                if string in self.header.header_string:
-                    search_start = self.header.header_string.find(string)
-                    search_end = self.header.header_string[search_start:].find('\\')
-                    output[i] = self.header.header_string[search_start+len(string):search_end+search_start]
-
-            # Write header values to data object
-            self.snum = int(output[0])
-            self.n_subbursts = int(output[1])
-            self.average = int(output[2])
-            self.header.n_attenuators = int(output[3])
-            self.header.attenuator1 = np.array(output[4].split(',')).astype(int)[:self.header.n_attenuators]
-            self.header.attenuator2 = np.array(output[5].split(',')).astype(int)[:self.header.n_attenuators]
-            self.header.tx_ant = np.array(output[6].split(',')).astype(int)
-            self.header.rx_ant = np.array(output[7].split(',')).astype(int)
-
-            self.header.tx_ant = self.header.tx_ant[self.header.tx_ant==1]
-            self.header.rx_ant = self.header.rx_ant[self.header.rx_ant==1]
-
-            if self.average != 0:
-                self.cnum = 1
-            else:
-                self.cnum = self.n_subbursts*len(self.header.tx_ant)*\
-                                            len(self.header.rx_ant)*self.header.n_attenuators
-
-            # End of burst
-            search_string = '*** End Header ***'
-            search_ind = self.header.header_string.find(search_string)
-            burst_pointer += search_ind + len(search_string)
-
-        except:
-            # If the burst read is unsuccessful exit with an updated read code
-            self.flags.file_read_code = 'Corrupt header in burst' + str(burst_count) + 'for file' + self.header.fn
-            self.bnum = burst_count
-            raise TypeError('Burst Read Failed.')
+    # --- Jump straight to the burst we want --- #
+    # Skip any bursts that start before the burst pointer
+    bursts = np.where(index['header_offset'] >= burst_pointer)[0]
+    if len(bursts) < burst:
+        # too few bursts in file
+        self.bnum = len(bursts)
+        self.flags.file_read_code = 'Burst' + str(burst) + 'not found in file' + self.header.fn
+        raise TypeError('Burst ' + str(burst) + ' not found in file ' + self.header.fn)
+    ind = bursts[burst-1]
 
-        # Move the burst pointer
-        if burst_count < burst and burst_pointer <= file_len - max_header_len:
-            if self.average != 0:
-                burst_pointer += self.cnum*self.snum*4
-            else:
-                burst_pointer += self.cnum*self.snum*2
+    with open(self.header.fn,'rb') as fid:
+        fid.seek(index['header_offset'][ind])
+        self.header.header_string = str(fid.read(index['data_offset'][ind]-index['header_offset'][ind]))
 
-        burst_count += 1
+    try:
+        # Read header values
+        values = parse_header(self.header.header_string)
+
+        # Write header values to data object
+        self.snum = int(index['snum'][ind])
+        self.cnum = int(index['cnum'][ind])
+        self.n_subbursts = int(index['n_subbursts'][ind])
+        self.average = int(index['average'][ind])
+        self.header.n_attenuators = int(index['n_attenuators'][ind])
+        self.header.attenuator1 = np.array(values['Attenuator1'].split(',')).astype(int)[:self.header.n_attenuators]
+        self.header.attenuator2 = np.array(values['AFGain'].split(',')).astype(int)[:self.header.n_attenuators]
+        self.header.tx_ant = np.array(values['TxAnt'].split(',')).astype(int)
+        self.header.rx_ant = np.array(values['RxAnt'].split(',')).astype(int)
+
+        self.header.tx_ant = self.header.tx_ant[self.header.tx_ant==1]
+        self.header.rx_ant = self.header.rx_ant[self.header.rx_ant==1]
+    except (KeyError, ValueError):
+        # If the burst read is unsuccessful exit with an updated read code
+        self.flags.file_read_code = 'Corrupt header in burst' + str(burst) + 'for file' + self.header.fn
+        self.bnum = burst
+        raise TypeError('Burst Read Failed.')
 
     # --- Get remaining information from burst header --- #
 
-    # Look for a few different strings and save output
-    strings = ['Time stamp=','Temp1=','Temp2=','BatteryVoltage=']
-    output = []
-    for i,string in enumerate(strings):
-        if string in self.header.header_string:
-            search_start = [m.start() for m in re.finditer(string, self.header.header_string)]
-            search_end = [self.header.header_string[ind:].find('\\') for ind in search_start]
-            out = [self.header.header_string[search_start[i]+len(string):search_end[i]+search_start[i]] for i in range(len(search_start))]
-            output.append(out)
-
-    if 'Time stamp' not in self.header.header_string:
-        self.flags.file_read_code = 'Burst' + str(self.bnum) + 'not found in file' + self.header.fn
+    if np.isnan(index['decday'][ind]):
+        self.flags.file_read_code = 'Burst' + str(burst) + 'not found in file' + self.header.fn
     else:
-        self.time_stamp = np.array([datetime.datetime.strptime(str_time, '%Y-%m-%d %H:%M:%S') for str_time in output[0]])
-        timezero = datetime.datetime(1, 1, 1, 0, 0, 0)
-        day_offset = self.time_stamp - timezero
-        self.decday = np.array([offset.days for offset in day_offset]) + 377. # Matlab compatable
+        self.decday = index['decday'][ind:ind+1]
+        self.time_stamp = np.array([datetime.datetime(1, 1, 1, 0, 0, 0) +
+                                    datetime.timedelta(days=self.decday[0]-377.)])
 
-    self.temperature1 = np.array(output[1]).astype(float)
-    self.temperature2 = np.array(output[2]).astype(float)
-    self.battery_voltage = np.array(output[3]).astype(float)
+    self.temperature1 = index['temperature1'][ind:ind+1].copy()
+    self.temperature2 = index['temperature2'][ind:ind+1].copy()
+    self.battery_voltage = index['battery_voltage'][ind:ind+1].copy()
 
     # --- Read in the actual data --- #
+    self.data = read_burst(self.header.fn,index,ind)
 
-    # Go to the end of the header
-    end_byte = b'*** End Header ***'
-    data_ind = fid.read(max_header_len).rfind(end_byte) + len(end_byte)
-    fid.seek(data_ind)
-
-    # Only if all the bursts were read
-    if burst_count != burst+1:
-        # too few bursts in file
-        self.flags.file_read_code = 'Burst' + str(self.bnum) + 'not found in file' + self.header.fn
-        self.bnum = burst_count - 1
-        raise TypeError('Burst ' + str(self.bnum) + ' not found in file ' + self.header.fn)
-    else:
-        # TODO: Check the other readers for average == 1 or average == 2
-        if self.average == 2:
-            self.data = np.fromfile(fid,dtype='uint32',count=self.cnum*self.snum)
-        elif self.average == 1:
-            fid.seek(burst_pointer+1)
-            self.data = np.fromfile(fid,dtype='float4',count=self.cnum*self.snum)
-        else:
-            self.data = np.fromfile(fid,dtype='uint16',count=self.cnum*self.snum)
-
-        if fid.tell()-(burst_pointer-1) < self.cnum*self.snum:
-            self.flags.file_read_code = 'Corrupt header in burst' + str(burst_count) + 'for file' + self.header.fn
-
-        self.data[self.data<0] = self.data[self.data<0] + 2**16.
-        self.data = self.data.astype(float) * 2.5/2**16.
-
-        if self.average == 2:
-            self.data /= (self.n_subbursts*self.header.n_attenuators)
-
-        start_ind = np.transpose(np.arange(0,self.snum*self.cnum,self.snum))
-        end_ind = start_ind + self.snum
-        self.bnum = burst
-
-    fid.close()
+    start_ind = np.transpose(np.arange(0,self.snum*self.cnum,self.snum))
+    end_ind = start_ind + self.snum
+    self.bnum = burst
 
     # Clean temperature record (wrong data type?)
     self.temperature1[self.temperature1>300] -= 512
@@ -332,3 +407,30 @@ def load_burst(self,burst=1,fs=40000,max_header_len=2000,burst_pointer=0):
 
     return start_ind,end_ind
 
+
+def read_burst(fn_apres,index,ind):
+    """
+    Read the voltages of one burst, straight from the file.
+
+    Parameters
+    ---------
+    fn_apres: string
+        file name
+    index: dict
+        burst index from index_bursts
+    ind: int
+        which burst (from 0)
+
+    Output
+    ---------
+    data: np.ndarray (cnum*snum,)
+        voltages of all the chirps in the burst, one after the other
+    """
+    average = int(index['average'][ind])
+    data = np.memmap(fn_apres,dtype=_SAMPLE_DTYPES[average],mode='r',
+                     offset=int(index['data_offset'][ind]),
+                     shape=(int(index['cnum'][ind]*index['snum'][ind]),))
+    data = data.astype(float) * 2.5/2**16.
+    if average == 2:
+        data /= (index['n_subbursts'][ind]*index['n_attenuators'][ind])
+    return data
@@ -0,0 +1,241 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+"""Find and keep track of crossovers among many radar profiles."""
+
+import os
+import hashlib
+import numpy as np
+from scipy.spatial import cKDTree as KDTree
+
+from .ImpdarError import ImpdarError
+
+
+class CrossoverIndex():
+    """The crossovers within a survey of radar profiles.
+
+    A KD-tree is built for each profile at most once, and each pair of
+    profiles with overlapping extents is searched for all the places where
+    they come within some tolerance of each other, so there can be multiple
+    crossovers per pair. Since this is slow for big surveys, the crossovers
+    can be cached to disk; they are keyed on the coordinates of the
+    profiles, so they are recalculated if the coordinates change.
+
+    Parameters
+    ----------
+    dats: list of impdar.lib.RadarData.RadarData
+        The profiles. These need projected coordinates (x_coord, y_coord).
+    tol: float, optional
+        Profiles closer than this (in the units of x_coord) are crossing.
+        Default is the larger of the median trace spacings of each pair.
+    cache_fn: str, optional
+        A .npz file in which to cache crossovers. Default is no caching.
+    pairs: list of 2-tuples, optional
+        Only search these pairs of profiles (indices in dats), e.g. from
+        :meth:`~impdar.lib.SurveyIndex.SurveyIndex.crossing_pairs`.
+        Default is all pairs.
+
+    Attributes
+    ----------
+    prof1: np.ndarray (ncross,)
+        The index in dats of the first profile at each crossover
+    prof2: np.ndarray (ncross,)
+        The index in dats of the second profile at each crossover
+    tnum1: np.ndarray (ncross,)
+        The trace in the first profile at each crossover
+    tnum2: np.ndarray (ncross,)
+        The trace in the second profile at each crossover
+    dist: np.ndarray (ncross,)
+        The distance between the two traces at each crossover
+    """
+
+    attrs = ['prof1', 'prof2', 'tnum1', 'tnum2', 'dist']
+
+    def __init__(self, dats, tol=None, cache_fn=None, pairs=None):
+        for dat in dats:
+            if dat.x_coord is None or dat.y_coord is None:
+                raise ImpdarError('Crossovers require projected coordinates')
+        self.dats = dats
+        self.tol = tol
+        self.cache_fn = cache_fn
+        self.pairs = None if pairs is None else set((min(pair), max(pair)) for pair in pairs)
+        self.keys = [_coord_key(dat) for dat in dats]
+        self._trees = {}
+        self._cache = {}
+        if cache_fn is not None and os.path.exists(cache_fn):
+            with np.load(cache_fn) as cache:
+                self._cache = {key: cache[key] for key in cache.files}
+        self.find_crossovers()
+
+    def get_tree(self, prof):
+        """Get the KD-tree of the coordinates of a profile, building it once.
+
+        Parameters
+        ----------
+        prof: int
+            The index of the profile in dats
+
+        Returns
+        -------
+        scipy.spatial.cKDTree
+            Tree of the (x, y) coordinates of the traces
+        """
+        if prof not in self._trees:
+            self._trees[prof] = KDTree(_coords(self.dats[prof]))
+        return self._trees[prof]
+
+    def find_crossovers(self):
+        """Find all the crossovers among all the profiles.
+
+        Each pair is looked up in the cache first, and only searched if it
+        is not there. The cache file is rewritten if anything new was found.
+        """
+        crossovers = []
+        new_pairs = False
+        extents = np.array([_extent(dat) for dat in self.dats])
+        for i in range(len(self.dats)):
+            for j in range(i + 1, len(self.dats)):
+                if self.pairs is not None and (i, j) not in self.pairs:
+                    continue
+                tol = self._pair_tol(i, j)
+                key = '{:s}_{:s}_{:f}'.format(self.keys[i], self.keys[j], tol)
+                if key in self._cache:
+                    tnum1, tnum2, dist = self._cache[key]
+                else:
+                    tnum1, tnum2, dist = self._find_pair(i, j, tol, extents)
+                    self._cache[key] = np.vstack((tnum1, tnum2, dist))
+                    new_pairs = True
+                crossovers.append(np.vstack((np.ones_like(tnum1) * i,
+                                             np.ones_like(tnum1) * j,
+                                             tnum1, tnum2, dist)))
+        if len(crossovers) > 0:
+            crossovers = np.hstack(crossovers)
+        else:
+            crossovers = np.zeros((len(self.attrs), 0))
+        for attr, val in zip(self.attrs, crossovers):
+            if attr == 'dist':
+                setattr(self, attr, val)
+            else:
+                setattr(self, attr, val.astype(int))
+
+        if new_pairs and self.cache_fn is not None:
+            np.savez(self.cache_fn, **self._cache)
+
+    def _pair_tol(self, i, j):
+        if self.tol is not None:
+            return float(self.tol)
+        return max(_trace_spacing(self.dats[i]), _trace_spacing(self.dats[j]))
+
+    def _find_pair(self, i, j, tol, extents):
+        """Find all the crossovers of one pair of profiles.
+
+        Every run of consecutive traces in profile j that are within tol of
+        profile i is a crossover, located at the closest trace in the run.
+        """
+        empty = (np.zeros((0,)), np.zeros((0,)), np.zeros((0,)))
+        if np.any(extents[i, :2] - tol > extents[j, 2:]) or np.any(
+                extents[j, :2] - tol > extents[i, 2:]):
+            return empty
+
+        dist, inds = self.get_tree(i).query(_coords(self.dats[j]),
+                                            distance_upper_bound=tol)
+        close = np.zeros((len(dist) + 2,), dtype=int)
+        close[1:-1] = np.isfinite(dist)
+        switches = np.diff(close)
+        starts = np.where(switches == 1)[0]
+        ends = np.where(switches == -1)[0]
+        if len(starts) == 0:
+            return empty
+
+        tnum2 = np.array([start + np.argmin(dist[start:end])
+                          for start, end in zip(starts, ends)])
+        return inds[tnum2], tnum2, dist[tnum2]
+
+    def pick_mismatches(self, picknums=None, target_out=None):
+        """Get the mismatch in pick depth at every crossover.
+
+        Parameters
+        ----------
+        picknums: list of ints, optional
+            The picks to compare. Default is all picks in any profile.
+        target_out: str, optional
+            The z coordinate to compare. Options are depth, twtt, elev, snum.
+            Default is depth if there is nmo_depth, otherwise twtt.
+
+        Returns
+        -------
+        list
+            The pick numbers, in the order of the columns of the output
+        np.ndarray (ncross, npicks)
+            The pick value in prof1 minus that in prof2 at each crossover.
+            NaN where either profile lacks the pick.
+        """
+        if picknums is None:
+            picknums = _all_picknums(self.dats)
+
+        vals = []
+        for prof, tnums in ((self.prof1, self.tnum1), (self.prof2, self.tnum2)):
+            val = np.zeros((len(tnums), len(picknums)))
+            val[:, :] = np.nan
+            for dat_ind in np.unique(prof):
+                mask = prof == dat_ind
+                val[mask, :] = _pick_vals(self.dats[dat_ind], tnums[mask],
+                                          picknums, target_out)
+            vals.append(val)
+        return picknums, vals[0] - vals[1]
+
+
+def _all_picknums(dats):
+    picknums = set()
+    for dat in dats:
+        if dat.picks is not None and dat.picks.picknums is not None:
+            picknums.update(dat.picks.picknums)
+    return sorted(picknums)
+
+
+def _pick_vals(dat, tnums, picknums, target_out):
+    """Get the pick values (depth, twtt, etc.) at some traces."""
+    val = np.zeros((len(tnums), len(picknums)))
+    val[:, :] = np.nan
+    if dat.picks is None or dat.picks.samp2 is None:
+        return val
+    out_name, target_out_array = dat._get_pick_targ_info(target_out)
+    for j, picknum in enumerate(picknums):
+        if picknum not in dat.picks.picknums:
+            continue
+        samps = dat.picks.samp2[list(dat.picks.picknums).index(picknum), tnums]
+        mask = ~np.isnan(samps)
+        val[mask, j] = target_out_array[samps[mask].astype(int)]
+        if out_name == 'elev':
+            val[mask, j] = dat.elev[tnums[mask]] - val[mask, j]
+    return val
+
+
+def _coords(dat):
+    return np.vstack((dat.x_coord.flatten(), dat.y_coord.flatten())).transpose()
+
+
+def _extent(dat):
+    return [np.nanmin(dat.x_coord), np.nanmin(dat.y_coord),
+            np.nanmax(dat.x_coord), np.nanmax(dat.y_coord)]
+
+
+def _trace_spacing(dat):
+    spacing = np.sqrt(np.diff(dat.x_coord.flatten()) ** 2.0 +
+                      np.diff(dat.y_coord.flatten()) ** 2.0)
+    spacing = spacing[spacing > 0]
+    if len(spacing) == 0:
+        return 0.
+    return float(np.nanmedian(spacing))
+
+
+def _coord_key(dat):
+    """Hash the coordinates of a profile so we know if the cache is stale."""
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(dat.x_coord, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(dat.y_coord, dtype=np.float64).tobytes())
+    return sha.hexdigest()
@@ -246,49 +246,38 @@ class Picks():
         b, a = butter(3, corner_freq, 'low')
         padlen = 12
 
-        for attr in ['samp1', 'samp2', 'samp3']:
-            dat = getattr(self, attr)
-            for row in range(dat.shape[0]):
-                # We cannot smooth if there are gaps in the middle
-                # But we do want to smooth everything, so iterate through non-nan chunks
-                nn = np.where(~np.isnan(dat[row, :]))[0]
-                isn = np.where(np.isnan(dat[row, :]))[0]
-                if len(nn) == 0:
-                    continue
-                else:
-                    start_ind = nn[0]
-                while start_ind < self.radardata.tnum:
-                    nans_remaining = isn[isn > start_ind]
-                    if len(nans_remaining) > 0:
-                        # Smooth a chunk that does not reach the right
-                        end_ind = isn[isn > start_ind][0]
-
-                        # need to check that the chunk is long enough to smooth
-                        if end_ind - start_ind < padlen:
-                            # If we still have remaining non-nans, update start_ind
-                            # otherwise, we are done
-                            if len(nn[nn > end_ind]) > 0:
-                                start_ind = nn[nn > end_ind][0]
-                                continue
-                            else:
-                                break
-
-                        dat[row, start_ind:end_ind] = np.around(
-                            filtfilt(b, a, dat[row, start_ind:end_ind], padlen=padlen))
-
-                        # If we still have remaining non-nans, update start_ind
-                        # otherwise, we are done
-                        if len(nn[nn > end_ind]) > 0:
-                            start_ind = nn[nn > end_ind][0]
-                        else:
-                            break
-                    else:
-                        # Everything left is not nan
-                        if self.radardata.tnum - start_ind < nsamp:
-                            break
-                        dat[row, start_ind:] = np.around(filtfilt(b, a, dat[row, start_ind:], padlen=padlen))
-                        break
-            setattr(self, attr, dat)
+        # Smooth samp1, samp2, and samp3 together--they share gaps
+        attrs = ['samp1', 'samp2', 'samp3']
+        dat = np.vstack([getattr(self, attr) for attr in attrs])
+
+        # We cannot smooth if there are gaps in the middle
+        # But we do want to smooth everything, so find all the non-nan chunks
+        # at once from where the mask switches on and off
+        notnan = np.zeros((dat.shape[0], dat.shape[1] + 2), dtype=int)
+        notnan[:, 1:-1] = ~np.isnan(dat)
+        switches = np.diff(notnan, axis=1)
+        rows, starts = np.nonzero(switches == 1)
+        ends = np.nonzero(switches == -1)[1]
+
+        # chunks need to be long enough to pad, and chunks that run off the
+        # right side need to hold at least one wavelength
+        lengths = ends - starts
+        long_enough = (lengths > padlen) & (
+            (ends < self.radardata.tnum) | (lengths >= nsamp))
+
+        # Filter all the rows with the same chunk in a single call
+        chunks = np.vstack((starts, ends))[:, long_enough]
+        rows = rows[long_enough]
+        chunks, chunk_inds = np.unique(chunks, axis=1, return_inverse=True)
+        chunk_inds = chunk_inds.flatten()
+        for i, (start_ind, end_ind) in enumerate(chunks.T):
+            chunk_rows = rows[chunk_inds == i]
+            dat[chunk_rows, start_ind:end_ind] = np.around(
+                filtfilt(b, a, dat[chunk_rows, start_ind:end_ind], axis=1,
+                         padlen=padlen))
+
+        for attr, attr_dat in zip(attrs, np.split(dat, len(attrs))):
+            setattr(self, attr, attr_dat)
 
     def reverse(self):
         """Flip left-right.
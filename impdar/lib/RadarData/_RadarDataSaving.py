@@ -7,7 +7,9 @@
 # Distributed under terms of the GNU GPL3.0 license.
 
 """Methods for saving radar data in different formats."""
+import os
 from ..gpslib import get_conversion
+from .. import segylib
 import numpy as np
 from scipy.io import savemat
 from ..RadarFlags import RadarFlags
@@ -19,12 +21,14 @@ try:
 except ImportError:
     CONVERSIONS_ENABLED = False
 
-# Try to enable saving to segy
+# Use arrow to pass whole arrays to ogr if we can, and for columnar output
 try:
-    import segyio
-    SEGY = True
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    PYARROW = True
 except ImportError:
-    SEGY = False
+    PYARROW = False
 
 
 def save(self, fn):
@@ -79,6 +83,9 @@ def save(self, fn):
 def save_as_segy(self, fn):
     """Save as a (non standard-compliant) SEGY file that can be used with, e.g., SeisUNIX.
 
+    The sample interval is written in picoseconds, and projected coordinates,
+    if we have them, go in the CDP coordinates (in decimeters).
+
     Parameters
     ----------
     fn: str
@@ -86,15 +93,10 @@ def save_as_segy(self, fn):
 
     Raises
     ------
-    ImportError
-        If segyio cannot be imported.
+    ValueError
+        If dt is too big or too small to put in the header.
     """
-    if not SEGY:
-        raise ImportError('segyio failed to import, cannot save as segy')
-
-    segyio.tools.from_array2D(fn,
-                              np.ascontiguousarray(self.data.transpose(), np.float32),
-                              dt=self.dt * 1.0e12)
+    segylib.write_segy(fn, self.data, self.dt, x_coord=self.x_coord, y_coord=self.y_coord)
 
 
 def output_shp(self, fn, t_srs=None, target_out=None):
@@ -104,6 +106,7 @@ def output_shp(self, fn, t_srs=None, target_out=None):
     If not, we will only output the tracenumber.
     This function requires osr/gdal for shapefile creation.
     I suggest exporting a csv if you don't want to deal with gdal.
+    If fn ends in .gpkg, we write a GeoPackage rather than a shapefile.
 
     Parameters
     ----------
@@ -125,6 +128,71 @@ def output_shp(self, fn, t_srs=None, target_out=None):
     if not CONVERSIONS_ENABLED:
         raise ImportError('osgeo could not be imported')
 
+    pts, t_srs = self._get_output_pts(t_srs)
+    field_names, field_vals = self._get_pick_fields(target_out)
+    _write_points(fn, t_srs, pts,
+                  ['TraceNum'] + field_names,
+                  [np.arange(self.tnum) + 1] + field_vals)
+
+
+def output_survey_shp(dats, fn, t_srs=None, target_out=None):
+    """Output the traces of many profiles as a single layer.
+
+    This is the same as output_shp, but with all the profiles in one file,
+    with a FileName field to tell them apart. Any pick in any of the profiles
+    gets a field; profiles lacking that pick get NaNs.
+
+    Parameters
+    ----------
+    dats: list of impdar.lib.RadarData.RadarData
+        The profiles to write
+    fn: str
+        The filename of the output (.shp or .gpkg)
+    t_srs: int, optional
+        EPSG number of the target spatial reference system. Default 4326 (wgs84)
+    target_out: str, optional
+        Used to overwrite the default output format of picks.
+        (options are depth, elev, twtt, snum)
+
+    Raises
+    ------
+    ImportError
+        If osgeo cannot be imported
+    ValueError
+        If the profiles end up in different projections
+    """
+    if not CONVERSIONS_ENABLED:
+        raise ImportError('osgeo could not be imported')
+
+    all_pts = []
+    all_fields = []
+    out_srs = None
+    for dat in dats:
+        pts, dat_srs = dat._get_output_pts(t_srs)
+        if out_srs is not None and dat_srs != out_srs:
+            raise ValueError('Profiles are in different projections; specify t_srs')
+        out_srs = dat_srs
+        all_pts.append(pts)
+        all_fields.append(dict(zip(*dat._get_pick_fields(target_out))))
+
+    field_names = []
+    for fields in all_fields:
+        field_names.extend([name for name in fields if name not in field_names])
+
+    field_vals = [np.hstack([np.ones((dat.tnum,), dtype=int) * i for i, dat in enumerate(dats)]),
+                  np.hstack([np.arange(dat.tnum) + 1 for dat in dats])]
+    for name in field_names:
+        field_vals.append(np.hstack([fields.get(name, np.ones((dat.tnum,)) * np.nan)
+                                     for fields, dat in zip(all_fields, dats)]))
+
+    # Map the file indices to names at the end so we only have one big string array
+    field_vals[0] = np.array([str(dat.fn) for dat in dats])[field_vals[0]]
+    _write_points(fn, out_srs, np.vstack(all_pts),
+                  ['FileName', 'TraceNum'] + field_names, field_vals)
+
+
+def _get_output_pts(self, t_srs):
+    """Get the coordinates of the traces, and the projection, for output."""
     if t_srs is not None:
         # We overwrite the t_srs with the WKT version
         cT, t_srs = get_conversion(t_srs=t_srs)
@@ -139,49 +207,113 @@ def output_shp(self, fn, t_srs=None, target_out=None):
                 print('Writing wgs84; specify t_srs for projected output.')
             pts = np.vstack((self.long, self.lat)).transpose()
             t_srs = 'EPSG:3426'
+    return pts[:, :2], t_srs
+
+
+def _get_pick_fields(self, target_out):
+    """Get the pick values of every trace as arrays, named for output.
+
+    Returns
+    -------
+    list of str
+        Field names, L[picknum]_[out_name]
+    list of np.ndarray
+        (tnum,) arrays of the pick values, NaN where unpicked
+    """
+    if self.picks is None or self.picks.samp2 is None:
+        return [], []
+    out_name, target_out_array = self._get_pick_targ_info(target_out)
+    names = ['L{:d}_{:s}'.format(picknum, out_name) for picknum in self.picks.picknums]
+
+    picked = ~np.isnan(self.picks.samp2)
+    vals = np.zeros(self.picks.samp2.shape)
+    vals[:, :] = np.nan
+    vals[picked] = target_out_array[self.picks.samp2[picked].astype(int)]
+    if out_name == 'elev':
+        vals = self.elev[None, :] - vals
+    return names, [val for val in vals]
+
+
+def _write_points(fn, t_srs, pts, field_names, field_vals):
+    """Write points with attributes in bulk.
+
+    The attribute columns are prepared as arrays up front. If OGR can take
+    arrow arrays (GDAL>=3.8, with pyarrow) the whole layer goes in at once;
+    otherwise we make the features in a single transaction, without any text
+    formatting or field lookups per trace.
 
-    driver = ogr.GetDriverByName('ESRI Shapefile')
+    Parameters
+    ----------
+    fn: str
+        The output filename. .gpkg gets a GeoPackage, anything else a shapefile
+    t_srs: str
+        The spatial reference system, as anything osr can SetFromUserInput
+    pts: np.ndarray
+        (npts, 2) x and y of the points
+    field_names: list of str
+        Names of the attributes
+    field_vals: list of np.ndarray
+        (npts,) value of each attribute. Ints, floats, and strs are supported.
+    """
+    if os.path.splitext(fn)[1].lower() == '.gpkg':
+        driver = ogr.GetDriverByName('GPKG')
+    else:
+        driver = ogr.GetDriverByName('ESRI Shapefile')
     data_source = driver.CreateDataSource(fn)
     out_srs = osr.SpatialReference()
     out_srs.SetFromUserInput(t_srs)
     layer = data_source.CreateLayer('traces', out_srs, ogr.wkbPoint)
-    layer.CreateField(ogr.FieldDefn('TraceNum', ogr.OFTInteger))
 
-    if self.picks is not None and self.picks.samp2 is not None:
-        out_name, target_out_array = self._get_pick_targ_info(target_out)
-        for picknum in self.picks.picknums:
-            layer.CreateField(ogr.FieldDefn('L{:d}_{:s}'.format(picknum, out_name), ogr.OFTReal))
-
-    # Process the text file and add the attributes and features to the shapefile
-    for trace in range(self.tnum):
-        feature = ogr.Feature(layer.GetLayerDefn())
-        feature.SetField('TraceNum', trace + 1)
-        if self.picks is not None and self.picks.samp2 is not None:
-            for i, picknum in enumerate(self.picks.picknums):
-                if out_name != 'elev':
-                    if not np.isnan(self.picks.samp2[i, trace]):
-                        feature.SetField('L{:d}_{:s}'.format(picknum, out_name),
-                                         target_out_array[int(self.picks.samp2[i, trace])])
-                    else:
-                        feature.SetField('L{:d}_{:s}'.format(picknum, out_name), np.nan)
-
-                else:
-                    if not np.isnan(self.picks.samp2[i, trace]):
-                        feature.SetField('L{:d}_{:s}'.format(picknum, out_name),
-                                         self.elev[trace] - target_out_array[
-                                             int(self.picks.samp2[i, trace])])
-                    else:
-                        feature.SetField('L{:d}_{:s}'.format(picknum, out_name), np.nan)
-
-        x, y = pts[trace, 0], pts[trace, 1]
-        wkt = 'POINT({:f} {:f})'.format(x, y)
-        point = ogr.CreateGeometryFromWkt(wkt)
-        feature.SetGeometry(point)
-        layer.CreateFeature(feature)
-        feature = None
+    if PYARROW and hasattr(layer, 'WritePyArrow'):
+        schema = pa.schema([pa.field(name, pa.array(val[:0]).type)
+                            for name, val in zip(field_names, field_vals)])
+        for field in schema:
+            layer.CreateFieldFromPyArrowSchema(field)
+        schema = schema.append(pa.field('geometry', pa.binary(),
+                                        metadata={'ARROW:extension:name': 'ogc.wkb'}))
+        table = pa.table([pa.array(val) for val in field_vals] + [_wkb_points(pts)],
+                         schema=schema)
+        layer.WritePyArrow(table)
+    else:
+        for name, val in zip(field_names, field_vals):
+            if val.dtype.kind in 'iu':
+                layer.CreateField(ogr.FieldDefn(name, ogr.OFTInteger))
+            elif val.dtype.kind in 'US':
+                layer.CreateField(ogr.FieldDefn(name, ogr.OFTString))
+            else:
+                layer.CreateField(ogr.FieldDefn(name, ogr.OFTReal))
+        defn = layer.GetLayerDefn()
+        field_inds = [defn.GetFieldIndex(name) for name in field_names]
+        # python scalars are much quicker for ogr than numpy ones
+        cols = [val.tolist() for val in field_vals]
+        x_coords, y_coords = pts[:, 0].tolist(), pts[:, 1].tolist()
+        layer.StartTransaction()
+        for i in range(pts.shape[0]):
+            feature = ogr.Feature(defn)
+            for field_ind, col in zip(field_inds, cols):
+                feature.SetField(field_ind, col[i])
+            point = ogr.Geometry(ogr.wkbPoint)
+            point.AddPoint_2D(x_coords[i], y_coords[i])
+            feature.SetGeometryDirectly(point)
+            layer.CreateFeature(feature)
+        layer.CommitTransaction()
     data_source = None
 
 
+def _wkb_points(pts):
+    """Make little-endian WKB points from x and y without a python loop."""
+    wkb = np.zeros((pts.shape[0],), dtype=[('order', 'u1'), ('type', '<u4'),
+                                           ('x', '<f8'), ('y', '<f8')])
+    wkb['order'] = 1
+    wkb['type'] = 1
+    wkb['x'] = pts[:, 0]
+    wkb['y'] = pts[:, 1]
+    offsets = np.arange(pts.shape[0] + 1, dtype=np.int32) * wkb.dtype.itemsize
+    return pa.BinaryArray.from_buffers(pa.binary(), pts.shape[0],
+                                       [None, pa.py_buffer(offsets),
+                                        pa.py_buffer(wkb.tobytes())])
+
+
 def output_csv(self, fn, target_out=None, delimiter=','):
     """Output a csv of the traces.
 
@@ -217,6 +349,78 @@ def output_csv(self, fn, target_out=None, delimiter=','):
     np.savetxt(fn, outs.transpose(), header=header, delimiter=delimiter)
 
 
+def output_parquet(self, fn, target_out=None):
+    """Output a table of the traces and picks with typed columns.
+
+    This holds the same information as output_csv, and a bit more, but is
+    much smaller and faster to read back in bulk (see
+    impdar.lib.load.load_pick_table.load_pick_table).
+    There is a row for each trace, with columns FileName, TraceNum, and lat,
+    long, x_coord, y_coord, elev, and decday if we have them. Then each pick
+    gets L[picknum]_[out_name], L[picknum]_twtt, and L[picknum]_power.
+    If fn ends in .feather or .arrow, we write Feather rather than Parquet.
+
+    Parameters
+    ----------
+    fn: str
+        The filename of the output
+    target_out: str, optional
+        Used to overwrite the default output format of picks.
+        By default, try to write depth and if there is no nmo_depth use TWTT.
+        (options are depth, elev, twtt, snum)
+
+    Raises
+    ------
+    ImportError
+        If pyarrow cannot be imported
+    """
+    if not PYARROW:
+        raise ImportError('pyarrow could not be imported')
+    names, vals = self._get_pick_table(target_out)
+    table = pa.table([pa.array(val) for val in vals], names=names)
+    if os.path.splitext(fn)[1].lower() in ['.feather', '.arrow']:
+        feather.write_feather(table, fn)
+    else:
+        pq.write_table(table, fn)
+
+
+def _get_pick_table(self, target_out):
+    """Get the columns for a table of traces and picks.
+
+    Returns
+    -------
+    list of str
+        Column names
+    list of np.ndarray
+        (tnum,) arrays of the values in each column
+    """
+    names = ['FileName', 'TraceNum']
+    vals = [np.array([str(self.fn)] * self.tnum), np.arange(self.tnum, dtype=np.int32) + 1]
+    for attr in ['lat', 'long', 'x_coord', 'y_coord', 'elev', 'decday']:
+        val = getattr(self, attr, None)
+        if val is None:
+            continue
+        val = np.asarray(val, dtype=np.float64).flatten()
+        # .mat files store missing values as scalars, so skip anything not per trace
+        if val.shape == (self.tnum,):
+            names.append(attr)
+            vals.append(val)
+
+    pick_names, pick_vals = self._get_pick_fields(target_out)
+    if len(pick_names) == 0:
+        return names, vals
+    twtt_names, twtt_vals = self._get_pick_fields('twtt')
+    for i, picknum in enumerate(self.picks.picknums):
+        names.append(pick_names[i])
+        vals.append(pick_vals[i])
+        if twtt_names[i] != pick_names[i]:
+            names.append(twtt_names[i])
+            vals.append(twtt_vals[i])
+        names.append('L{:d}_power'.format(picknum))
+        vals.append(np.asarray(self.picks.power[i], dtype=np.float64))
+    return names, vals
+
+
 def _get_pick_targ_info(self, target_out):
     """Get the rate type of pick information for returning.
 
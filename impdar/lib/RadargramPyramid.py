@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+"""Decimated copies of a radargram, for displaying very long profiles."""
+
+import os
+import hashlib
+import numpy as np
+
+
+class RadargramPyramid():
+    """Successively decimated copies of a radargram, preserving peaks.
+
+    A screen is a few thousand pixels across, so there is no point in handing
+    100k traces to imshow. Each level has half the traces of the one before
+    it. Every block of traces is replaced by two columns, its minimum and its
+    maximum, so bright reflectors and dark gaps survive the decimation rather
+    than being averaged or aliased away. Level 0 is the data itself.
+
+    Parameters
+    ----------
+    data: np.ndarray (snum x tnum)
+        The (already normalized, e.g. in dB) values to display
+    min_traces: int, optional
+        Stop decimating once a level has fewer traces than this. Default 1024.
+    cache_fn: str, optional
+        A .npz file in which to cache the levels. They are reused if the
+        data has not changed, and written if they had to be made.
+
+    Attributes
+    ----------
+    levels: list of np.ndarray
+        The data at each level. Levels after the first are float32.
+    """
+
+    def __init__(self, data, min_traces=1024, cache_fn=None):
+        self.levels = [data]
+        # Hashing all the data is only worth it if there is a cache
+        key = _data_key(data, min_traces) if cache_fn is not None else None
+        if cache_fn is not None and os.path.exists(cache_fn):
+            with np.load(cache_fn) as cache:
+                if str(cache['key']) == key:
+                    self.levels += [cache['level_{:d}'.format(i + 1)]
+                                    for i in range(int(cache['nlevels']) - 1)]
+                    return
+
+        while self.levels[-1].shape[1] >= 2 * min_traces:
+            self.levels.append(_decimate_minmax(self.levels[-1]))
+
+        if cache_fn is not None and len(self.levels) > 1:
+            try:
+                np.savez(cache_fn, key=key, nlevels=len(self.levels),
+                         **{'level_{:d}'.format(i): level
+                            for i, level in enumerate(self.levels) if i > 0})
+            except OSError:
+                # Read-only directories just do not get a cache
+                pass
+
+    @property
+    def nlevels(self):
+        """The number of levels, including the full data"""
+        return len(self.levels)
+
+    def choose_level(self, ntraces, npixels):
+        """The coarsest level with at least one trace per pixel.
+
+        Parameters
+        ----------
+        ntraces: int
+            The number of (full resolution) traces to display
+        npixels: int or float
+            The number of pixels to display them in
+
+        Returns
+        -------
+        int
+            The level to use
+        """
+        if npixels <= 0 or ntraces <= npixels:
+            return 0
+        return int(min(np.floor(np.log2(ntraces / npixels)), self.nlevels - 1))
+
+    def get_window(self, x_range, npixels, y_range=(0, None)):
+        """Get the data of a window of traces at the resolution of the screen.
+
+        Parameters
+        ----------
+        x_range: 2-tuple
+            The traces to display, (start, end) in full-resolution indices
+        npixels: int or float
+            The number of pixels in which to display them
+        y_range: 2-tuple, optional
+            The samples to display. Default all.
+
+        Returns
+        -------
+        np.ndarray
+            The data in the window, with approximately
+            max(npixels, (end - start) / 2 ** (nlevels - 1)) traces
+        int
+            The level used
+        """
+        level = self.choose_level(x_range[1] - x_range[0], npixels)
+        step = 2 ** level
+        return self.levels[level][y_range[0]:y_range[1],
+                                  x_range[0] // step:-(-x_range[1] // step)], level
+
+
+def _decimate_minmax(data):
+    """Halve the traces, turning each block of four into its min and max"""
+    snum, tnum = data.shape
+    # Repeating the last trace pads without changing any block's min or max
+    pad = (-tnum) % 4
+    if pad:
+        data = np.hstack((data, np.repeat(data[:, -1:], pad, axis=1)))
+    blocks = data.reshape((snum, -1, 4))
+    out = np.empty((snum, blocks.shape[1], 2), dtype=np.float32)
+    # fmin/fmax ignore nans unless the whole block is nan
+    out[:, :, 0] = np.fmin.reduce(blocks, axis=2)
+    out[:, :, 1] = np.fmax.reduce(blocks, axis=2)
+    return out.reshape((snum, -1))
+
+
+def _data_key(data, min_traces):
+    """A fingerprint of the data, to see if a cache is stale"""
+    sha = hashlib.sha1()
+    sha.update(str((data.shape, str(data.dtype), min_traces)).encode())
+    # Hash in blocks of traces so we never copy all the data at once
+    step = max(1, 2 ** 20 // max(data.shape[0], 1))
+    for i in range(0, data.shape[1], step):
+        sha.update(np.ascontiguousarray(data[:, i:i + step]).tobytes())
+    return sha.hexdigest()
@@ -0,0 +1,312 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+"""A lightweight spatial index of where many radar profiles go."""
+
+import numpy as np
+from scipy.spatial import cKDTree as KDTree
+
+from .ImpdarError import ImpdarError
+from .RadarData import RadarData
+from .CrossoverIndex import CrossoverIndex
+
+
+class SurveyIndex():
+    """Decimated trace locations of many profiles, for finding files by location.
+
+    This lets us figure out which profiles pass near some point, or through
+    some box, without loading all of them. We keep every `decimate`th trace
+    (plus the last) of each profile and remember which file and trace it came
+    from, and this can be saved to and loaded from a small .npz file.
+    Queries are padded by the largest gap between kept traces, so they may
+    return a few extra traces but should not miss any. The index can also
+    find which profiles might cross, so that crossovers are only searched
+    for among those (see :meth:`crossovers`).
+
+    ImpDAR .mat files cannot be partially read, so a profile that matches a
+    query is still read in full before it is cropped; the savings come from
+    the profiles that are not read at all.
+
+    Parameters
+    ----------
+    fn: str, optional
+        A previously saved index to load. Default is an empty index.
+    decimate: int, optional
+        Keep every decimate-th trace. Default 10. Ignored if loading.
+    t_srs: str, optional
+        Projection (e.g. EPSG:3031) used for files without x_coord/y_coord.
+        Default None, in which case all files need projected coordinates.
+
+    Attributes
+    ----------
+    fns: list of str
+        The files in the index
+    file_inds: np.ndarray (npts,)
+        The index in fns of each kept trace
+    tnums: np.ndarray (npts,)
+        The (0-indexed) trace number of each kept trace
+    x_coord: np.ndarray (npts,)
+        The x coordinate of each kept trace
+    y_coord: np.ndarray (npts,)
+        The y coordinate of each kept trace
+    tnum_total: np.ndarray (nfiles,)
+        The number of traces in each file
+    step: np.ndarray (nfiles,)
+        The largest distance between kept traces in each file
+    """
+
+    attrs = ['fns', 'file_inds', 'tnums', 'x_coord', 'y_coord', 'tnum_total',
+             'step']
+
+    def __init__(self, fn=None, decimate=10, t_srs=None):
+        self.t_srs = t_srs
+        self.decimate = decimate
+        self._tree = None
+        self._tree_inds = None
+        if fn is not None:
+            with np.load(fn) as index:
+                for attr in self.attrs:
+                    setattr(self, attr, index[attr])
+                self.decimate = int(index['decimate'])
+                if index['t_srs'].size > 0:
+                    self.t_srs = str(index['t_srs'])
+            self.fns = self.fns.tolist()
+        else:
+            self.fns = []
+            self.file_inds = np.zeros((0,), dtype=int)
+            self.tnums = np.zeros((0,), dtype=int)
+            self.x_coord = np.zeros((0,))
+            self.y_coord = np.zeros((0,))
+            self.tnum_total = np.zeros((0,), dtype=int)
+            self.step = np.zeros((0,))
+
+    def add_files(self, fns):
+        """Load some ImpDAR .mat files and add them to the index.
+
+        Parameters
+        ----------
+        fns: list of str
+            The files to add
+        """
+        for fn in fns:
+            self.add_data(RadarData(fn))
+
+    def add_data(self, dat):
+        """Add an already-loaded profile to the index.
+
+        Parameters
+        ----------
+        dat: impdar.lib.RadarData.RadarData
+            The profile. Its fn is what gets stored.
+
+        Raises
+        ------
+        ImpdarError
+            If the profile has no projected coordinates and we have no t_srs
+        """
+        if dat.x_coord is None or dat.y_coord is None:
+            if self.t_srs is None:
+                raise ImpdarError('{:s} has no projected coordinates; supply \
+                                  t_srs to project lat/long'.format(str(dat.fn)))
+            dat.get_projected_coords(t_srs=self.t_srs)
+
+        tnums = np.arange(0, dat.tnum, self.decimate)
+        if tnums[-1] != dat.tnum - 1:
+            tnums = np.hstack((tnums, [dat.tnum - 1]))
+        x_coord = dat.x_coord.flatten()[tnums]
+        y_coord = dat.y_coord.flatten()[tnums]
+        if len(tnums) > 1:
+            step = np.nanmax(np.sqrt(np.diff(x_coord) ** 2.0 + np.diff(y_coord) ** 2.0))
+        else:
+            step = 0.
+
+        self.file_inds = np.hstack((self.file_inds,
+                                    np.ones((len(tnums),), dtype=int) * len(self.fns)))
+        self.fns.append(dat.fn)
+        self.tnums = np.hstack((self.tnums, tnums))
+        self.x_coord = np.hstack((self.x_coord, x_coord))
+        self.y_coord = np.hstack((self.y_coord, y_coord))
+        self.tnum_total = np.hstack((self.tnum_total, [dat.tnum]))
+        self.step = np.hstack((self.step, [step]))
+        self._tree = None
+        self._tree_inds = None
+
+    def save(self, fn):
+        """Save the index.
+
+        Parameters
+        ----------
+        fn: str
+            Filename. Should have a .npz extension
+        """
+        out = {attr: getattr(self, attr) for attr in self.attrs}
+        out['fns'] = np.array(self.fns, dtype=str)
+        out['decimate'] = self.decimate
+        out['t_srs'] = np.array(self.t_srs if self.t_srs is not None else [], dtype=str)
+        np.savez(fn, **out)
+
+    def query_point(self, x, y, radius):
+        """Find the profiles passing within some distance of a point.
+
+        Parameters
+        ----------
+        x: float
+            x coordinate of the point
+        y: float
+            y coordinate of the point
+        radius: float
+            The distance from the point to look
+
+        Returns
+        -------
+        list of tuples
+            (fn, first trace, last trace) for each profile nearby.
+            Traces are 0-indexed and the last is inclusive.
+        """
+        if len(self.fns) == 0:
+            return []
+        inds = self._get_tree().query_ball_point([x, y], radius + np.max(self.step) / 2.)
+        return self._matches(self._tree_inds[np.array(inds, dtype=int)])
+
+    def crossing_pairs(self, tol=None):
+        """Find the pairs of profiles that might cross.
+
+        Parameters
+        ----------
+        tol: float, optional
+            Profiles closer than this are crossing. Default is the largest
+            gap between kept traces, which is at least the trace spacing.
+
+        Returns
+        -------
+        list of 2-tuples
+            The indices in fns of each pair of profiles that come near each
+            other, with the first index smaller.
+        """
+        if len(self.fns) < 2:
+            return []
+        if tol is None:
+            tol = np.max(self.step)
+        # Kept traces of two crossing profiles can be up to a gap from the crossing
+        close = self._get_tree().query_pairs(tol + np.max(self.step))
+        pairs = set()
+        for ind1, ind2 in close:
+            file1 = self.file_inds[self._tree_inds[ind1]]
+            file2 = self.file_inds[self._tree_inds[ind2]]
+            if file1 != file2:
+                pairs.add((int(min(file1, file2)), int(max(file1, file2))))
+        return sorted(pairs)
+
+    def crossovers(self, tol=None, cache_fn=None):
+        """Find the crossovers among the indexed profiles.
+
+        Only the profiles that might cross another are loaded, and only the
+        pairs that might cross are searched.
+
+        Parameters
+        ----------
+        tol: float, optional
+            Profiles closer than this are crossing. Default is the larger
+            of the median trace spacings of each pair.
+        cache_fn: str, optional
+            A .npz file in which to cache crossovers. Default no caching.
+
+        Returns
+        -------
+        impdar.lib.CrossoverIndex.CrossoverIndex
+            The crossovers. Its dats are the loaded profiles, and its fns
+            attribute gives the filename of each.
+        """
+        pairs = self.crossing_pairs(tol)
+        file_inds = sorted(set(ind for pair in pairs for ind in pair))
+        local = {file_ind: i for i, file_ind in enumerate(file_inds)}
+        dats = [_load_projected(self.fns[file_ind], self.t_srs) for file_ind in file_inds]
+        crossovers = CrossoverIndex(dats, tol=tol, cache_fn=cache_fn,
+                                    pairs=[(local[i], local[j]) for i, j in pairs])
+        crossovers.fns = [self.fns[file_ind] for file_ind in file_inds]
+        return crossovers
+
+    def _get_tree(self):
+        """KD-tree of the kept traces with coordinates, built once."""
+        if self._tree is None:
+            mask = ~np.isnan(self.x_coord) & ~np.isnan(self.y_coord)
+            self._tree_inds = np.where(mask)[0]
+            self._tree = KDTree(np.vstack((self.x_coord[mask],
+                                           self.y_coord[mask])).transpose())
+        return self._tree
+
+    def query_bbox(self, xmin, ymin, xmax, ymax):
+        """Find the profiles passing through a box.
+
+        Parameters
+        ----------
+        xmin: float
+            Left side of the box
+        ymin: float
+            Bottom of the box
+        xmax: float
+            Right side of the box
+        ymax: float
+            Top of the box
+
+        Returns
+        -------
+        list of tuples
+            (fn, first trace, last trace) for each profile in the box.
+            Traces are 0-indexed and the last is inclusive.
+        """
+        if len(self.fns) == 0:
+            return []
+        buffer = np.max(self.step) / 2.
+        inds = np.where((self.x_coord >= xmin - buffer) & (self.x_coord <= xmax + buffer) &
+                        (self.y_coord >= ymin - buffer) & (self.y_coord <= ymax + buffer))[0]
+        return self._matches(inds)
+
+    def _matches(self, inds):
+        """Convert indices of kept traces to per-file trace ranges."""
+        matches = []
+        for file_ind in np.unique(self.file_inds[inds]):
+            tnums = self.tnums[inds][self.file_inds[inds] == file_ind]
+            # the profile might go anywhere between kept traces
+            matches.append((self.fns[file_ind],
+                            int(max(np.min(tnums) - self.decimate, 0)),
+                            int(min(np.max(tnums) + self.decimate,
+                                    self.tnum_total[file_ind] - 1))))
+        return matches
+
+    @staticmethod
+    def load(matches):
+        """Load just the matching part of each profile from a query.
+
+        Parameters
+        ----------
+        matches: list of tuples
+            (fn, first trace, last trace), as from query_point or query_bbox
+
+        Returns
+        -------
+        list of impdar.lib.RadarData.RadarData
+            The profiles, cropped to the trace ranges.
+            Note that trace_num is renumbered by the crop.
+        """
+        dats = []
+        for fn, tmin, tmax in matches:
+            dat = RadarData(fn)
+            if tmax < dat.tnum - 1:
+                dat.hcrop(tmax + 2, 'right')
+            if tmin > 0:
+                dat.hcrop(tmin + 1, 'left')
+            dats.append(dat)
+        return dats
+
+
+def _load_projected(fn, t_srs):
+    """Load a profile, projecting lat/long if it has no projected coordinates."""
+    dat = RadarData(fn)
+    if (dat.x_coord is None or dat.y_coord is None) and t_srs is not None:
+        dat.get_projected_coords(t_srs=t_srs)
+    return dat
@@ -21,7 +21,7 @@ Sept 26 2019
 """
 
 import numpy as np
-from scipy.signal import detrend,medfilt
+from scipy.signal import medfilt
 from scipy.special import i0
 
 def kirchhoff_roughness(dat,picknum,freq,filt_n=101,eps=3.15):
@@ -31,13 +31,27 @@ def kirchhoff_roughness(dat,picknum,freq,filt_n=101,eps=3.15):
 
     Paramaters
     ----------
+    dat:    RadarData or list of RadarData
+        profile(s) to calculate the roughness for
+    picknum: int
+        pick number of the bed
     freq:   float
         antenna frequency
     filt_n: int; optional
         number of traces included in the median filter
     eps:    float; optional
         relative permittivity of ice
+
+    Output
+    ----------
+    ED1:    array (or list of arrays for a list of profiles)
+        RMS bed roughness in each window, also set as dat.roughness
+    pn:     array (or list of arrays for a list of profiles)
+        power reduction from the roughness, also set as dat.roughness_power
     """
+    if isinstance(dat, (list, tuple)):
+        out = [kirchhoff_roughness(d,picknum,freq,filt_n=filt_n,eps=eps) for d in dat]
+        return [o[0] for o in out],[o[1] for o in out]
 
     if 'interp' not in vars(dat.flags):
         raise KeyError('Do interpolation before roughness calculation.')
@@ -67,19 +81,7 @@ def kirchhoff_roughness(dat,picknum,freq,filt_n=101,eps=3.15):
     bed_filt = medfilt(bed_raw,filt_n)
 
     # RMS bed roughness; Christianson et al. (2016) equation C2
-    ED1 = np.nan*np.empty((len(bed_filt),))
-    for n in range(N,len(bed_filt)-N+1):
-        b = bed_filt[n-N:n+N].copy()
-        b = b[np.where(~np.isnan(b))]
-        if len(b) <= 1:
-            ED1[n] = np.nan
-        else:
-            b_ = detrend(b)
-            b_sum = 0.
-            for i in range(len(b)):
-                b_sum += (b_[i])**2.
-            ED1[n] = np.sqrt((1/(len(b)-1.))*b_sum)
-
+    ED1 = _rolling_detrended_rms(bed_filt,N)
 
     # Find the power reduction by Kirchoff theory
     # Christianson et al. (2016), equation C1
@@ -88,4 +90,42 @@ def kirchhoff_roughness(dat,picknum,freq,filt_n=101,eps=3.15):
     b = (i0((g**2.)/2.))**2.
     pn = np.exp(-(g**2.))*b
 
+    dat.roughness = ED1
+    dat.roughness_power = pn
     return ED1,pn
+
+
+def _rolling_detrended_rms(y,N):
+    """
+    RMS about a linear trend in windows [n-N,n+N) of y, ignoring nans
+
+    As with detrend on the non-nan values of each window, the trend is fit
+    against the position among the non-nan values. All the sums come from
+    cumulative sums, so every window is done at once.
+    """
+    rms = np.nan*np.empty((len(y),))
+    centers = np.arange(N,len(y)-N+1)
+    centers = centers[centers < len(y)]
+    if len(centers) == 0:
+        return rms
+    start = centers-N
+    end = centers+N
+
+    valid = ~np.isnan(y)
+    # offset by the mean for precision
+    y = np.where(valid,y-np.nanmean(y),0.)
+    # number of valid values before each point, i.e. its position in the window (+ offset)
+    count = np.hstack(([0],np.cumsum(valid)))
+    csums = np.hstack((np.zeros((3,1)),np.cumsum(np.vstack((y,y**2.,count[:-1]*y)),axis=1)))
+
+    m = (count[end]-count[start]).astype(float)
+    Sy,Syy,Scy = csums[:,end]-csums[:,start]
+    # positions 0...m-1 within the window
+    Sxy = Scy-count[start]*Sy
+    with np.errstate(divide='ignore',invalid='ignore'):
+        Sxx = m*(m**2.-1.)/12.
+        Syy_c = Syy-Sy**2./m
+        Sxy_c = Sxy-(m-1.)/2.*Sy
+        resid = np.where(m>2,Syy_c-Sxy_c**2./Sxx,0.)
+        rms[centers] = np.where(m>1,np.sqrt(np.maximum(resid,0.)/(m-1.)),np.nan)
+    return rms
@@ -84,34 +84,14 @@ def attenuation_method2(dat,picknum,sigPc=0.,sigZ=0.,Cint=.95,u=1.69e8,*args, **
     if sigZ > .1:
         sigZ/=1000.
 
-    Szz = np.sum((Z-np.mean(Z))**2.)
-    Spp = np.sum((Pc-np.mean(Pc))**2.)
-    Szp = np.sum((Z-np.mean(Z))*(Pc-np.mean(Pc)))
-
-    if sigZ == 0 and sigPc == 0:
-        # Simple regression
-        N = -(Szp)/Szz
-        alpha = np.mean(Pc) + N*np.mean(Z)
-        # Error based on vertical distance from line only
-        Pc_err = np.sum((Pc - ((-N)*Z + alpha))**2.)
-        sigN = np.sqrt(Pc_err/Szz/(len(Z)-2))
-        tscore = stats.t.ppf(1.-(1.-Cint)/2., len(Z)-2)
-        Nerr = tscore*sigN
-    else:
-        # Deming regression after Casella and Berger (2002) section 12.2
-        lam = (sigZ**2.)/(sigPc**2.)
-        # Regression slope, eq. 12.2.16
-        N = -(-Szz+lam*Spp+np.sqrt((Szz-lam*Spp)**2.+4.*lam*Szp**2.))/(2.*lam*Szp)
-        alpha = np.mean(Pc) + N*np.mean(Z)
-        # Standard deviation in slope 12.2.22
-        sigN = np.sqrt(((1.+lam*N**2.)**2.*(Szz*Spp-Szp**2.))/((Szz-lam*Spp)**2.+4.*lam*Szp**2.))
-        tscore = stats.t.ppf(1.-(1.-Cint)/2., len(Z)-2)
-        # Error using Gleser's Modification with 95% confidence interval
-        Nerr = tscore*sigN/(np.sqrt(len(Z)-2))
+    # Regression on the single window of all the traces
+    csums = _cumulative_moments(Z-np.mean(Z),Pc-np.mean(Pc))
+    N,Nerr = _windowed_regression(*_window_moments(csums,np.array([0]),np.array([len(Z)])),
+                                  sigZ=sigZ,sigPc=sigPc,Cint=Cint)[:2]
 
     # Final Output as a one-way rate in dB/km
-    N *= 1/2.
-    Nerr *= 1/2.
+    N = .5*N[0]
+    Nerr = .5*Nerr[0]
 
     return N,Nerr
 
@@ -171,43 +151,32 @@ def attenuation_method3(dat,picknum,Ns=np.arange(30.),Nh_target=1.,Cw=0.1,win_in
     # Create empty arrays to fill for the resulting attenuation rate and window size
     N_result = np.zeros((dat.tnum,))
     win_result = np.zeros((dat.tnum,))
-    C = np.zeros_like(Ns)
-    # Loop through all the traces
-    for tr in range(win_init//2,dat.tnum-win_init//2):
-        # zero out the correlation coefficient array
-        C[:] = 0.
-        # Initial window size
-        win = win_init
-        # Radiometric Resolution (needs to converge onto Nh_target before the attenuation rate is accepted)
-        Nh = Nh_target + 1.
-        # while radiometric resolution is outside target range and window is fully within the profile
-        while Nh > Nh_target and win//2<=tr and win//2<=(len(Z)-tr):
-            # thickness and power in the window
-            z = Z[tr-win//2:tr+win//2]
-            pc = Pc[tr-win//2:tr+win//2]
-            # loop through all the possible attenuation rates
-            sum2 = np.sqrt(sum((z-np.mean(z))**2.))
-            # TODO: I think I could substantially speed things up in here
-            for j,Nj in enumerate(Ns):
-                # attenuation-corrected power, Schroeder et al. (2016) eq. 4
-                pa = pc + 2.*z*Nj
-                # calculate the correlation coefficient, Schroeder et al. (2016) eq. 5
-                sum1 = sum((z-np.mean(z))*(pa-np.mean(pa)))
-                sum3 = np.sqrt(sum((pa-np.mean(pa))**2.))
-                C[j] = abs(sum1/(sum2*sum3))
-            # Whichever value has the lowest correlation coefficient is chosen
-            Cm = np.min(C)
-            Nm = Ns[C==Cm]
-            C0 = C[Ns==0]
-            # If the minimum correlation coefficient is below threshold, Cw,
-            # and the zero correlation coefficient is above
-            # then update the radiometric resolution
-            if Cm < Cw and C0 > Cw:
-                Nh = np.max(Ns[C<Cw])-np.min(Ns[C<Cw])
-            win += win_step
-
-        N_result[tr] = Nm
+    # All the traces are done at once; the window grows for those that have not converged
+    trs = np.arange(win_init//2,dat.tnum-win_init//2)
+    N_result[trs] = np.nan
+    win_result[trs] = win_init
+    # Window sums come from cumulative sums (offset by the mean for precision)
+    csums = _cumulative_moments(Z-np.mean(Z),Pc-np.mean(Pc))
+    # Radiometric Resolution (needs to converge onto Nh_target before the attenuation rate is accepted)
+    Nh = np.ones((len(trs),))*(Nh_target + 1.)
+    win = win_init
+    # while radiometric resolution is outside target range and window is fully within the profile
+    active = (win//2<=trs) & (win//2<=(len(Z)-trs))
+    while np.any(active):
+        tr = trs[active]
+        # sums of squares of thickness and power in the window
+        Szz,Spp,Szp = _window_moments(csums,tr-win//2,tr+win//2)[3:]
+        # correlation coefficient for all the possible attenuation rates
+        C = _schroeder_correlation(Szz,Spp,Szp,Ns)
+        # Whichever value has the lowest correlation coefficient is chosen
+        N_result[tr] = Ns[np.argmin(C,axis=1)]
+        # If the minimum correlation coefficient is below threshold, Cw,
+        # and the zero correlation coefficient is above
+        # then update the radiometric resolution
+        Nh[active] = _radiometric_resolution(C,Ns,Cw,Nh[active])
+        win += win_step
         win_result[tr] = win
+        active &= (Nh > Nh_target) & (win//2<=trs) & (win//2<=(len(Z)-trs))
 
     return N_result,win_result
 
@@ -259,60 +228,37 @@ def attenuation_method5(dat,picknums,win=1,sigPc=0,sigZ=0,Cint=.95,u=1.69e8,*arg
         print('Warning: setting pick depth for constant velocity in ice.')
         Z = dat.picks.time*u/2/1e6
 
+    # Get picks from index; nan values are left out of the sums
+    Pc = 10.*np.log10(np.atleast_2d(dat.picks.corrected_power[picknums]))
+    Z = np.atleast_2d(Z[picknums])
+
     # Convert to km
     if np.any(Z > 10.):
-        Z/=1000.
+        Z = Z/1000.
     if sigZ > .1:
         sigZ/=1000.
 
+    # Moments over all the picks in each trace, then cumulative along the profile
+    idx = ~np.isnan(Pc) & ~np.isnan(Z)
+    z = np.where(idx,Z-np.nanmean(Z[idx]),0.)
+    pc = np.where(idx,Pc-np.nanmean(Pc[idx]),0.)
+    moments = np.vstack((np.sum(idx,axis=0),np.sum(z,axis=0),np.sum(pc,axis=0),np.sum(z**2.,axis=0),
+                         np.sum(pc**2.,axis=0),np.sum(z*pc,axis=0)))
+    csums = np.hstack((np.zeros((6,1)),np.cumsum(moments,axis=1)))
+
+    # calculate the attenuation rate for each desired trace (or window) at once
+    trs = np.arange(win//2,dat.tnum-win//2)
+    n = csums[0,trs+win//2+1]-csums[0,trs-win//2]
+    N,Nerr = _windowed_regression(n,*_window_moments(csums[1:],trs-win//2,trs+win//2+1,n=n)[1:],
+                                  sigZ=sigZ,sigPc=sigPc,Cint=Cint)[:2]
+
     # create empty arrays for output
+    # If there are not enough picked layers for a window, output nan
     N_result = np.nan*np.empty((dat.tnum,))
     Nerr_result = np.nan*np.empty((dat.tnum,))
-    a_result = np.nan*np.empty((dat.tnum,))
-    # calculate the attenuation rate for each desired trace (or window)
-    for tr in np.arange(win//2,dat.tnum-win//2):
-        # grab the data within the window
-        # Get pick from index and remove nan values
-        pc = np.squeeze(10.*np.log10(dat.picks.corrected_power[picknums,tr-win//2:tr+win//2+1]))
-        z = np.squeeze(Z[picknums,tr-win//2:tr+win//2+1])
-        idx = ~np.isnan(pc) & ~np.isnan(z)
-        pc = pc[idx]
-        z = z[idx]
-
-        # If there are not enough picked layers for this window, output nan
-        if len(pc)<5:
-            N_result[tr] = np.nan
-            Nerr_result[tr] = np.nan
-            a_result[tr] = np.nan
-        else:
-            Szz = np.sum((z-np.mean(z))**2.)
-            Spp = np.sum((pc-np.mean(pc))**2.)
-            Szp = np.sum((z-np.mean(z))*(pc-np.mean(pc)))
-
-            if sigZ == 0 and sigPc == 0:
-                # Simple regression
-                N = -(Szp)/Szz
-                alpha = np.mean(pc) + N*np.mean(z)
-                # Error based on vertical distance from line only
-                pc_err = np.sum((pc - ((-N)*z + alpha))**2.)
-                sigN = np.sqrt(pc_err/Szz/(len(z)-2))
-                tscore = stats.t.ppf(1.-(1.-Cint)/2., len(z)-2)
-                Nerr = tscore*sigN
-            else:
-                # Deming regression after Casella and Berger (2002) section 12.2
-                lam = (sigZ**2.)/(sigPc**2.)
-                # Regression slope, eq. 12.2.16
-                N = -(-Szz+lam*Spp+np.sqrt((Szz-lam*Spp)**2.+4.*lam*Szp**2.))/(2.*lam*Szp)
-                alpha = np.mean(pc) + N*np.mean(z)
-                # Standard deviation in slope 12.2.22
-                sigN = np.sqrt(((1.+lam*N**2.)**2.*(Szz*Spp-Szp**2.))/((Szz-lam*Spp)**2.+4.*lam*Szp**2.))
-                tscore = stats.t.ppf(1.-(1.-Cint)/2., len(z)-2)
-                # Error using Gleser's Modification with 95% confidence interval
-                Nerr = tscore*sigN/(np.sqrt(len(z)-2))
-
-            # Final Output as a one-way rate in dB/km
-            N_result[tr] = N*.5 #one-way attenuation rate
-            Nerr_result[tr] = Nerr*.5
+    # Final Output as a one-way rate in dB/km
+    N_result[trs] = np.where(n<5,np.nan,N*.5) #one-way attenuation rate
+    Nerr_result[trs] = np.where(n<5,np.nan,Nerr*.5)
 
     return N_result,Nerr_result
 
@@ -369,53 +315,30 @@ def attenuation_method6a(dat,picknums,att_ds,win=500.,sigPc=0,sigZ=0,Cint=.95,u=
     # Convert to km
     if np.any(Z > 10.):
         Z/=1000.
+    att_ds = np.asarray(att_ds,dtype=float)
     if np.any(att_ds>10.):
-        att_ds/=1000.
+        att_ds = att_ds/1000.
     if win>10.:
         win/=1000.
 
-    # Create empty arrays to fill for the output attenuation rate and window size
-    N_result = np.zeros_like(att_ds).astype(float)
-    Nerr_result = np.zeros_like(att_ds).astype(float)
-
-    # loop through all the depths
-    for i,att_d in enumerate(att_ds):
-        z = Z[np.logical_and(Z>(att_d-win/2),Z<(att_d+win/2))]
-        pc = Pc[np.logical_and(Z>(att_d-win/2),Z<(att_d+win/2))]
-        if len(z)<5:
-            N_result[i] = np.nan
-            Nerr_result[i] = np.nan
-            continue
-
-        # Sum of squares
-        Szz = np.sum((z-np.mean(z))**2.)
-        Spp = np.sum((pc-np.mean(pc))**2.)
-        Szp = np.sum((z-np.mean(z))*(pc-np.mean(pc)))
-
-        if sigZ == 0 and sigPc == 0:
-            # Simple regression
-            N = -(Szp)/Szz
-            alpha = np.mean(pc) + N*np.mean(z)
-            # Error based on vertical distance from line only
-            pc_err = np.sum((pc - ((-N)*z + alpha))**2.)
-            sigN = np.sqrt(pc_err/Szz/(len(z)-2))
-            tscore = stats.t.ppf(1.-(1.-Cint)/2., len(z)-2)
-            Nerr = tscore*sigN
-        else:
-            # Deming regression after Casella and Berger (2002) section 12.2
-            lam = (sigZ**2.)/(sigPc**2.)
-            # Regression slope, eq. 12.2.16
-            N = -(-Szz+lam*Spp+np.sqrt((Szz-lam*Spp)**2.+4.*lam*Szp**2.))/(2.*lam*Szp)
-            alpha = np.mean(pc) + N*np.mean(z)
-            # Standard deviation in slope 12.2.22
-            sigN = np.sqrt(((1.+lam*N**2.)**2.*(Szz*Spp-Szp**2.))/((Szz-lam*Spp)**2.+4.*lam*Szp**2.))
-            tscore = stats.t.ppf(1.-(1.-Cint)/2., len(z)-2)
-            # Error using Gleser's Modification with 95% confidence interval
-            Nerr = tscore*sigN/(np.sqrt(len(z)-2))
-
-        # Fill in the result array
-        N_result[i] = .5*N
-        Nerr_result[i] = .5*Nerr
+    # Sort by depth so each window is a contiguous block
+    order = np.argsort(Z)
+    Z = Z[order]
+    Pc = Pc[order]
+    csums = _cumulative_moments(Z-np.mean(Z),Pc-np.mean(Pc))
+
+    # All the depths at once
+    start = np.searchsorted(Z,att_ds-win/2,side='right')
+    end = np.searchsorted(Z,att_ds+win/2,side='left')
+    # Empty windows are given one point so the sums are defined; they are too short anyway
+    n = end-start
+    start = np.minimum(start,len(Z)-1)
+    N,Nerr = _windowed_regression(*_window_moments(csums,start,np.maximum(end,start+1)),
+                                  sigZ=sigZ,sigPc=sigPc,Cint=Cint)[:2]
+
+    # Fill in the result array
+    N_result = np.where(n<5,np.nan,.5*N)
+    Nerr_result = np.where(n<5,np.nan,.5*Nerr)
 
     return N_result, Nerr_result
 
@@ -476,56 +399,177 @@ def attenuation_method6b(dat,picknums,att_ds,Ns=np.arange(30.),Nh_target=1.,Cw=0
     # Convert to km
     if np.any(Z > 10.):
         Z/=1000.
+    att_ds = np.asarray(att_ds,dtype=float)
     if np.any(att_ds>10.):
-        att_ds/=1000.
+        att_ds = att_ds/1000.
     if win_init>10.:
         win_init/=1000.
         win_step/=1000.
 
+    # Sort by depth so each window is a contiguous block
+    order = np.argsort(Z)
+    Z = Z[order]
+    Pc = Pc[order]
+    csums = _cumulative_moments(Z-np.mean(Z),Pc-np.mean(Pc))
+
     # Create empty arrays to fill for the output attenuation rate and window size
-    N_result = np.zeros_like(att_ds)
+    N_result = np.nan*np.empty_like(att_ds)
     win_result = np.zeros_like(att_ds)
-    C = np.zeros_like(Ns)
-    # loop through all the depths
-    for i,att_d in enumerate(att_ds):
-        # current depth for attenuation calc
-        att_d = att_ds[i]
-        # Correlation Coefficient (starts empty)
-        C[:] = np.nan
-        # Initial window size
-        win = win_init
-        # Radiometric Resolution (needs to converge to Nh_target)
-        Nh = Nh_target + 1.
-        while Nh > Nh_target and att_d-win/2>=np.nanmin(Z) and att_d+win/2<=np.nanmax(Z):
-            # thickness and power in the window
-            z = Z[np.argwhere(abs(Z-att_d)<win/2)]
-            pc = Pc[np.argwhere(abs(Z-att_d)<win/2)]
-            # loop through all the possible attenuation rates
-            sum2 = np.sqrt(np.nansum((z-np.nanmean(z))**2.))
-            # TODO: I think I could substantially speed things up in here
-            for n in range(len(Ns)):
-                # attenuation-corrected power, Schroeder et al. (2016) eq. 4
-                pa = pc + 2.*z*Ns[n]
-                # calculate the correlation coefficient, Schroeder et al. (2016) eq. 5
-                sum1 = np.nansum((z-np.nanmean(z))*(pa-np.nanmean(pa)))
-                sum3 = np.sqrt(np.nansum((pa-np.nanmean(pa))**2.))
-                if np.any(np.isnan([sum1,sum2,sum3])):
-                    C[n] = np.nan
-                else:
-                    C[n] = abs(sum1/(sum2*sum3))
-            # Whichever value has the lowest correlation coefficient is chosen
-            Cm = np.nanmin(C)
-            Nm = Ns[C==Cm]
-            C0 = C[Ns==0]
-            if Cm < Cw and C0 > Cw:
-                Nh = (np.max(Ns[C<Cw])-np.min(Ns[C<Cw]))/2.
-            # get ready for the next iteration
-            win += win_step
-        # output
-        N_result[i] = Nm
-        win_result[i] = win*1000.
+    # All the depths at once; the window grows for those that have not converged
+    win = win_init*np.ones_like(att_ds)
+    # Radiometric Resolution (needs to converge to Nh_target)
+    Nh = np.ones_like(att_ds)*(Nh_target + 1.)
+    active = (att_ds-win/2>=np.min(Z)) & (att_ds+win/2<=np.max(Z))
+    while np.any(active):
+        att_d = att_ds[active]
+        # sums of squares of thickness and power in the window
+        start = np.searchsorted(Z,att_d-win[active]/2,side='right')
+        end = np.searchsorted(Z,att_d+win[active]/2,side='left')
+        empty = end<=start
+        start = np.minimum(start,len(Z)-1)
+        Szz,Spp,Szp = _window_moments(csums,start,np.maximum(end,start+1))[3:]
+        # correlation coefficient for all the possible attenuation rates
+        C = _schroeder_correlation(Szz,Spp,Szp,Ns)
+        C[empty] = np.nan
+        # Whichever value has the lowest correlation coefficient is chosen
+        found = ~np.all(np.isnan(C),axis=1)
+        N_result[np.where(active)[0][found]] = Ns[np.nanargmin(C[found],axis=1)]
+        Nh[active] = _radiometric_resolution(C,Ns,Cw,Nh[active],scale=.5)
+        # get ready for the next iteration
+        win[active] += win_step
+        active &= (Nh > Nh_target) & (att_ds-win/2>=np.min(Z)) & (att_ds+win/2<=np.max(Z))
+    # output
+    win_result[:] = win*1000.
     return N_result, win_result
 
+# -----------------------------------------------------------------------------------------------------
+# -----------------------------------------------------------------------------------------------------
+# -----------------------------------------------------------------------------------------------------
+### Window Statistics
+# -----------------------------------------------------------------------------------------------------
+# -----------------------------------------------------------------------------------------------------
+# -----------------------------------------------------------------------------------------------------
+
+def _cumulative_moments(z,pc):
+    """
+    Cumulative sums of thickness and power, and their squares and product
+
+    Output
+    ----------
+    csums:  array (5, len(z)+1)
+        cumulative sums of z, pc, z**2, pc**2, and z*pc, starting from 0
+    """
+    moments = np.vstack((z,pc,z**2.,pc**2.,z*pc))
+    return np.hstack((np.zeros((5,1)),np.cumsum(moments,axis=1)))
+
+
+def _window_moments(csums,start,end,n=None):
+    """
+    Sums within the windows [start,end) from cumulative sums
+
+    Parameters
+    ----------
+    n:  array; optional
+        number of points in each window, if not every point in a window counts
+
+    Output
+    ----------
+    n:  array
+        number of points in each window
+    Sz, Sp: arrays
+        mean thickness and power in each window
+    Szz, Spp, Szp: arrays
+        sums of squares (about the mean) in each window
+    """
+    if n is None:
+        n = (end-start).astype(float)
+    sums = csums[:,end]-csums[:,start]
+    Sz = sums[0]/n
+    Sp = sums[1]/n
+    return n,Sz,Sp,sums[2]-n*Sz**2.,sums[3]-n*Sp**2.,sums[4]-n*Sz*Sp
+
+
+def _schroeder_correlation(Szz,Spp,Szp,Ns):
+    """
+    Correlation coefficient between thickness and attenuation-corrected power
+    for every window and attenuation rate, Schroeder et al. (2016) eq. 4 and 5
+
+    Output
+    ----------
+    C:  array (nwindows, len(Ns))
+    """
+    Szz = np.asarray(Szz)[:,None]
+    Spp = np.asarray(Spp)[:,None]
+    Szp = np.asarray(Szp)[:,None]
+    # pa = pc + 2*z*N, so its sums of squares follow from those of pc and z
+    sum1 = Szp + 2.*Ns*Szz
+    sum3 = np.sqrt(np.maximum(Spp + 4.*Ns*Szp + 4.*Ns**2.*Szz,0.))
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.abs(sum1/(np.sqrt(Szz)*sum3))
+
+
+def _radiometric_resolution(C,Ns,Cw,Nh,scale=1.):
+    """
+    Range of the attenuation rates with correlation coefficient below Cw (times scale),
+    for windows where the best one is below Cw and the zero rate is above it.
+    Other windows keep their old resolution, Nh.
+    """
+    below = C < Cw
+    with np.errstate(invalid='ignore'):
+        converged = below.any(axis=1) & np.any((C > Cw) & (Ns == 0),axis=1)
+    Nh_new = np.max(np.where(below,Ns,-np.inf),axis=1) - np.min(np.where(below,Ns,np.inf),axis=1)
+    return np.where(converged,scale*Nh_new,Nh)
+
+
+def _windowed_regression(n,mz,mp,Szz,Spp,Szp,sigZ=0.,sigPc=0.,Cint=.95):
+    """
+    Fit power against depth in every window at once
+
+    Parameters
+    ----------
+    n, mz, mp, Szz, Spp, Szp: arrays
+        window sizes, means, and sums of squares from _window_moments
+    sigPc:  float; optional
+        standard deviation in measured power (error) used to constrain the regression
+        defaults to 0 (i.e. simple regression)
+    sigZ:   float; optional
+        standard deviation in measured depth (error) used to constrain the regression
+        defaults to 0 (i.e. simple regression)
+    Cint:   float; optional
+        confidence interval with which to describe the resulting attenuation error
+        default 95%
+
+    Output
+    ----------
+    N:  array
+        Two-way attenuation rate (negative of the slope)
+    Nerr:   array
+        Error in N
+    alpha:  array
+        Intercept
+    """
+    with np.errstate(divide='ignore',invalid='ignore'):
+        tscore = stats.t.ppf(1.-(1.-Cint)/2., n-2)
+        if sigZ == 0 and sigPc == 0:
+            # Simple regression
+            N = -(Szp)/Szz
+            alpha = mp + N*mz
+            # Error based on vertical distance from line only
+            pc_err = np.maximum(Spp + 2.*N*Szp + N**2.*Szz,0.)
+            sigN = np.sqrt(pc_err/Szz/(n-2))
+            Nerr = tscore*sigN
+        else:
+            # Deming regression after Casella and Berger (2002) section 12.2
+            lam = (sigZ**2.)/(sigPc**2.)
+            # Regression slope, eq. 12.2.16
+            N = -(-Szz+lam*Spp+np.sqrt((Szz-lam*Spp)**2.+4.*lam*Szp**2.))/(2.*lam*Szp)
+            alpha = mp + N*mz
+            # Standard deviation in slope 12.2.22
+            sigN = np.sqrt(((1.+lam*N**2.)**2.*(Szz*Spp-Szp**2.))/((Szz-lam*Spp)**2.+4.*lam*Szp**2.))
+            # Error using Gleser's Modification with 95% confidence interval
+            Nerr = tscore*sigN/(np.sqrt(n-2))
+    return N,Nerr,alpha
+
 # -----------------------------------------------------------------------------------------------------
 # -----------------------------------------------------------------------------------------------------
 # -----------------------------------------------------------------------------------------------------
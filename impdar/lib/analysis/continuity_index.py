@@ -33,6 +33,8 @@ def continuity_index(dat,b_ind,s_ind=None,cutoff_ratio=None):
 
     Parameters
     ----------
+    dat:    RadarData or list of RadarData
+        profile(s) to calculate the continuity index for
     b_ind:  int
         bed pick index
     s_ind:  int; optional
@@ -42,10 +44,14 @@ def continuity_index(dat,b_ind,s_ind=None,cutoff_ratio=None):
 
     Output
     ---------
-    conttinuity_index: array
+    conttinuity_index: array (or list of arrays for a list of profiles)
+        also set as dat.continuity_index
     """
+    if isinstance(dat, (list, tuple)):
+        return [continuity_index(d,b_ind,s_ind=s_ind,cutoff_ratio=cutoff_ratio) for d in dat]
 
-    P = 10*np.log10(dat.data**2.)
+    with np.errstate(divide='ignore'):
+        P = 10*np.log10(dat.data**2.)
 
     bpick = dat.picks.samp1[b_ind]
     if s_ind is None:
@@ -53,29 +59,45 @@ def continuity_index(dat,b_ind,s_ind=None,cutoff_ratio=None):
     else:
         spick = dat.picks.samp1[s_ind]
 
-    # empty continuity index array
-    cont = np.empty((dat.tnum,)).astype(float)
-    # calculate the continuity index for each trace
-    for tr in range(dat.tnum):
-        # Nan if the picks are nan
-        if np.isnan(bpick[tr]) or np.isnan(spick[tr]):
-            cont[tr] = np.nan
-        else:
-            # get data from between the surface and bed
-            b = int(bpick[tr])
-            s = int(spick[tr])
-            p_ext=P[s:b,tr]
-            # cutoff based on the assigned ratio
-            if cutoff_ratio is not None:
-                cut=int(len(p_ext)*cutoff_ratio)
-                p_ext=p_ext[cut:-cut]
-
-            # Nan if sampling criteria are not met
-            if len(p_ext) < 10 or len(p_ext) > dat.snum or np.any(~np.isfinite(p_ext)):
-                cont[tr] = np.nan
-
-            # calculate the continuity index based on Karlsson et al. (2012) eq. 1
-            else:
-                cont[tr]=np.mean(abs(np.gradient(p_ext)))
-
+    # Nan if the picks are nan
+    picked = ~np.isnan(bpick) & ~np.isnan(spick)
+    # get the data from between the surface and bed
+    s = np.clip(np.where(picked,spick,0).astype(int),0,dat.snum)
+    b = np.clip(np.where(picked,bpick,0).astype(int),s,dat.snum)
+    # cutoff based on the assigned ratio
+    if cutoff_ratio is not None:
+        cut = ((b-s)*cutoff_ratio).astype(int)
+        s = s+cut
+        b = np.maximum(b-cut,s)
+    length = b-s
+
+    # Nan if sampling criteria are not met
+    finite = np.isfinite(P)
+    n_bad = np.vstack((np.zeros((1,dat.tnum)),np.cumsum(~finite,axis=0)))
+    good = picked & (length >= 10) & (length <= dat.snum) & \
+        (_column_sum(n_bad,s,b) == 0)
+
+    # calculate the continuity index based on Karlsson et al. (2012) eq. 1
+    # np.gradient is a central difference inside the window, and one-sided at its ends
+    P = np.where(finite,P,0.)
+    central = np.abs(P[2:,:]-P[:-2,:])/2.
+    csum = np.vstack((np.zeros((1,dat.tnum)),np.cumsum(central,axis=0)))
+    s_ = np.where(good,s,0)
+    b_ = np.where(good,b,2)
+    grad_sum = _column_sum(csum,s_,b_-2) + \
+        np.abs(_column_take(P,s_+1)-_column_take(P,s_)) + \
+        np.abs(_column_take(P,b_-1)-_column_take(P,b_-2))
+
+    cont = np.where(good,grad_sum/np.maximum(length,1),np.nan)
     dat.continuity_index = cont
+    return cont
+
+
+def _column_take(arr,rows):
+    """Take one row from each column of arr"""
+    return arr[np.minimum(rows,arr.shape[0]-1),np.arange(arr.shape[1])]
+
+
+def _column_sum(csum,start,end):
+    """Sum of rows [start,end) of each column from its cumulative sum (with a leading 0)"""
+    return _column_take(csum,end)-_column_take(csum,start)
@@ -9,19 +9,29 @@
 
 import os
 from .RadarData import RadarData
+from .RadarData._RadarDataSaving import output_survey_shp
 from .load import load_gssi, load_pulse_ekko, load_segy, load
 
 
 def convert(fns_in, out_fmt, t_srs=None, in_fmt=None, *args, **kwargs):
-    """Convert between formats. Mainly used to create shps and sgy files."""
+    """Convert between formats. Mainly used to create shps and sgy files.
+
+    If out_fmt is shp and the keyword argument survey_fn is given, all the
+    profiles are written to survey_fn (.shp or .gpkg) as one layer rather than
+    one file each. out_fmt parquet writes a table of the traces and picks for
+    each file.
+    """
+    # Keyword only (this needs to work on python 2 too)
+    survey_fn = kwargs.get('survey_fn', None)
+
     # Basic check on the conversion being implemented.
     # This is really simple because I'm not converting from one proprietary
     # form to another
     if t_srs == 'wgs84':
         t_srs = 'EPSG:3413'
 
-    if out_fmt not in ['shp', 'mat', 'sgy']:
-        raise ValueError('Can only convert to shp, mat, or sgy')
+    if out_fmt not in ['shp', 'mat', 'sgy', 'parquet']:
+        raise ValueError('Can only convert to shp, mat, sgy, or parquet')
 
     # Treat this like batch input always
     if not isinstance(fns_in, (tuple, list)):
@@ -38,8 +48,6 @@ def convert(fns_in, out_fmt, t_srs=None, in_fmt=None, *args, **kwargs):
             elif f_i[-4:] == '.DT1':
                 loaders[i] = load_pulse_ekko.load_pe
             elif f_i[-4:] == '.sgy':
-                if not load_segy.SEGY:
-                    raise ImportError('You cannot use segy without segyio installed!')
                 loaders[i] = load_segy.load_segy
             else:
                 raise ValueError('Unrecognized file extension {:s}'.format(f_i[-4:]))
@@ -57,13 +65,17 @@ def convert(fns_in, out_fmt, t_srs=None, in_fmt=None, *args, **kwargs):
                 continue
             fn_out = os.path.splitext(f_i)[0] + '.mat'
             dat.save(fn_out)
+    elif out_fmt == 'shp' and survey_fn is not None:
+        output_survey_shp(data, survey_fn, t_srs=t_srs)
     elif out_fmt == 'shp':
         for dat in data:
             fn_out = os.path.splitext(dat.fn)[0] + '.shp'
             dat.output_shp(fn_out, t_srs=t_srs)
+    elif out_fmt == 'parquet':
+        for f_i, dat in zip(fns_in, data):
+            fn_out = os.path.splitext(f_i)[0] + '.parquet'
+            dat.output_parquet(fn_out)
     elif out_fmt == 'sgy':
-        if not load_segy.SEGY:
-            raise ImportError('You cannot use segy without segyio installed!')
         for loader, f_i, dat in zip(loaders, fns_in, data):
             fn_out = os.path.splitext(f_i)[0] + '.sgy'
             dat.save_as_segy(fn_out)
@@ -15,75 +15,174 @@ directly. Use RadarGPS class, which has an __init__ method, instead.
 Additional methods in this library are used to read the filetypes from StoDeep.
 These can then be used to redo the GPS info on another object
 """
+from itertools import islice
 import numpy as np
+from scipy.interpolate import interp1d
 try:
-    import osr
-    conversions_enabled = True
+    from osgeo import osr
+    OSR = True
 except ImportError:
-    conversions_enabled = False
+    try:
+        import osr
+        OSR = True
+    except ImportError:
+        OSR = False
+
+# pyproj transforms whole arrays at once, so we prefer it if available
+try:
+    import pyproj
+    PYPROJ = True
+except ImportError:
+    PYPROJ = False
+
+conversions_enabled = OSR or PYPROJ
 
-from scipy.interpolate import interp1d
 
-if conversions_enabled:
-    def get_utm_conversion(lat, lon):
-        """Retrun the gdal transform to convert coords."""
-        def utm_getZone(longitude):
-            return (int(1 + (longitude + 180.0) / 6.0))
+def _dict_cache(maxsize=None):
+    """Memoize a function of hashable arguments, ignoring maxsize.
 
-        def utm_isNorthern(latitude):
-            if (latitude < 0.0):
-                return False
-            else:
-                return True
+    This stands in for lru_cache on Python 2. There are only ever a few
+    projections, so we just keep all of them.
+    """
+    def decorator(func):
+        memo = {}
+
+        def wrapper(*args):
+            if args not in memo:
+                memo[args] = func(*args)
+            return memo[args]
+        return wrapper
+    return decorator
+
+
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = _dict_cache
 
-        utm_zone = utm_getZone(lon)
-        is_northern = utm_isNorthern(lat)
 
+# Needed to read only part of v7.3 (hdf5) matlab files
+try:
+    import h5py
+    H5 = True
+except ImportError:
+    H5 = False
+
+#: The number of coordinate transforms to keep around for reuse
+TRANSFORM_CACHE_SIZE = 32
+
+
+def get_utm_conversion(lat, lon):
+    """Return the transform to convert wgs84 coords to the local UTM zone.
+
+    Transforms are cached, so repeated calls in the same zone are cheap.
+
+    Parameters
+    ----------
+    lat: float
+        A latitude in the area of interest (used for the hemisphere)
+    lon: float
+        A longitude in the area of interest (used for the zone)
+
+    Returns
+    -------
+    function
+        Takes an (n, 2) array of lon, lat and returns (n, 3) projected x, y, z
+    str
+        The WKT of the UTM zone
+
+    Raises
+    ------
+    ImportError
+        If neither pyproj nor osr are importable
+    """
+    utm_zone = int(1 + (lon + 180.0) / 6.0)
+    is_northern = not (lat < 0.0)
+    return _get_utm_conversion(utm_zone, is_northern)
+
+
+def get_conversion(t_srs):
+    """Return the transform to convert wgs84 coords to some projection.
+
+    Transforms are cached, so repeated calls with the same t_srs are cheap.
+
+    Parameters
+    ----------
+    t_srs: str
+        The target projection, e.g. EPSG:3031
+
+    Returns
+    -------
+    function
+        Takes an (n, 2) array of lon, lat and returns (n, 3) projected x, y, z
+    str
+        The WKT of the target projection
+
+    Raises
+    ------
+    ImportError
+        If neither pyproj nor osr are importable
+    """
+    return _get_conversion(t_srs)
+
+
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def _get_utm_conversion(utm_zone, is_northern):
+    """Make the transform to UTM, cached by zone and hemisphere."""
+    if PYPROJ:
+        # WGS84 UTM zones are EPSG 326XX (north) and 327XX (south)
+        return _pyproj_conversion('EPSG:{:d}'.format(
+            (32600 if is_northern else 32700) + utm_zone))
+    elif OSR:
         utm_cs = osr.SpatialReference()
         utm_cs.SetWellKnownGeogCS('WGS84')
         utm_cs.SetUTM(utm_zone, is_northern)
+        return _osr_conversion(utm_cs)
+    raise ImportError('Cannot convert coordinates: neither pyproj nor osr importable')
 
-        # On newer versions of osr we need this, but on old versions it will fail
-        try:
-            utm_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        except AttributeError:
-            pass
-
-        wgs84_cs = utm_cs.CloneGeogCS()
-        wgs84_cs.ExportToPrettyWkt()
-        try:
-            wgs84_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        except AttributeError:
-            pass
-
-        transform_WGS84_To_UTM = osr.CoordinateTransformation(wgs84_cs, utm_cs)
-        return transform_WGS84_To_UTM.TransformPoints, utm_cs.ExportToPrettyWkt()
 
-    def get_conversion(t_srs):
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def _get_conversion(t_srs):
+    """Make the transform to t_srs, cached by t_srs."""
+    if PYPROJ:
+        return _pyproj_conversion(t_srs)
+    elif OSR:
         out_cs = osr.SpatialReference()
         out_cs.SetFromUserInput(t_srs)
-        try:
-            out_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        except AttributeError:
-            pass
+        return _osr_conversion(out_cs)
+    raise ImportError('Cannot convert coordinates: neither pyproj nor osr importable')
 
-        wgs84_cs = out_cs.CloneGeogCS()
-        wgs84_cs.ExportToPrettyWkt()
-        try:
-            wgs84_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        except AttributeError:
-            pass
 
-        transform_WGS84_To_srs = osr.CoordinateTransformation(wgs84_cs, out_cs)
-        return transform_WGS84_To_srs.TransformPoints, out_cs.ExportToPrettyWkt()
-else:
-    def get_utm_conversion(lat, lon):
-        """Just raise an exception since we cannot really convert."""
-        raise ImportError('Cannot convert coordinates: osr not importable')
+def _pyproj_conversion(t_srs):
+    """Vectorized transform from the geographic coordinates of t_srs."""
+    out_crs = pyproj.CRS.from_user_input(t_srs)
+    transformer = pyproj.Transformer.from_crs(out_crs.geodetic_crs, out_crs,
+                                              always_xy=True)
+
+    def transform_points(pts):
+        pts = np.asarray(pts, dtype=float)
+        x_coord, y_coord = transformer.transform(pts[:, 0], pts[:, 1])
+        return np.vstack((x_coord, y_coord, np.zeros_like(x_coord))).transpose()
+    # WKT1, since older GDAL cannot read WKT2
+    return transform_points, out_crs.to_wkt('WKT1_GDAL', pretty=True)
+
 
-    def get_conversion(t_srs):
-        """Just raise an exception since we cannot really convert."""
-        raise ImportError('Cannot convert coordinates: osr not importable')
+def _osr_conversion(out_cs):
+    """Transform from the geographic coordinates of out_cs using osr."""
+    # On newer versions of osr we need this, but on old versions it will fail
+    try:
+        out_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    except AttributeError:
+        pass
+
+    wgs84_cs = out_cs.CloneGeogCS()
+    try:
+        wgs84_cs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    except AttributeError:
+        pass
+
+    transform = osr.CoordinateTransformation(wgs84_cs, out_cs)
+    return transform.TransformPoints, out_cs.ExportToPrettyWkt()
 
 
 def hhmmss2dec(times):
@@ -309,7 +408,7 @@ class RadarGPS(nmea_info):
 
 
 def kinematic_gps_control(dats, lat, lon, elev, decday, offset=0.0,
-                          extrapolate=False, guess_offset=True):
+                          extrapolate=False, guess_offset=True, jobs=1):
     """Use new, better GPS data for lat, lon, and elevation.
 
     The interpolation in this function is done using the time since the radar
@@ -344,6 +443,9 @@ def kinematic_gps_control(dats, lat, lon, elev, decday, offset=0.0,
         the x coordinates in the two datasets. If the guess at the offset is
         nonzero, we look at 1000 offsets within 10% of
         the offset. Else we look at +/- 0.001 days
+    jobs: int, optional
+        Number of processes to use for guessing the offsets of different
+        profiles. Default 1 (no parallelism).
     """
     if extrapolate:
         fill_value = 'extrapolate'
@@ -359,26 +461,24 @@ def kinematic_gps_control(dats, lat, lon, elev, decday, offset=0.0,
     offsets = [offset for i in dats]
     if guess_offset:
         print('CC search')
-        for i in range(5):
-            for j, dat in enumerate(dats):
-                if (min(lon % 360) - max(dat.long % 360)) > 0. or (min(dat.long % 360) - max(lon % 360)) > 0.:
-                    raise ValueError('No overlap in longitudes')
-                if offsets[j] != 0.0:
-                    search_vals = np.linspace(-0.1 * abs(offsets[j]),
-                                              0.1 * abs(offsets[j]),
-                                              1001)
-                else:
-                    search_vals = np.linspace(-0.1, 0.1, 5001)
-                cc_coeffs = [np.corrcoef(
-                    interp1d(decday + offsets[j] + inc_offset, lat,
-                             kind='linear', fill_value=fill_value)(dat.decday),
-                    dat.lat)[1, 1] + np.corrcoef(
-                        interp1d(decday + offsets[j] + inc_offset, lon % 360,
-                                 kind='linear', fill_value=fill_value)(
-                                     dat.decday), dat.long % 360)[0, 1]
-                                     for inc_offset in search_vals]
-                offsets[j] += search_vals[np.argmax(cc_coeffs)]
-                print('Maximum correlation at offset: {:f}'.format(offsets[j]))
+        for dat in dats:
+            if (min(lon % 360) - max(dat.long % 360)) > 0. or (min(dat.long % 360) - max(lon % 360)) > 0.:
+                raise ValueError('No overlap in longitudes')
+        args = [(dat.decday, dat.long % 360, decday, lon % 360, offset,
+                 extrapolate) for dat in dats]
+        if jobs > 1 and len(dats) > 1:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+            except ImportError:
+                # No process pools on python 2, so do one profile at a time
+                jobs = 1
+        if jobs > 1 and len(dats) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                offsets = list(executor.map(_guess_offset, *zip(*args)))
+        else:
+            offsets = [_guess_offset(*arg) for arg in args]
+        for offset_j in offsets:
+            print('Maximum correlation at offset: {:f}'.format(offset_j))
 
     for j, dat in enumerate(dats):
         int_lat = interp1d(decday + offsets[j],
@@ -399,8 +499,115 @@ def kinematic_gps_control(dats, lat, lon, elev, decday, offset=0.0,
             dat.get_projected_coords()
 
 
+def _guess_offset(radar_decday, radar_lon, decday, lon, offset=0.0,
+                  extrapolate=False, n_iter=5, chunk_size=2 ** 22,
+                  coarse_step=100, n_keep=3):
+    """Find the time offset that best lines up GPS and radar longitudes.
+
+    The candidate offsets are the same as they always have been (5001 within
+    0.1 days, or 1001 within 10% of the current guess, refined n_iter times),
+    but rather than trying every one, we search coarse to fine: every
+    coarse_step-th candidate first, then every tenth candidate around the
+    n_keep best of those, and so on down to single candidates. The GPS
+    longitudes are interpolated at the shifted radar times for a block of
+    candidates at once, rather than building an interpolator for each.
+
+    Parameters
+    ----------
+    radar_decday: np.ndarray
+        The radar times
+    radar_lon: np.ndarray
+        The radar longitude, modulo 360
+    decday: np.ndarray
+        The GPS times
+    lon: np.ndarray
+        The GPS longitude, modulo 360
+    offset: float, optional
+        The initial guess at the offset
+    extrapolate: bool, optional
+        Extrapolate GPS data linearly rather than ignoring radar traces
+        outside the GPS times
+    n_iter: int, optional
+        Number of times to refine the search
+    chunk_size: int, optional
+        Maximum number of interpolated values held in memory at once
+    coarse_step: int, optional
+        Spacing, in candidates, of the first pass of the search. Use 1 to
+        try every candidate.
+    n_keep: int, optional
+        Number of best candidates to refine around at each pass
+
+    Returns
+    -------
+    float
+        The best offset
+    """
+    order = np.argsort(decday)
+    decday, lon = decday[order], lon[order]
+    radar_decday = np.asarray(radar_decday, dtype=float).flatten()
+    radar_lon = np.asarray(radar_lon, dtype=float).flatten()
+    chunk = max(1, chunk_size // max(len(radar_decday), 1))
+
+    def _corr(shifts):
+        return np.hstack([
+            _rowwise_corrcoef(_interp_linear(
+                radar_decday[None, :] - (offset + shifts[k:k + chunk, None]),
+                decday, lon, extrapolate), radar_lon)
+            for k in range(0, len(shifts), chunk)])
+
+    for i in range(n_iter):
+        if offset != 0.0:
+            search_vals = np.linspace(-0.1 * abs(offset), 0.1 * abs(offset), 1001)
+        else:
+            search_vals = np.linspace(-0.1, 0.1, 5001)
+
+        step = max(1, coarse_step)
+        inds = np.union1d(np.arange(0, len(search_vals), step), [len(search_vals) - 1])
+        cc_coeffs = _corr(search_vals[inds])
+        while step > 1:
+            best = inds[np.argsort(-cc_coeffs)[:n_keep]]
+            new_step = max(1, step // 10)
+            inds = np.unique(np.clip(
+                best[:, None] + np.arange(-step, step + 1, new_step)[None, :],
+                0, len(search_vals) - 1))
+            step = new_step
+            cc_coeffs = _corr(search_vals[inds])
+        offset += search_vals[inds[np.argmax(cc_coeffs)]]
+    return offset
+
+
+def _interp_linear(x, xp, fp, extrapolate=False):
+    """Linearly interpolate like interp1d, but for any shape of x at once."""
+    vals = np.interp(x, xp, fp, left=np.nan, right=np.nan)
+    if extrapolate and len(xp) > 1:
+        left = x < xp[0]
+        vals[left] = fp[0] + (x[left] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+        right = x > xp[-1]
+        vals[right] = fp[-1] + (x[right] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    return vals
+
+
+def _rowwise_corrcoef(mat, vec):
+    """Correlation of each row of mat with vec, ignoring NaNs.
+
+    Rows without enough overlap to correlate come out as -inf so they are
+    never the best match.
+    """
+    valid = ~np.isnan(mat) & ~np.isnan(vec)[None, :]
+    count = np.sum(valid, axis=1)
+    mat = np.where(valid, mat, 0.)
+    vec = np.where(valid, vec[None, :], 0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mat_anom = np.where(valid, mat - (np.sum(mat, axis=1) / count)[:, None], 0.)
+        vec_anom = np.where(valid, vec - (np.sum(vec, axis=1) / count)[:, None], 0.)
+        corr = np.sum(mat_anom * vec_anom, axis=1) / np.sqrt(
+            np.sum(mat_anom ** 2., axis=1) * np.sum(vec_anom ** 2., axis=1))
+    corr[~np.isfinite(corr) | (count < 2)] = -np.inf
+    return corr
+
+
 def kinematic_gps_mat(dats, mat_fn, offset=0.0, extrapolate=False,
-                      guess_offset=False):
+                      guess_offset=False, jobs=1, chunk_lines=None):
     """Use a matlab file with gps info to redo radar GPS.
 
     Parameters
@@ -417,10 +624,28 @@ def kinematic_gps_mat(dats, mat_fn, offset=0.0, extrapolate=False,
         but dangerous since you can totally screw up the geolocation and
         not get an error.
         USE WITH CAUTION.
+    guess_offset: bool, optional
+        Try to find the offset between the GPS and radar times
+    jobs: int, optional
+        Number of processes to use when guessing offsets. Default 1.
+    chunk_lines: int, optional
+        For v7.3 (hdf5) matlab files, read this many epochs at a time and
+        keep only those near the times of the radar data. Requires h5py.
+        Ignored for older matlab files, which are read in one go.
     """
     from scipy.io import loadmat
-    mat = loadmat(mat_fn)
-    for val in ['lat', 'long', 'elev', 'decday']:
+    fields = ['lat', 'long', 'elev', 'decday']
+    try:
+        mat = loadmat(mat_fn, variable_names=fields)
+    except NotImplementedError:
+        # Matlab v7.3, which is hdf5
+        if not H5:
+            raise ImportError('Need h5py to read v7.3 matlab files')
+        if type(dats) not in [list, tuple]:
+            dats = [dats]
+        mat = _read_mat73_windowed(mat_fn, _gps_windows(dats, offset, guess_offset),
+                                   chunk_lines=chunk_lines or 1000000)
+    for val in fields:
         if val not in mat:
             raise ValueError('{:s} needs to be contained in matlab \
                                input file'.format(val))
@@ -430,12 +655,12 @@ def kinematic_gps_mat(dats, mat_fn, offset=0.0, extrapolate=False,
                           mat['elev'].flatten(),
                           mat['decday'].flatten(),
                           offset=offset, extrapolate=extrapolate,
-                          guess_offset=guess_offset)
+                          guess_offset=guess_offset, jobs=jobs)
 
 
 def kinematic_gps_csv(dats, csv_fn, offset=0, names='decday,long,lat,elev',
-                      extrapolate=False, guess_offset=False,
-                      **genfromtxt_flags):
+                      extrapolate=False, guess_offset=False, jobs=1,
+                      chunk_lines=None, **genfromtxt_flags):
     """Use a csv gps file to redo the GPS on radar data.
 
     The csv is read using numpy.genfromtxt, which supports a number of options.
@@ -462,11 +687,27 @@ def kinematic_gps_csv(dats, csv_fn, offset=0, names='decday,long,lat,elev',
         totally screw up
         the geolocation and not get an error.
         USE WITH CAUTION.
+    guess_offset: bool, optional
+        Try to find the offset between the GPS and radar times
+    jobs: int, optional
+        Number of processes to use when guessing offsets. Default 1.
+    chunk_lines: int, optional
+        If not None, stream the file this many lines at a time and keep only
+        epochs near the times of the radar data, so that long GPS logs do
+        not need to fit in memory. The file must be sorted by time.
+        Default None (read the whole file).
 
 
     Any additional kwargs are passed to numpy.genfromtxt
     """
-    data = np.genfromtxt(csv_fn, names=names, **genfromtxt_flags)
+    if chunk_lines is None:
+        data = np.genfromtxt(csv_fn, names=names, **genfromtxt_flags)
+    else:
+        if type(dats) not in [list, tuple]:
+            dats = [dats]
+        data = _read_csv_windowed(csv_fn, _gps_windows(dats, offset, guess_offset),
+                                  chunk_lines=chunk_lines, names=names,
+                                  **genfromtxt_flags)
     kinematic_gps_control(dats,
                           data['lat'].flatten(),
                           data['long'].flatten(),
@@ -474,12 +715,150 @@ def kinematic_gps_csv(dats, csv_fn, offset=0, names='decday,long,lat,elev',
                           data['decday'].flatten(),
                           offset=offset,
                           extrapolate=extrapolate,
-                          guess_offset=guess_offset)
+                          guess_offset=guess_offset,
+                          jobs=jobs)
+
+
+def _gps_windows(dats, offset=0.0, guess_offset=False):
+    """Get the GPS times that we need to geolocate some radar data.
+
+    If we are guessing the offset, we need enough extra to cover the search.
+
+    Returns
+    -------
+    np.ndarray (n, 2)
+        The start and end of each window, in GPS time
+    """
+    if guess_offset:
+        # 5 searches, at most 0.1 days from zero or 10% of the offset each
+        pad = 0.1 * 1.1 ** 5 + (1.1 ** 5 - 1.) * abs(offset)
+    else:
+        pad = 0.
+    return np.array([[np.nanmin(dat.decday) - offset - pad,
+                      np.nanmax(dat.decday) - offset + pad] for dat in dats])
+
+
+def _merge_windows(windows):
+    """Sort and merge overlapping windows so they are disjoint."""
+    windows = windows[np.argsort(windows[:, 0])]
+    merged = [list(windows[0])]
+    for start, end in windows[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return np.array(merged)
+
+
+class _WindowFilter:
+    """Keep the epochs of a time-sorted stream that we need for some windows.
+
+    We keep both ends of every pair of consecutive epochs that overlaps a
+    window, so we get the epochs in the windows plus one on either side (or
+    just the two on either side if a window falls between epochs), and can
+    interpolate right up to the edges.
+    """
+
+    def __init__(self, windows):
+        windows = _merge_windows(windows)
+        self.starts = windows[:, 0]
+        self.ends = windows[:, 1]
+        self.done = False
+        self._prev = None
+        self._prev_ended = 0
+        self._prev_kept = False
+
+    def __call__(self, times, chunk):
+        """Return a list of the parts of chunk (and the last chunk) to keep."""
+        # Windows are disjoint, so we are in one if more have started than ended
+        started = np.searchsorted(self.starts, times, side='right')
+        ended = np.searchsorted(self.ends, times, side='left')
+        keep = started > ended
+        pair_hits = started[1:] > ended[:-1]
+        keep[:-1] |= pair_hits
+        keep[1:] |= pair_hits
+
+        out = [chunk[keep]]
+        if self._prev is not None and started[0] > self._prev_ended:
+            keep[0] = True
+            out = [chunk[keep]]
+            if not self._prev_kept:
+                out.insert(0, self._prev)
+
+        self._prev = chunk[-1:]
+        self._prev_ended = ended[-1]
+        self._prev_kept = keep[-1]
+        # Times are sorted, so once all windows have ended we are done
+        self.done = ended[-1] == len(self.ends)
+        return out
+
+
+def _read_csv_windowed(csv_fn, windows, chunk_lines=100000, names=None,
+                       delimiter=None, skip_header=0, **genfromtxt_flags):
+    """Read the epochs of a csv that fall near some time windows.
+
+    The file is read chunk_lines at a time, and we stop once we are past the
+    last window, so memory is set by the chunk size and the window lengths.
+    """
+    filt = _WindowFilter(windows)
+    out = []
+    with open(csv_fn, 'r') as fin:
+        for line in islice(fin, skip_header):
+            pass
+        if names is True:
+            names = fin.readline().strip().lstrip('#').split(delimiter)
+            names = [name.strip() for name in names]
+        while not filt.done:
+            lines = list(islice(fin, chunk_lines))
+            if len(lines) == 0:
+                break
+            chunk = np.atleast_1d(np.genfromtxt(lines, names=names,
+                                                delimiter=delimiter,
+                                                **genfromtxt_flags))
+            if len(chunk) == 0:
+                continue
+            out.extend(filt(chunk['decday'], chunk))
+    out = [chunk for chunk in out if len(chunk) > 0]
+    if len(out) == 0:
+        raise ValueError('No GPS data near the radar times in {:s}'.format(csv_fn))
+    return np.hstack(out)
+
+
+def _read_mat73_windowed(mat_fn, windows, chunk_lines=1000000):
+    """Read lat, long, elev, and decday near some time windows from hdf5 matlab."""
+    fields = ['lat', 'long', 'elev', 'decday']
+    filt = _WindowFilter(windows)
+    out = []
+    with h5py.File(mat_fn, 'r') as fin:
+        for field in fields:
+            if field not in fin:
+                raise ValueError('{:s} needs to be contained in matlab \
+                                   input file'.format(field))
+        # matlab vectors are stored as 1 x n or n x 1
+        dsets = {field: fin[field] for field in fields}
+        axis = int(np.argmax(dsets['decday'].shape))
+        npts = dsets['decday'].shape[axis]
+
+        def _get(dset, start):
+            sl = [0, 0]
+            sl[axis] = slice(start, start + chunk_lines)
+            return dset[tuple(sl)]
+
+        for start in range(0, npts, chunk_lines):
+            chunk = np.vstack([_get(dsets[field], start) for field in fields]).transpose()
+            out.extend(filt(chunk[:, -1], chunk))
+            if filt.done:
+                break
+    out = [chunk for chunk in out if len(chunk) > 0]
+    if len(out) == 0:
+        raise ValueError('No GPS data near the radar times in {:s}'.format(mat_fn))
+    out = np.vstack(out)
+    return {field: out[:, i] for i, field in enumerate(fields)}
 
 
 def interp(dats, spacing=None, fn=None, fn_type=None, offset=0.0,
            min_movement=1.0e-2, genfromtxt_kwargs={}, extrapolate=False,
-           guess_offset=False, **kwargs):
+           guess_offset=False, jobs=1, **kwargs):
     """Do kinematic GPS control then interpolate the data to constant spacing.
 
     Parameters
@@ -504,6 +883,11 @@ def interp(dats, spacing=None, fn=None, fn_type=None, offset=0.0,
         Desirable for small offsets with the GPS, but dangerous since you can
         totally screw up the geolocation and not get an error.
         USE WITH CAUTION.
+    guess_offset: bool, optional
+        Guess the offset between GPS and radar times. See kinematic_gps_control.
+    jobs: int, optional
+        Number of processes to use for guessing the offsets of different
+        profiles. Default 1 (no parallelism).
     """
     if fn is not None:
         if fn_type == 'mat' or ((fn_type is None) and (fn[-4:] == '.mat')):
@@ -511,7 +895,8 @@ def interp(dats, spacing=None, fn=None, fn_type=None, offset=0.0,
                               fn,
                               offset=offset,
                               extrapolate=extrapolate,
-                              guess_offset=guess_offset)
+                              guess_offset=guess_offset,
+                              jobs=jobs)
         elif fn_type == 'csv' or (fn_type is None and fn[-4:] in ['.csv',
                                                                   '.txt']):
             kinematic_gps_csv(dats,
@@ -519,6 +904,7 @@ def interp(dats, spacing=None, fn=None, fn_type=None, offset=0.0,
                               offset=offset,
                               extrapolate=extrapolate,
                               guess_offset=guess_offset,
+                              jobs=jobs,
                               **genfromtxt_kwargs)
         else:
             raise ValueError('Cannot identify fn filetype, must be mat or csv')
@@ -69,10 +69,7 @@ def load(filetype, fns_in, channel=1, *args, **kwargs):
         # Slightly different because we assume that we want to concat
         dat = [load_olaf.load_olaf(fns_in, channel=channel)]
     elif filetype == 'segy':
-        if load_segy.SEGY:
-            dat = [load_segy.load_segy(fn) for fn in fns_in]
-        else:
-            raise ImportError('Failed to import segyio, cannot read segy')
+        dat = [load_segy.load_segy(fn) for fn in fns_in]
     elif filetype == 'gprMax':
         dat = [load_gprMax.load_gprMax(fn) for fn in fns_in]
     elif filetype == 'mcords_nc':
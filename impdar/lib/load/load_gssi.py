@@ -104,8 +104,8 @@ def _get_dzg_data(fn_dzg, trace_nums):
         gssis_inds_keep.append(gssis_inds[-1])
 
     scans = np.array(list(map(lambda x: int(x.split(',')[1]),
-                              [line for i, line in enumerate(lines) if i in gssis_inds_keep])))
-    data = RadarGPS([line for i, line in enumerate(lines) if i in gga_inds], scans, trace_nums)
+                              [lines[i] for i in gssis_inds_keep])))
+    data = RadarGPS([lines[i] for i in gga_inds], scans, trace_nums)
     return data
 
 
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+"""Read the pick tables written by RadarData.output_parquet, in bulk."""
+
+import os
+import numpy as np
+
+try:
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    PYARROW = True
+except ImportError:
+    PYARROW = False
+
+
+def load_pick_table(fns, columns=None):
+    """Read the traces and picks of many profiles into one set of columns.
+
+    Each file is read with only the requested columns. Profiles that lack
+    some column (e.g. a pick that was not made in that profile, or x_coord)
+    are filled with NaNs, so the result has one row per trace of every file.
+
+    Parameters
+    ----------
+    fns: str or list of str
+        Parquet (or .feather/.arrow) files from RadarData.output_parquet
+    columns: list of str, optional
+        The columns to read. Default is every column in any of the files.
+
+    Returns
+    -------
+    dict
+        Column name: (ntraces,) np.ndarray, for every column, in the order
+        in which they are first found.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow cannot be imported
+    """
+    if not PYARROW:
+        raise ImportError('pyarrow could not be imported')
+    if not isinstance(fns, (list, tuple)):
+        fns = [fns]
+
+    tables = []
+    for fn in fns:
+        if os.path.splitext(fn)[1].lower() in ['.feather', '.arrow']:
+            # memory mapped, so we only really read the columns we keep
+            table = feather.read_table(fn, memory_map=True)
+            if columns is not None:
+                table = table.select([col for col in columns if col in table.column_names])
+        else:
+            names = pq.read_schema(fn).names
+            cols = names if columns is None else [col for col in columns if col in names]
+            table = pq.read_table(fn, columns=cols)
+        tables.append((table.num_rows,
+                       {name: table.column(name).to_numpy() for name in table.column_names}))
+
+    if columns is None:
+        columns = []
+        for _, table in tables:
+            columns.extend([name for name in table if name not in columns])
+
+    out = {}
+    for name in columns:
+        vals = []
+        for nrows, table in tables:
+            if name in table:
+                vals.append(table[name])
+            else:
+                vals.append(np.ones((nrows,)) * np.nan)
+        out[name] = np.hstack(vals)
+    return out
@@ -12,12 +12,7 @@ Loading of SEGY files.
 import numpy as np
 from ..RadarData import RadarData
 from ..RadarFlags import RadarFlags
-
-try:
-    import segyio
-    SEGY = True
-except ImportError:
-    SEGY = False
+from ..segylib import read_segy
 
 
 def load_segy(fn_sgy, *args, **kwargs):
@@ -25,18 +20,17 @@ def load_segy(fn_sgy, *args, **kwargs):
 
     This is very generic for now, need to do work if there are particular
     types of segy files that need to be read. We cannot yet support a
-    generic SEGY file, even if complies to some standard set.
+    generic SEGY file, even if complies to some standard set; in particular,
+    all traces must be the same length.
     """
-    if not SEGY:
-        raise ImportError('Need segyio to load SGY files')
     segy_data = RadarData(None)
     segy_data.fn = fn_sgy
-    f = segyio.open(fn_sgy, ignore_geometry=True)
+    data, headers, binary = read_segy(fn_sgy)
 
-    segy_data.data = segyio.tools.collect(f.trace).transpose()
-    segy_data.snum = f.bin[segyio.BinField.Samples]
+    segy_data.data = data
+    segy_data.snum = data.shape[0]
     segy_data.tnum = segy_data.data.shape[1]
-    segy_data.dt = f.bin[segyio.BinField.Interval] * 1.0e-12
+    segy_data.dt = binary['hdt'] * 1.0e-12
     segy_data.travel_time = np.arange(segy_data.snum) * segy_data.dt * 1.0e6
     segy_data.trace_num = np.arange(segy_data.data.shape[1]) + 1
     segy_data.flags = RadarFlags()
@@ -50,8 +44,8 @@ def load_segy(fn_sgy, *args, **kwargs):
     segy_data.chan = 1
     segy_data.trig = np.zeros((segy_data.tnum, ))
     segy_data.decday = np.zeros((segy_data.tnum, ))
-    segy_data.x_coord = f.attributes(segyio.TraceField.CDP_X)[:] / 10.0
-    segy_data.y_coord = f.attributes(segyio.TraceField.CDP_Y)[:] / 10.0
+    segy_data.x_coord = headers['cdpx'] / 10.0
+    segy_data.y_coord = headers['cdpy'] / 10.0
     segy_data.dist = np.hstack(([0],
                                 np.cumsum(np.sqrt(
                                     np.diff(segy_data.x_coord)**2.0 + np.diff(
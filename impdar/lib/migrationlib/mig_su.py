@@ -25,8 +25,10 @@ Mar 12 2019
 
 from __future__ import print_function
 import os
+import tempfile
 import subprocess as sp
 import numpy as np
+from ..segylib import encode_su, decode_su
 
 
 def migrationSeisUnix(dat,
@@ -40,7 +42,8 @@ def migrationSeisUnix(dat,
                       vtaper=1000,
                       nz=None,
                       dz=None,
-                      quiet=False
+                      quiet=False,
+                      pipe=True
                       ):
     """
 
@@ -51,6 +54,11 @@ def migrationSeisUnix(dat,
                 migration which combines the advantages of phase shift and finite difference migrations.
     3) sustolt - Stolt migration for stacked data or common-offset gathers
 
+    By default, the traces are streamed to the SeisUnix routine in SU format on stdin and the
+    migrated traces read back from stdout, so nothing is written to disk. With pipe=False, we
+    instead write SEG-Y and go through segyread/segyclean/sustrip; any files this needs are
+    put in a private temporary directory, so concurrent runs cannot clash.
+
 
     Parameters
     ---------
@@ -70,6 +78,7 @@ def migrationSeisUnix(dat,
     ftau=ft                first migrated time sample
     Q=1e6                  quality factor
     ceil=1e6               gain ceiling beyond which migration ceases
+    pipe: stream SU traces through stdin/stdout rather than going through SEG-Y files
 
     Output
     ---------
@@ -77,13 +86,9 @@ def migrationSeisUnix(dat,
 
     """
 
-    if sp.Popen(['which', mtype]).wait() != 0:
+    if sp.Popen(['which', mtype], stdout=sp.DEVNULL).wait() != 0:
         raise FileNotFoundError('Cannot find chosen SeisUnix migration routine,' + mtype + '. Either install or choose a different migration routine.')
 
-    # save to seisunix format for migration with SU routines
-    out_fn = os.path.splitext(dat.fn)[0] + '.sgy'
-    dat.save_as_segy(out_fn)
-
     # Get the trace spacing
     if np.mean(dat.trace_int) <= 0:
         Warning("The trace spacing, variable 'dat.trace_int', should be greater than 0. Using gradient(dat.dist) instead.")
@@ -96,88 +101,69 @@ def migrationSeisUnix(dat,
     if dz is None:
         dz = 169 * dat.travel_time[-1] / 2 / dat.snum
 
-    # Do the migration through the command line
-    segy_name = os.path.splitext(dat.fn)[0]
-    bin_fn = os.path.splitext(dat.fn)[0] + '_mig.bin'
-
-    if quiet:
-        stderr = sp.PIPE
-    else:
-        stderr = None
-
-    ps1 = sp.Popen(['segyread', 'tape=' + segy_name + '.sgy'], stdout=sp.PIPE, stderr=stderr)
-    ps2 = sp.Popen(['segyclean'], stdin=ps1.stdout, stdout=sp.PIPE, stderr=stderr)
     # Time Wavenumber
     if mtype == 'sumigtk':
-        ps3 = sp.Popen(['sumigtk',
-                        'tmig={:f}'.format(tmig),
-                        'vmig={:f}'.format(vel * 1.e-6),
-                        'verbose=' + str(verbose),
-                        'nxpad={:d}'.format(int(nxpad)),
-                        'ltaper={:d}'.format(htaper),
-                        'dxcdp={:f}'.format(dx)],
-                       stdout=sp.PIPE,
-                       stderr=stderr,
-                       stdin=ps2.stdout)
-
+        mig_cmd = ['sumigtk',
+                   'tmig={:f}'.format(tmig),
+                   'vmig={:f}'.format(vel * 1.e-6),
+                   'verbose=' + str(verbose),
+                   'nxpad={:d}'.format(int(nxpad)),
+                   'ltaper={:d}'.format(htaper),
+                   'dxcdp={:f}'.format(dx)]
     # Fourier Finite Difference
     elif mtype == 'sumigffd':
         if vel_fn is None:
             raise ValueError('vel_fn needed for gffd')
-        ps3 = sp.Popen(['sumigffd',
-                        'vfile=' + vel_fn,
-                        'nz={:d}'.format(nz),
-                        'dz={:f}'.format(dz),
-                        'dt={:f}'.format(dat.dt * 1.0e-6),
-                        'dx={:f}'.format(dx)],
-                       stdout=sp.PIPE,
-                       stderr=stderr,
-                       stdin=ps2.stdout)
+        mig_cmd = ['sumigffd',
+                   'vfile=' + os.path.abspath(vel_fn),
+                   'nz={:d}'.format(nz),
+                   'dz={:f}'.format(dz),
+                   'dt={:f}'.format(dat.dt * 1.0e-6),
+                   'dx={:f}'.format(dx)]
     # Stolt
     elif mtype == 'sustolt':
-        ps3 = sp.Popen(['sustolt',
-                        'tmig={:f}'.format(tmig),
-                        'vmig={:f}'.format(vel * 1.0e-6),
-                        'verbose=' + str(verbose),
-                        'lstaper={:d}'.format(htaper),
-                        'lbtaper={:d}'.format(vtaper),
-                        'dxcdp={:f}'.format(dx),
-                        'cdpmin=0',
-                        'cdpmax={:d}'.format(dat.tnum)],
-                       stdout=sp.PIPE,
-                       stderr=stderr,
-                       stdin=ps2.stdout)
-    # Stolt
+        mig_cmd = ['sustolt',
+                   'tmig={:f}'.format(tmig),
+                   'vmig={:f}'.format(vel * 1.0e-6),
+                   'verbose=' + str(verbose),
+                   'lstaper={:d}'.format(htaper),
+                   'lbtaper={:d}'.format(vtaper),
+                   'dxcdp={:f}'.format(dx),
+                   'cdpmin=0',
+                   'cdpmax={:d}'.format(dat.tnum)]
     else:
-        ps1.stdout.close()
-        ps2.communicate()
-
         raise ValueError('The SeisUnix migration routine', mtype, 'has not been implemented in ImpDAR. Optionally, use ImpDAR to convert to SegY and run the migration in the command line.')
 
+    if quiet:
+        stderr = sp.DEVNULL
+    else:
+        stderr = None
 
-    ps4 = sp.Popen(['sustrip', segy_name + '_' + mtype + '.sgy'], stdin=ps3.stdout, stderr=stderr, stdout=sp.PIPE)
-    with open(bin_fn, 'wb') as fout:
-        fout.write(ps4.communicate()[0])
-    with open(bin_fn, 'rb') as fid:
-        data_flat = np.fromfile(fid, np.float32)
-    for ps in [ps1, ps2, ps3, ps4]:
-        ps.wait()
-        ps.stdout.close()
-        try:
-            ps.stderr.close()
-        except AttributeError:
-            pass
-
-    dat.data = np.transpose(np.reshape(data_flat, (dat.tnum, dat.snum)))
-
-    # Cleanup but don't worry if we fail
-    try:
-        os.remove(bin_fn)
-        os.remove('header')
-        os.remove('binary')
-        os.remove(segy_name + '.sgy')
-    except FileNotFoundError:
-        pass
+    # SeisUnix may drop files (e.g. header, binary) in the working directory
+    with tempfile.TemporaryDirectory(prefix='impdar_su_') as tmp_dir:
+        if pipe:
+            ps_mig = sp.Popen(mig_cmd, stdin=sp.PIPE, stdout=sp.PIPE, stderr=stderr, cwd=tmp_dir)
+            su_out = ps_mig.communicate(encode_su(dat.data, dat.dt))[0]
+            if ps_mig.returncode != 0:
+                raise sp.CalledProcessError(ps_mig.returncode, mig_cmd)
+            data_mig = decode_su(su_out)[0]
+        else:
+            sgy_fn = os.path.join(tmp_dir, 'in.sgy')
+            dat.save_as_segy(sgy_fn)
+            ps1 = sp.Popen(['segyread', 'tape=' + sgy_fn], stdout=sp.PIPE, stderr=stderr, cwd=tmp_dir)
+            ps2 = sp.Popen(['segyclean'], stdin=ps1.stdout, stdout=sp.PIPE, stderr=stderr, cwd=tmp_dir)
+            ps3 = sp.Popen(mig_cmd, stdin=ps2.stdout, stdout=sp.PIPE, stderr=stderr, cwd=tmp_dir)
+            ps4 = sp.Popen(['sustrip', 'head=' + os.path.join(tmp_dir, 'headers')],
+                           stdin=ps3.stdout, stdout=sp.PIPE, stderr=stderr, cwd=tmp_dir)
+            # Let the upstream processes see a broken pipe if a later one dies
+            for ps in [ps1, ps2, ps3]:
+                ps.stdout.close()
+            data_flat = np.frombuffer(ps4.communicate()[0], np.float32)
+            for ps in [ps1, ps2, ps3]:
+                ps.wait()
+            data_mig = np.transpose(np.reshape(data_flat, (dat.tnum, -1)))
+
+    dat.data = np.array(data_mig)
     return dat
 
 
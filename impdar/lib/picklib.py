@@ -8,6 +8,7 @@
 
 """Functions that are a for the mechanics of picking, not for the display."""
 
+import os
 import numpy as np
 from scipy.spatial import cKDTree as KDTree
 
@@ -39,12 +40,8 @@ def pick(traces, snum_start, snum_end, pickparams):
         packet, time (deprecated, all nans), and power. Size 5xtnum
     """
     # This is similar to stp_pickloop
-    picks_out = np.zeros((5, traces.shape[1]))
     dmid = _midpoint(traces.shape[1], snum_start, snum_end)
-    for i in range(traces.shape[1]):
-        pickpacket = packet_pick(traces[:, i], pickparams, dmid[i])
-        picks_out[:, i] = pickpacket
-    return picks_out
+    return packet_pick_batch(traces, pickparams, dmid)
 
 
 def _midpoint(len_tnums, snum_start, snum_end):
@@ -153,6 +150,281 @@ def packet_pick(trace, pickparams, midpoint):
     return [tpeak + topsnum, cpeak + topsnum, bpeak + topsnum, np.nan, power]
 
 
+def packet_pick_batch(traces, pickparams, midpoints):
+    """Pick packets in many traces at once.
+
+    This gives the same answer as calling `packet_pick` on each trace, but
+    all packets are pulled out into a single (plength x ntraces) array so that
+    the peak searches and the power are done with masked reductions along the
+    first axis rather than in a python loop. Packets that hang off the top
+    or bottom of the traces (or contain infs) are handed off to `packet_pick`
+    so that the edge behavior is unchanged.
+
+    Parameters
+    ----------
+    traces: numpy.ndarray
+        snum x ntraces chunk of data to pick
+    pickparams: impdar.lib.PickParameters.PickParameters
+        The information about picking that we need for determining window
+        size and polarity
+    midpoints: numpy.ndarray
+        (ntraces,) The guess at the index of the pick in each trace
+
+    Returns
+    -------
+    numpy.ndarray
+        The picks selected. Rows are: top of packet, center pick, bottom of
+        packet, time (deprecated, all nans), and power. Size 5xntraces
+    """
+    ntraces = traces.shape[1]
+    picks_out = np.zeros((5, ntraces))
+    if ntraces == 0:
+        return picks_out
+
+    midpoints = np.asarray(midpoints, dtype=float)
+    # Same window as packet_power, but for all traces (int truncates to 0)
+    tops = np.trunc(midpoints - pickparams.plength / 2.).astype(int)
+    bottoms = np.trunc(midpoints + pickparams.plength / 2.).astype(int)
+    plength = int(pickparams.plength)
+    regular = (tops >= 0) & (bottoms <= traces.shape[0]) & (
+        bottoms - tops == plength) & (plength == pickparams.plength)
+
+    if np.any(regular):
+        # Same checks as packet_pick, but the size is the same for all packets
+        if plength < pickparams.scst + pickparams.FWW:
+            raise ValueError('Your choice of frequency is too high, \
+                             making the pick window sub-pixel in size')
+        if len(range(plength)[pickparams.scst:
+                              pickparams.scst + pickparams.FWW]) == 0:
+            raise ValueError('Your choice of frequency (too low) is causing the\
+                             pick window to be too large')
+
+        cols = np.where(regular)[0]
+        rows = np.arange(plength)[:, None]
+        packets = traces[tops[cols][None, :] + rows, cols[None, :]]
+
+        # masked argmin cannot tell an inf in the window from the mask
+        infs = np.any(np.isinf(packets), axis=0)
+        if np.any(infs):
+            regular[cols[infs]] = False
+            cols = cols[~infs]
+            packets = packets[:, ~infs]
+
+    if np.any(regular):
+        polpackets = packets * pickparams.pol
+
+        # Find the center peak
+        cpeak = np.argmax(polpackets[pickparams.scst + 1:
+                                     pickparams.scst + pickparams.FWW + 1],
+                          axis=0) + pickparams.scst + 1
+
+        # Find a peak with opposite polarity higher up
+        tstart = np.maximum(cpeak - pickparams.FWW, 0)
+        tmask = (rows >= tstart[None, :]) & (rows < cpeak[None, :])
+        tpeak = np.argmin(np.where(tmask, polpackets, np.inf), axis=0)
+        tpeak[cpeak <= 1] = 0
+
+        # Find a peak with opposite polarity lower down
+        bmask = (rows > cpeak[None, :]) & (
+            rows < cpeak[None, :] + pickparams.FWW + 1)
+        bpeak = np.argmin(np.where(bmask, polpackets, np.inf), axis=0)
+        bpeak[cpeak >= plength - 1] = plength - 1
+
+        pmask = (rows >= tpeak[None, :]) & (rows <= bpeak[None, :])
+        power = np.sum(np.where(pmask, packets ** 2., 0.), axis=0) / (
+            bpeak - tpeak + 1)
+
+        picks_out[0, cols] = tpeak + tops[cols]
+        picks_out[1, cols] = cpeak + tops[cols]
+        picks_out[2, cols] = bpeak + tops[cols]
+        picks_out[3, cols] = np.nan
+        picks_out[4, cols] = power
+
+    for i in np.where(~regular)[0]:
+        picks_out[:, i] = packet_pick(traces[:, i], pickparams, midpoints[i])
+    return picks_out
+
+
+def track_layer(data, seeds, pickparams, extend=True):
+    """Track a reflector through a whole profile from some seed points.
+
+    Between seeds, this is the same as clicking on each seed in turn in the
+    picker: the line between them guides `pick`. Beyond the first and last
+    seeds, the reflector is followed trace by trace, using the center of the
+    last pick as the guess for the next one, until the search window would
+    leave the data.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        snum x tnum data to pick
+    seeds: numpy.ndarray
+        (nseeds, 2) trace number and sample number of points on the layer
+    pickparams: `impdar.lib.PickParameters.PickParameters`
+        Use for polarity, frequency, plength.
+    extend: bool, optional
+        Follow the layer past the first and last seeds. Default True.
+
+    Returns
+    -------
+    numpy.ndarray
+        The picks. Rows are: top of packet, center pick, bottom of packet,
+        time (deprecated, all nans), and power. Size 5xtnum, nans where the
+        layer was not picked.
+    """
+    seeds = np.atleast_2d(np.asarray(seeds, dtype=int))
+    seeds = seeds[np.argsort(seeds[:, 0], kind='stable')]
+    if np.any(seeds[:, 0] < 0) or np.any(seeds[:, 0] >= data.shape[1]) or np.any(
+            seeds[:, 1] < 0) or np.any(seeds[:, 1] >= data.shape[0]):
+        raise ValueError('Seeds must be within the data')
+
+    picks = np.zeros((5, data.shape[1]))
+    picks[:, :] = np.nan
+    for (tnum_start, snum_start), (tnum_end, snum_end) in zip(seeds[:-1], seeds[1:]):
+        if tnum_end > tnum_start:
+            picks[:, tnum_start:tnum_end] = pick(data[:, tnum_start:tnum_end],
+                                                 snum_start, snum_end, pickparams)
+    picks[:, seeds[-1, 0]] = packet_pick(data[:, seeds[-1, 0]], pickparams, seeds[-1, 1])
+
+    if extend:
+        _follow_layer(data, picks, seeds[0, 0], pickparams, -1)
+        _follow_layer(data, picks, seeds[-1, 0], pickparams, 1)
+    return picks
+
+
+def _follow_layer(data, picks, tnum, pickparams, step):
+    """Follow a layer from the pick at tnum, in place, until the window leaves the data"""
+    half = pickparams.plength / 2.
+    snum = picks[1, tnum]
+    tnum += step
+    while 0 <= tnum < data.shape[1] and half <= snum <= data.shape[0] - half:
+        picks[:, tnum] = packet_pick(data[:, tnum], pickparams, snum)
+        if not np.isfinite(picks[4, tnum]):
+            picks[:, tnum] = np.nan
+            break
+        snum = picks[1, tnum]
+        tnum += step
+
+
+def auto_pick(dats, seeds, extend=True, jobs=1):
+    """Track layers from seed points and put them in the picks.
+
+    This is the headless equivalent of picking in `imppick`. Picks with
+    numbers that already exist are overwritten.
+
+    Parameters
+    ----------
+    dats: list of impdar.RadarData or impdar.RadarData
+        The data to pick
+    seeds: dict or list of dicts
+        Keys are pick numbers, values are (nseeds, 2) arrays of the trace
+        number and sample number of points on that layer. A single dict is
+        used for all the data, otherwise there is one per RadarData.
+    extend: bool, optional
+        Follow layers past the first and last seeds. Default True.
+    jobs: int, optional
+        Number of processes to use for different profiles. Default 1 (no
+        parallelism).
+    """
+    if type(dats) not in [list, tuple]:
+        dats = [dats]
+    if isinstance(seeds, dict):
+        seeds = [seeds for dat in dats]
+    if len(seeds) != len(dats):
+        raise ValueError('Need seeds for every RadarData')
+
+    for dat in dats:
+        if dat.picks is None:
+            from .Picks import Picks
+            dat.picks = Picks(dat)
+    # The pickparameters link back to the whole RadarData, which we do not
+    # want to copy to other processes, so just send what picking needs
+    args = [(dat.data, dat_seeds, _PacketParameters(
+        dat.picks.pickparams.plength, dat.picks.pickparams.FWW,
+        dat.picks.pickparams.scst, dat.picks.pickparams.pol), extend)
+        for dat, dat_seeds in zip(dats, seeds)]
+    if jobs > 1 and len(dats) > 1:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+        except ImportError:
+            # No process pools on python 2, so do one profile at a time
+            jobs = 1
+    if jobs > 1 and len(dats) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            tracked = list(executor.map(_track_layers, *zip(*args)))
+    else:
+        tracked = [_track_layers(*arg) for arg in args]
+
+    for dat, dat_tracked in zip(dats, tracked):
+        for picknum, pick_info in dat_tracked.items():
+            if dat.picks.picknums is None or picknum not in dat.picks.picknums:
+                dat.picks.add_pick(picknum)
+            dat.picks.update_pick(picknum, pick_info)
+
+            # pick on from the end of the layer if going back to the picker
+            ind = dat.picks.picknums.index(picknum)
+            picked = np.where(~np.isnan(pick_info[1, :]))[0]
+            dat.picks.lasttrace.tnum[ind] = int(picked[-1])
+            dat.picks.lasttrace.snum[ind] = int(pick_info[1, picked[-1]])
+
+
+class _PacketParameters():
+    """Just the pick parameters that packet picking uses"""
+
+    def __init__(self, plength, FWW, scst, pol):
+        self.plength = plength
+        self.FWW = FWW
+        self.scst = scst
+        self.pol = pol
+
+
+def _track_layers(data, seeds, pickparams, extend):
+    """Track every layer in a profile. Module level so it can go to a process pool."""
+    return {picknum: track_layer(data, layer_seeds, pickparams, extend=extend)
+            for picknum, layer_seeds in seeds.items()}
+
+
+def load_seeds(fn_csv, delimiter=','):
+    """Read seed points for `auto_pick` from a csv.
+
+    The csv needs a header with columns pick, tnum, and snum. It can also
+    have a column fn, with the name of the file in which the point is. Points
+    without a file name are used for every file.
+
+    Parameters
+    ----------
+    fn_csv: str
+        The csv file
+    delimiter: str, optional
+        Passed to numpy.genfromtxt. Default ','.
+
+    Returns
+    -------
+    dict
+        Keys are file basenames (None for points without one), values are
+        dicts of seeds for `auto_pick`.
+    """
+    points = np.atleast_1d(np.genfromtxt(fn_csv, names=True, dtype=None,
+                                         delimiter=delimiter, encoding='utf-8',
+                                         autostrip=True))
+    for name in ['pick', 'tnum', 'snum']:
+        if name not in points.dtype.names:
+            raise ValueError('Seed csv needs a {:s} column'.format(name))
+    if 'fn' in points.dtype.names:
+        fns = [os.path.basename(fn) if fn else None for fn in points['fn']]
+    else:
+        fns = [None for point in points]
+
+    seeds = {}
+    for fn in set(fns):
+        mask = np.array([point_fn == fn for point_fn in fns])
+        seeds[fn] = {int(picknum): np.vstack((points['tnum'][mask & (points['pick'] == picknum)],
+                                              points['snum'][mask & (points['pick'] == picknum)])
+                                             ).transpose().astype(int)
+                     for picknum in np.unique(points['pick'][mask])}
+    return seeds
+
+
 def get_intersection(data_main, data_cross, return_nans=False):
     """Find the intersection of two radar datasets.
 
@@ -199,15 +471,18 @@ def get_intersection(data_main, data_cross, return_nans=False):
 
     tree = KDTree(np.vstack((
         data_main.x_coord.flatten(), data_main.y_coord.flatten())).transpose())
+    # Query the whole cross profile once, then subset for each pick
+    all_closest_dist, all_closest_inds = tree.query(np.vstack(
+        (data_cross.x_coord.flatten(),
+         data_cross.y_coord.flatten())).transpose())
     for i in range(len(out_tnums)):
         if return_nans:
             mask_pick_not_nan = np.ones_like(
                 data_cross.picks.samp1[i], dtype=bool)
         else:
             mask_pick_not_nan = ~np.isnan(data_cross.picks.samp1[i])
-        closest_dist, closest_inds = tree.query(np.vstack(
-            (data_cross.x_coord[mask_pick_not_nan].flatten(),
-             data_cross.y_coord[mask_pick_not_nan].flatten())).transpose())
+        closest_dist = all_closest_dist[mask_pick_not_nan.flatten()]
+        closest_inds = all_closest_inds[mask_pick_not_nan.flatten()]
 
         # need the spot in the cross profile that is closest
         # sequence will be empty if we have a pick that is purely nans
@@ -12,6 +12,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import scipy.signal as signal
 from .load import load
+from .RadargramPyramid import RadargramPyramid
 
 # define a set of non-gray colors (from Paul Tol)
 COLORS_NONGRAY = ['#CC6677', '#332288', '#DDCC77', '#117733', '#88CCEE',
@@ -44,9 +45,11 @@ def plot(fns, tr=None, s=False, ftype='png', dpi=300, xd=False, yd=False,
         Default is (0, -1) (plot all traces)
     flatten_layer: int, optional
         Distort the radargram so this layer is flat. Default is None (do not distort).
+    jobs: int, optional
+        Keyword only. When saving, the number of processes to use to plot
+        different files. Default 1 (no parallelism).
     """
-    radar_data = load(filetype, fns)
-
+    jobs = kwargs.get('jobs', 1)
     if xd:
         xdat = 'dist'
     else:
@@ -59,27 +62,37 @@ def plot(fns, tr=None, s=False, ftype='png', dpi=300, xd=False, yd=False,
     if (tr is not None) and (power is not None):
         raise ValueError('Cannot do both tr and power. Pick one')
 
-    if tr is not None:
-        figs = [plot_traces(dat, tr, ydat=ydat) for dat in radar_data]
-    elif power is not None:
+    plot_kwargs = {'tr': tr, 'xdat': xdat, 'ydat': ydat, 'ft': ft, 'hft': hft,
+                   'spectra': spectra, 'window': window, 'scaling': scaling,
+                   'pick_colors': pick_colors, 'clims': clims, 'cmap': cmap,
+                   'flatten_layer': flatten_layer}
+
+    if s and power is None:
+        # Every file gets its own figure, so load, plot, save, and close them
+        # one at a time (or a few at a time) rather than keeping them all
+        args = [(fn, os.path.splitext(fn)[0] + '.' + ftype, filetype, dpi, plot_kwargs)
+                for fn in fns]
+        if jobs > 1 and len(fns) > 1:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+            except ImportError:
+                # No process pools on python 2, so do one file at a time
+                jobs = 1
+        if jobs > 1 and len(fns) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                # workers draw off screen
+                list(executor.map(_save_plot, *(list(zip(*args)) + [[True] * len(args)])))
+        else:
+            for arg in args:
+                _save_plot(*arg)
+        return
+
+    radar_data = load(filetype, fns)
+    if power is not None:
         # Do it all on one axis if power
         figs = [plot_power(radar_data, power)]
-    elif ft:
-        figs = [plot_ft(dat) for dat in radar_data]
-    elif hft:
-        figs = [plot_hft(dat) for dat in radar_data]
-    elif spectra:
-        figs = [plot_spectrogram(dat, spectra, window=window, scaling=scaling) for dat in radar_data]
     else:
-        figs = [plot_radargram(dat,
-                               xdat=xdat,
-                               ydat=ydat,
-                               x_range=None,
-                               pick_colors=pick_colors,
-                               clims=clims,
-                               cmap=cmap,
-                               flatten_layer=flatten_layer)
-                for dat in radar_data]
+        figs = [_plot_dat(dat, **plot_kwargs) for dat in radar_data]
 
     for fig, dat in zip(figs, radar_data):
         if dat.fn is not None:
@@ -93,10 +106,47 @@ def plot(fns, tr=None, s=False, ftype='png', dpi=300, xd=False, yd=False,
         plt.show()
 
 
+def _plot_dat(dat, tr=None, xdat='tnum', ydat='twtt', ft=False, hft=False, spectra=None,
+              window=None, scaling='spectrum', pick_colors=None, clims=None,
+              cmap=plt.cm.gray, flatten_layer=None, dpi=None):
+    """Make whichever plot `plot` was asked for of a single RadarData, to be saved at dpi if given."""
+    if tr is not None:
+        return plot_traces(dat, tr, ydat=ydat)
+    elif ft:
+        return plot_ft(dat)
+    elif hft:
+        return plot_hft(dat)
+    elif spectra:
+        return plot_spectrogram(dat, spectra, window=window, scaling=scaling, dpi=dpi)
+    return plot_radargram(dat,
+                          xdat=xdat,
+                          ydat=ydat,
+                          x_range=None,
+                          pick_colors=pick_colors,
+                          clims=clims,
+                          cmap=cmap,
+                          flatten_layer=flatten_layer,
+                          dpi=dpi)
+
+
+def _save_plot(fn, out_fn, filetype, dpi, plot_kwargs, agg=False):
+    """Load and plot a file, save the figure, then close it. Module level so it can go to a process pool.
+
+    With agg, switch to the non-interactive backend first, as a process pool worker should.
+    """
+    if agg:
+        plt.switch_backend('Agg')
+    dat = load(filetype, [fn])[0]
+    fig = _plot_dat(dat, dpi=dpi, **plot_kwargs)[0]
+    fig.savefig(out_fn, dpi=dpi)
+    plt.close(fig)
+
+
 def plot_radargram(dat, xdat='tnum', ydat='twtt', x_range=(0, -1),
                    y_range=(0, -1), cmap=plt.cm.gray, fig=None, ax=None,
                    return_plotinfo=False, pick_colors=None, clims=None,
-                   flatten_layer=None, middle_picks_only=False):
+                   flatten_layer=None, middle_picks_only=False, decimate=True,
+                   dpi=None, cache=False, pyramid=None):
     """Plot a radio echogram.
 
     This function is a little weird since I want to be able to plot on top of
@@ -128,6 +178,19 @@ def plot_radargram(dat, xdat='tnum', ydat='twtt', x_range=(0, -1),
         Distort so this layer is flat
     middle_picks_only: bool, optional
         Allows you to specify color triples for plotting picks and not have them misinterptreted.
+    decimate: bool, optional
+        If there are more traces than pixels across the axes, draw a
+        min/max decimated copy of the data (see
+        :class:`~impdar.lib.RadargramPyramid.RadargramPyramid`). Default True.
+    dpi: float, optional
+        The resolution at which the figure will be saved, so that decimation
+        keeps at least one trace per saved pixel. Default is the figure dpi.
+    cache: bool, optional
+        Cache the decimated data next to the file, as
+        <name>_pyramid.npz, for reuse. Default False.
+    pyramid: impdar.lib.RadargramPyramid.RadargramPyramid, optional
+        Decimated copies of the data to draw from, as from get_pyramid with
+        the same flatten_layer, rather than making them here.
 
 
     Returns
@@ -167,12 +230,7 @@ def plot_radargram(dat, xdat='tnum', ydat='twtt', x_range=(0, -1),
     elif y_range[-1] == -1:
         y_range = (y_range[0], dat.data.shape[0])
 
-    if dat.data.dtype in [np.complex128]:
-        def norm(x):
-            return 10.0 * np.log10(np.absolute(x))
-    else:
-        def norm(x):
-            return x
+    norm = _norm
 
     if clims is None:
         clims = np.percentile(norm(dat.data[y_range[0]:y_range[-1],
@@ -217,43 +275,29 @@ def plot_radargram(dat, xdat='tnum', ydat='twtt', x_range=(0, -1),
         xd = dat.dist[x_range[0]:x_range[-1]]
         ax.set_xlabel('Distance (km)')
 
-    if flatten_layer is not None:
-        offset, _ = get_offset(dat, flatten_layer)
-
-        # Now construct the data matrix
-        tmp_data = np.zeros_like(dat.data)
-        tmp_data[:, :] = np.nan
-        for j in range(tmp_data.shape[1]):
-            if np.isnan(offset[j]):
-                continue
-            if int(offset[j]) == 0:
-                tmp_data[:, j] = dat.data[:, j]
-            elif offset[j] < 0 and (abs(offset[j]) < dat.snum):
-                tmp_data[:int(offset[j]), j] = dat.data[-int(offset[j]):, j]
-            elif (abs(offset[j]) < dat.snum) and offset[j]:
-                tmp_data[int(offset[j]):, j] = dat.data[:-int(offset[j]), j]
-        im = ax.imshow(norm(tmp_data[:, x_range[0]:x_range[-1]]),
-                       cmap=cmap,
-                       vmin=clims[0],
-                       vmax=clims[1],
-                       extent=[np.min(xd), np.max(xd), np.max(yd), np.min(yd)],
-                       aspect='auto')
-    elif hasattr(dat.flags, 'elev') and dat.flags.elev:
-        im = ax.imshow(norm(dat.data[y_range[0]:y_range[-1],
-                                     x_range[0]:x_range[-1]]),
-                       cmap=cmap,
-                       vmin=clims[0],
-                       vmax=clims[1],
-                       extent=[np.min(xd), np.max(xd), np.min(yd), np.max(yd)],
-                       aspect='auto')
+    if pyramid is not None:
+        # Already shifted and normalized, and covering every trace
+        data_window = _decimated_window(pyramid.levels[0], x_range,
+                                        (0, None) if flatten_layer is not None else y_range,
+                                        ax, decimate, dpi=dpi, pyramid=pyramid)
+    elif flatten_layer is not None:
+        tmp_data = get_display_data(dat, flatten_layer=flatten_layer, x_range=x_range)
+        data_window = _decimated_window(tmp_data, (0, tmp_data.shape[1]),
+                                        (0, None), ax, decimate, dpi=dpi)
     else:
-        im = ax.imshow(norm(dat.data[y_range[0]:y_range[-1],
-                                     x_range[0]:x_range[-1]]),
-                       cmap=cmap,
-                       vmin=clims[0],
-                       vmax=clims[1],
-                       extent=[np.min(xd), np.max(xd), np.max(yd), np.min(yd)],
-                       aspect='auto')
+        cache_fn = _pyramid_cache_fn(dat) if (decimate and cache) else None
+        data_window = _decimated_window(dat.data, x_range, y_range, ax, decimate,
+                                        norm=norm, cache_fn=cache_fn, dpi=dpi)
+    if flatten_layer is None and hasattr(dat.flags, 'elev') and dat.flags.elev:
+        extent = [np.min(xd), np.max(xd), np.min(yd), np.max(yd)]
+    else:
+        extent = [np.min(xd), np.max(xd), np.max(yd), np.min(yd)]
+    im = ax.imshow(data_window,
+                   cmap=cmap,
+                   vmin=clims[0],
+                   vmax=clims[1],
+                   extent=extent,
+                   aspect='auto')
 
     if (pick_colors is not None) and pick_colors:
         plot_picks(dat, xd, yd, fig=fig, ax=ax, colors=pick_colors, flatten_layer=flatten_layer, just_middle=middle_picks_only)
@@ -263,6 +307,103 @@ def plot_radargram(dat, xdat='tnum', ydat='twtt', x_range=(0, -1),
         return im, xd, yd, x_range, clims
 
 
+def get_display_data(dat, flatten_layer=None, x_range=None):
+    """Get the values that plot_radargram shows for some traces.
+
+    These are the data (in dB if complex), shifted so that flatten_layer is flat.
+
+    Parameters
+    ----------
+    dat: impdar.lib.RadarData.Radardata
+        The RadarData object to plot.
+    flatten_layer: int, optional
+        Distort so this layer is flat
+    x_range: 2-tuple, optional
+        The range of traces to get. Default all.
+
+    Returns
+    -------
+    np.ndarray (snum x ntraces)
+        The values to display
+    """
+    if x_range is None:
+        x_range = (0, dat.tnum)
+    data = dat.data[:, x_range[0]:x_range[-1]]
+    if flatten_layer is None:
+        return _norm(data)
+
+    offset, _ = get_offset(dat, flatten_layer)
+    # Shift each trace by its offset
+    offset = offset[x_range[0]:x_range[-1]]
+    shifts = np.trunc(np.where(np.isnan(offset), dat.snum, offset)).astype(int)
+    out = np.empty(data.shape, dtype=np.result_type(_norm(data[:1, :1]).dtype, np.float32))
+    # A block of traces at a time, so the index arrays stay small
+    step = max(1, 2 ** 20 // max(data.shape[0], 1))
+    for i in range(0, data.shape[1], step):
+        rows = np.arange(data.shape[0])[:, None] - shifts[None, i:i + step]
+        valid = (rows >= 0) & (rows < data.shape[0])
+        cols = np.arange(i, i + rows.shape[1])[None, :]
+        out[:, i:i + step] = np.where(valid, _norm(data[np.where(valid, rows, 0), cols]), np.nan)
+    return out
+
+
+def get_pyramid(dat, flatten_layer=None, cache=False):
+    """Get decimated copies of all the traces that plot_radargram shows.
+
+    Parameters
+    ----------
+    dat: impdar.lib.RadarData.Radardata
+        The RadarData object to plot.
+    flatten_layer: int, optional
+        Distort so this layer is flat
+    cache: bool, optional
+        Unless flattening, cache the copies next to the file. Default False.
+
+    Returns
+    -------
+    impdar.lib.RadargramPyramid.RadargramPyramid
+    """
+    cache_fn = _pyramid_cache_fn(dat) if (cache and flatten_layer is None) else None
+    return RadargramPyramid(get_display_data(dat, flatten_layer=flatten_layer),
+                            cache_fn=cache_fn)
+
+
+def _norm(data):
+    """Complex data are shown in dB"""
+    if data.dtype in [np.complex128]:
+        return 10.0 * np.log10(np.absolute(data))
+    return data
+
+
+def _pyramid_cache_fn(dat):
+    """Where to cache the decimated data for the file dat came from, if anywhere"""
+    if dat.fn is not None and os.path.isfile(dat.fn):
+        return os.path.splitext(dat.fn)[0] + '_pyramid.npz'
+    return None
+
+
+def _axes_pixels(ax, dpi=None):
+    """The width of ax in pixels, at dpi if given rather than the figure dpi"""
+    npixels = ax.get_window_extent().width
+    if dpi is not None:
+        npixels *= float(dpi) / ax.figure.dpi
+    return npixels
+
+
+def _decimated_window(data, x_range, y_range, ax, decimate, norm=None, cache_fn=None, dpi=None,
+                      pyramid=None):
+    """Get the part of data to show, decimated to the width of ax if it has more traces than pixels."""
+    npixels = _axes_pixels(ax, dpi)
+    if norm is None:
+        def norm(x):
+            return x
+    if (not decimate) or (x_range[-1] - x_range[0] <= 2 * npixels):
+        return norm(data[y_range[0]:y_range[-1], x_range[0]:x_range[-1]])
+    if pyramid is None:
+        pyramid = RadargramPyramid(norm(data), cache_fn=cache_fn)
+    return pyramid.get_window(x_range, npixels, y_range=(y_range[0], y_range[-1]))[0]
+
+
 def plot_ft(dat, fig=None, ax=None, **line_kwargs):
     """Plot the Fourier spectrum of the data in the vertical.
 
@@ -576,8 +717,56 @@ def plot_picks(rd, xd, yd, colors=None, flatten_layer=None, fig=None, ax=None, j
     return fig, ax
 
 
+def spectral_power(dat, window=None, scaling='spectrum', trace_step=1,
+                   single_precision=False):
+    """Get the power spectrum of every trace of a radar profile.
+
+    All the traces go through signal.periodogram at once.
+
+    Parameters
+    ----------
+    dat: impdar.lib.RadarData.Radardata
+        The RadarData object to use.
+    window: str, optional
+        Type of window to be used for the signal.periodogram() method.
+        Default None (boxcar).
+    scaling: str, optional
+        'density' or 'spectrum', the default being 'spectrum'.
+    trace_step: int, optional
+        Only use every trace_step-th trace. Default 1 (all of them).
+    single_precision: bool, optional
+        Do the calculation in float32. Default False.
+
+    Returns
+    -------
+    freq: np.ndarray (nfreq,)
+        The frequencies (Hz)
+    power: np.ndarray (nfreq x ntraces)
+        The power at each frequency for each trace used
+    tnums: np.ndarray (ntraces,)
+        The indices of the traces used
+    """
+    tnums = np.arange(0, dat.data.shape[1], max(1, int(trace_step)))
+    data = dat.data[:, tnums]
+    if single_precision:
+        data = data.astype(np.float32)
+    freq, power = signal.periodogram(data, fs=1. / dat.dt, window=window,
+                                     scaling=scaling, axis=0)
+    return freq, power, tnums
+
+
+def _cell_edges(centers):
+    """Edges of cells centered on (possibly unevenly spaced) values, for pcolormesh"""
+    centers = np.asarray(centers, dtype=float)
+    if len(centers) == 1:
+        return np.hstack((centers - 0.5, centers + 0.5))
+    mids = (centers[1:] + centers[:-1]) / 2.
+    return np.hstack((2. * centers[0] - mids[0], mids, 2. * centers[-1] - mids[-1]))
+
+
 def plot_spectrogram(dat, freq_limit=None, window=None,
-                     scaling='spectrum', fig=None, ax=None, **kwargs):
+                     scaling='spectrum', fig=None, ax=None, decimate=True,
+                     single_precision=False, dpi=None, **kwargs):
     """Make a plot of power spectral density across all traces of a radar profile.
 
     Parameters
@@ -600,6 +789,14 @@ def plot_spectrogram(dat, freq_limit=None, window=None,
         Figure canvas that should be plotted upon
     ax: matplotlib.pyplot.Axes, optional
         Axes that should be plotted upon
+    decimate: bool, optional
+        If there are more traces than pixels across the axes, only find the
+        spectra of enough traces to fill the axes. Default True.
+    dpi: float, optional
+        The resolution at which the figure will be saved, for deciding how
+        many traces fill the axes. Default is the figure dpi.
+    single_precision: bool, optional
+        Find the spectra in float32. Default False.
 
     Returns
     -------
@@ -608,37 +805,6 @@ def plot_spectrogram(dat, freq_limit=None, window=None,
     ax: matplotlib.pyplot.Axes
         Axes that were plotted upon
     """
-    # get the timestep variable, remove singleton dimension
-    timestep = dat.dt
-
-    # calculate frequency information from timestep variable
-    fs = 1. / timestep
-
-    # shape of data profile should be (samples, traces)
-    shape = np.shape(dat.data)
-    # extract the number of traces
-    traces = shape[1]
-
-    # iterate through traces, record frequencies and powers
-    powers = []
-    for trace in range(traces):
-        # get frequency and power information from trace
-        # hanning window will filter out certain frequencies,
-        # so it is optional to use it or not
-        freq, power = signal.periodogram(dat.data[:, trace],
-                                         fs=fs,
-                                         window=window,
-                                         scaling=scaling)
-        powers.append(power)
-
-    # extract trace number from matlab file
-    x = dat.trace_num
-
-    # frequency range will be the same, so we can select the first element
-    # set frequency range to be in MHz
-    y = freq / 1.0e6
-    xx, yy = np.meshgrid(x, y)
-
     # set figure and axis if they are not None
     if fig is not None:
         if ax is None:
@@ -646,12 +812,27 @@ def plot_spectrogram(dat, freq_limit=None, window=None,
     else:
         fig, ax = plt.subplots(figsize=(10, 7))
 
-    # plot in MHz
-    contours = ax.contourf(xx, yy, np.transpose(powers))
+    # Same rule as plot_radargram for when to decimate
+    npixels = _axes_pixels(ax, dpi)
+    trace_step = 1
+    if decimate and dat.data.shape[1] > 2 * npixels:
+        trace_step = int(dat.data.shape[1] // npixels)
+    freq, powers, tnums = spectral_power(dat, window=window, scaling=scaling,
+                                         trace_step=trace_step,
+                                         single_precision=single_precision)
+
+    # extract trace number from matlab file
+    x = np.asarray(dat.trace_num).flatten()[tnums]
+
+    # set frequency range to be in MHz
+    y = freq / 1.0e6
+
+    # plot in MHz, with cells centered on the traces and frequencies
+    im = ax.pcolormesh(_cell_edges(x), _cell_edges(y), powers)
 
     # set colorbar and colorbar label
     cbarlabel = 'Power (Amplitude **2)'
-    cbar = plt.colorbar(contours,
+    cbar = plt.colorbar(im,
                         shrink=0.9,
                         orientation='vertical',
                         pad=0.03,
@@ -0,0 +1,313 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 David Lilien <dlilien90@gmail.com>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+"""Read and write SEG-Y and SeisUnix (SU) data with numpy.
+
+The headers are described as numpy structured dtypes, so that a whole file
+(or a stream of SU traces) is a single array of records with a header and
+a data field; there is no loop over traces. SEG-Y files are memory-mapped.
+
+We follow the convention ImpDAR has always used for SEG-Y, which is that
+the sample interval is written in picoseconds rather than microseconds
+(i.e. SeisUnix sees time in microseconds rather than seconds), and that
+CDP coordinates are in decimeters.
+"""
+
+import numpy as np
+
+#: Sizes of the textual file header and binary file header of SEG-Y
+TEXT_HEADER_SIZE = 3200
+BINARY_HEADER_SIZE = 400
+
+#: The 240-byte trace header (SEG-Y rev 1 names, which SU shares up to cdpx)
+TRACE_HEADER_FIELDS = [('tracl', 'i4'), ('tracr', 'i4'), ('fldr', 'i4'), ('tracf', 'i4'),
+                       ('ep', 'i4'), ('cdp', 'i4'), ('cdpt', 'i4'), ('trid', 'i2'),
+                       ('nvs', 'i2'), ('nhs', 'i2'), ('duse', 'i2'), ('offset', 'i4'),
+                       ('gelev', 'i4'), ('selev', 'i4'), ('sdepth', 'i4'), ('gdel', 'i4'),
+                       ('sdel', 'i4'), ('swdep', 'i4'), ('gwdep', 'i4'), ('scalel', 'i2'),
+                       ('scalco', 'i2'), ('sx', 'i4'), ('sy', 'i4'), ('gx', 'i4'),
+                       ('gy', 'i4'), ('counit', 'i2'), ('wevel', 'i2'), ('swevel', 'i2'),
+                       ('sut', 'i2'), ('gut', 'i2'), ('sstat', 'i2'), ('gstat', 'i2'),
+                       ('tstat', 'i2'), ('laga', 'i2'), ('lagb', 'i2'), ('delrt', 'i2'),
+                       ('muts', 'i2'), ('mute', 'i2'), ('ns', 'u2'), ('dt', 'u2'),
+                       ('gain', 'i2'), ('igc', 'i2'), ('igi', 'i2'), ('corr', 'i2'),
+                       ('sfs', 'i2'), ('sfe', 'i2'), ('slen', 'i2'), ('styp', 'i2'),
+                       ('stas', 'i2'), ('stae', 'i2'), ('tatyp', 'i2'), ('afilf', 'i2'),
+                       ('afils', 'i2'), ('nofilf', 'i2'), ('nofils', 'i2'), ('lcf', 'i2'),
+                       ('hcf', 'i2'), ('lcs', 'i2'), ('hcs', 'i2'), ('year', 'i2'),
+                       ('day', 'i2'), ('hour', 'i2'), ('minute', 'i2'), ('sec', 'i2'),
+                       ('timbas', 'i2'), ('trwf', 'i2'), ('grnors', 'i2'), ('grnofr', 'i2'),
+                       ('grnlof', 'i2'), ('gaps', 'i2'), ('otrav', 'i2'), ('cdpx', 'i4'),
+                       ('cdpy', 'i4'), ('iline', 'i4'), ('xline', 'i4'), ('shotpoint', 'i4'),
+                       ('spscalar', 'i2'), ('unass', 'V38')]
+
+#: The 400-byte binary file header of SEG-Y
+BINARY_HEADER_FIELDS = [('jobid', 'i4'), ('lino', 'i4'), ('reno', 'i4'), ('ntrpr', 'i2'),
+                        ('nart', 'i2'), ('hdt', 'u2'), ('dto', 'u2'), ('hns', 'u2'),
+                        ('nso', 'u2'), ('format', 'i2'), ('fold', 'i2'), ('tsort', 'i2'),
+                        ('vscode', 'i2'), ('hsfs', 'i2'), ('hsfe', 'i2'), ('hslen', 'i2'),
+                        ('hstyp', 'i2'), ('schn', 'i2'), ('hstas', 'i2'), ('hstae', 'i2'),
+                        ('htatyp', 'i2'), ('hcorr', 'i2'), ('bgrcv', 'i2'), ('rcvm', 'i2'),
+                        ('mfeet', 'i2'), ('polyv', 'i2'), ('vpol', 'i2'), ('unass1', 'V240'),
+                        ('rev', 'i2'), ('trflag', 'i2'), ('exth', 'i2'), ('unass2', 'V94')]
+
+#: SEG-Y data sample format codes that we can read, and how they are stored
+SAMPLE_FORMATS = {1: 'u4', 2: 'i4', 3: 'i2', 5: 'f4', 8: 'i1'}
+
+
+def trace_header_dtype(byteorder='>'):
+    """Get the dtype of a trace header.
+
+    Parameters
+    ----------
+    byteorder: str, optional
+        '>' (big endian, SEG-Y) is the default. Use '=' for SU.
+
+    Returns
+    -------
+    np.dtype
+        The 240-byte trace header
+    """
+    return np.dtype([(name, byteorder + fmt if fmt[0] != 'V' else fmt)
+                     for name, fmt in TRACE_HEADER_FIELDS])
+
+
+def binary_header_dtype():
+    """Get the (big endian) dtype of the SEG-Y binary file header."""
+    return np.dtype([(name, '>' + fmt if fmt[0] != 'V' else fmt)
+                     for name, fmt in BINARY_HEADER_FIELDS])
+
+
+def trace_dtype(snum, byteorder='>', sample_format='f4'):
+    """Get the dtype of a whole trace, with fields header and data.
+
+    Parameters
+    ----------
+    snum: int
+        The number of samples per trace
+    byteorder: str, optional
+        '>' (big endian, SEG-Y) is the default. Use '=' for SU.
+    sample_format: str, optional
+        The numpy type of the samples. Default f4 (IEEE float).
+
+    Returns
+    -------
+    np.dtype
+        240 bytes of header followed by snum samples
+    """
+    return np.dtype([('header', trace_header_dtype(byteorder)),
+                     ('data', byteorder + sample_format, (snum,))])
+
+
+def make_traces(data, dt, x_coord=None, y_coord=None, byteorder='>'):
+    """Make the trace records (headers and float data) for some radar data.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        snum x tnum data
+    dt: float
+        The sample interval in seconds
+    x_coord: np.ndarray, optional
+        (tnum,) x coordinates of the traces, written to cdpx
+    y_coord: np.ndarray, optional
+        (tnum,) y coordinates of the traces, written to cdpy
+    byteorder: str, optional
+        '>' (big endian, SEG-Y) is the default. Use '=' for SU.
+
+    Returns
+    -------
+    np.ndarray
+        (tnum,) records of trace_dtype
+
+    Raises
+    ------
+    ValueError
+        If the sample interval does not fit in the headers
+    """
+    traces = np.zeros((data.shape[1],), dtype=trace_dtype(data.shape[0], byteorder=byteorder))
+    _fill_traces(traces, data, dt, x_coord, y_coord)
+    return traces
+
+
+def _fill_traces(traces, data, dt, x_coord, y_coord):
+    """Fill in an array of traces, which may be a memmap, in place."""
+    hdt = _header_dt(dt)
+    header = traces['header']
+    header['tracl'] = np.arange(1, data.shape[1] + 1)
+    header['tracr'] = header['tracl']
+    header['cdp'] = header['tracl']
+    header['trid'] = 1
+    header['ns'] = data.shape[0]
+    header['dt'] = hdt
+    if x_coord is not None and y_coord is not None:
+        header['scalco'] = -10
+        header['cdpx'] = np.round(np.nan_to_num(np.asarray(x_coord, dtype=float).flatten()) * 10.)
+        header['cdpy'] = np.round(np.nan_to_num(np.asarray(y_coord, dtype=float).flatten()) * 10.)
+    traces['data'] = data.transpose()
+
+
+def _header_dt(dt):
+    hdt = int(round(dt * 1.0e12))
+    if hdt <= 0 or hdt > np.iinfo(np.uint16).max:
+        raise ValueError('A sample interval of {:g} s cannot be written to SEG-Y'.format(dt))
+    return hdt
+
+
+def write_segy(fn, data, dt, x_coord=None, y_coord=None):
+    """Write data as a SEG-Y file of big endian IEEE floats.
+
+    The file is memory mapped and filled in place, so the data are not
+    copied into an intermediate array.
+
+    Parameters
+    ----------
+    fn: str
+        The output filename
+    data: np.ndarray
+        snum x tnum data
+    dt: float
+        The sample interval in seconds
+    x_coord: np.ndarray, optional
+        (tnum,) x coordinates of the traces, written to cdpx
+    y_coord: np.ndarray, optional
+        (tnum,) y coordinates of the traces, written to cdpy
+    """
+    snum, tnum = data.shape
+    hdt = _header_dt(dt)
+    header_size = TEXT_HEADER_SIZE + BINARY_HEADER_SIZE
+    traces = np.memmap(fn, dtype=trace_dtype(snum), mode='w+', offset=header_size,
+                       shape=(tnum,))
+    _fill_traces(traces, data, dt, x_coord, y_coord)
+    traces.flush()
+    del traces
+
+    text = 'C 1 Written by ImpDAR'.ljust(80) + ''.join(
+        ['C{:2d}'.format(i).ljust(80) for i in range(2, 41)])
+    binary = np.zeros((1,), dtype=binary_header_dtype())
+    binary['ntrpr'] = min(tnum, np.iinfo(np.int16).max)
+    binary['hdt'] = hdt
+    binary['hns'] = snum
+    binary['format'] = 5
+    binary['rev'] = 256
+    binary['trflag'] = 1
+    with open(fn, 'r+b') as fout:
+        fout.write(text.encode('cp500'))
+        fout.write(binary.tobytes())
+
+
+def read_segy(fn):
+    """Read a SEG-Y file.
+
+    The traces must all have the same length (as is required by the
+    standard). Sample formats 1 (IBM float), 2, 3, 5, and 8 are supported.
+
+    Parameters
+    ----------
+    fn: str
+        The SEG-Y file
+
+    Returns
+    -------
+    np.ndarray
+        snum x tnum data
+    np.ndarray
+        (tnum,) trace headers, of trace_header_dtype
+    np.ndarray
+        The binary file header, of binary_header_dtype
+
+    Raises
+    ------
+    ValueError
+        If the sample format is unsupported or the file is the wrong size
+    """
+    binary = np.fromfile(fn, dtype=binary_header_dtype(), count=1,
+                         offset=TEXT_HEADER_SIZE)[0]
+    if binary['format'] not in SAMPLE_FORMATS:
+        raise ValueError('Cannot read SEG-Y sample format {:d}'.format(binary['format']))
+    offset = TEXT_HEADER_SIZE * (1 + max(int(binary['exth']), 0)) + BINARY_HEADER_SIZE
+
+    # The binary header can be wrong, so trust the first trace header if it has a length
+    snum = int(np.fromfile(fn, dtype=trace_header_dtype(), count=1, offset=offset)[0]['ns'])
+    if snum == 0:
+        snum = int(binary['hns'])
+    dtype = trace_dtype(snum, sample_format=SAMPLE_FORMATS[binary['format']])
+    traces = np.memmap(fn, dtype=np.uint8, mode='r')[offset:]
+    if len(traces) % dtype.itemsize != 0:
+        raise ValueError('{:s} does not have traces of constant length'.format(fn))
+    traces = traces.view(dtype)
+
+    if binary['format'] == 1:
+        data = _ibm2ieee(traces['data'])
+    else:
+        data = traces['data'].astype(np.float32 if binary['format'] == 5 else float)
+    return data.transpose(), np.array(traces['header']), binary
+
+
+def encode_su(data, dt, x_coord=None, y_coord=None):
+    """Get data as the bytes of a SU stream, e.g. to pipe to SeisUnix.
+
+    SU traces are SEG-Y trace headers and float data in the native byte
+    order, with no file headers.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        snum x tnum data
+    dt: float
+        The sample interval in seconds
+    x_coord: np.ndarray, optional
+        (tnum,) x coordinates of the traces, written to cdpx
+    y_coord: np.ndarray, optional
+        (tnum,) y coordinates of the traces, written to cdpy
+
+    Returns
+    -------
+    bytes
+        The SU traces
+    """
+    return make_traces(data, dt, x_coord=x_coord, y_coord=y_coord, byteorder='=').tobytes()
+
+
+def decode_su(buf):
+    """Read the data and headers out of a SU stream (e.g. from SeisUnix).
+
+    Parameters
+    ----------
+    buf: bytes
+        The SU traces. All traces must have the same length.
+
+    Returns
+    -------
+    np.ndarray
+        snum x tnum data
+    np.ndarray
+        (tnum,) trace headers, of trace_header_dtype('=')
+
+    Raises
+    ------
+    ValueError
+        If buf is not a whole number of traces
+    """
+    header_dtype = trace_header_dtype('=')
+    if len(buf) < header_dtype.itemsize:
+        raise ValueError('No SU traces found')
+    snum = int(np.frombuffer(buf, dtype=header_dtype, count=1)[0]['ns'])
+    dtype = trace_dtype(snum, byteorder='=')
+    if len(buf) % dtype.itemsize != 0:
+        raise ValueError('SU traces are not of constant length')
+    traces = np.frombuffer(buf, dtype=dtype)
+    return traces['data'].transpose(), traces['header']
+
+
+def _ibm2ieee(ibm):
+    """Convert IBM System/360 floats (stored as uint32) to float64."""
+    ibm = ibm.astype(np.uint32)
+    sign = np.where(ibm >> 31, -1., 1.)
+    exponent = ((ibm >> 24) & 0x7f).astype(int)
+    mantissa = (ibm & 0x00ffffff).astype(float)
+    return sign * np.ldexp(mantissa, 4 * (exponent - 64) - 24)
@@ -0,0 +1,137 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the ApRES range processing and differencing against simple loops
+"""
+
+import unittest
+import numpy as np
+from impdar.lib.ApresData import ApresData
+from impdar.lib.ApresData._ApresDataProcessing import apres_range, range_diff, phase2range
+
+
+def random_bursts(bnum=2, cnum=3, snum=200, seed=0):
+    """Noise in place of chirps, which is fine for checking the transforms"""
+    dat = ApresData(None)
+    header = dat.header
+    header.bandwidth = 2.0e8
+    header.chirp_grad = 2. * np.pi * header.bandwidth
+    header.fc = 3.0e8
+    header.ci = 3.0e8 / np.sqrt(3.18)
+    header.lambdac = header.ci / header.fc
+    dat.data = np.random.RandomState(seed).normal(size=(bnum, cnum, snum))
+    dat.bnum, dat.cnum, dat.snum = bnum, cnum, snum
+    return dat
+
+
+def loop_range(dat, p, max_range):
+    """apres_range one chirp at a time, as it used to be"""
+    win = np.blackman(dat.snum)
+    nf = int(np.floor(p * dat.snum / 2))
+    tau = np.arange(nf) / (dat.header.bandwidth * p)
+    rcoarse = tau * dat.header.ci / 2.
+    phiref = 2. * np.pi * dat.header.fc * tau - (dat.header.chirp_grad * tau ** 2.) / 2
+    spec_cor = np.zeros((dat.bnum, dat.cnum, nf), dtype=np.cdouble)
+    for ib in range(dat.bnum):
+        for ic in range(dat.cnum):
+            chirp = dat.data[ib, ic, :] - np.mean(dat.data[ib, ic, :])
+            chirp = chirp * win
+            fft_chirp = (np.sqrt(2. * p) / len(chirp)) * np.fft.fft(chirp, p * dat.snum)
+            fft_chirp /= np.sqrt(np.mean(win ** 2.))
+            spec_cor[ib, ic, :] = np.exp(-1j * phiref) * fft_chirp[:nf]
+    n = np.argmin(rcoarse <= max_range)
+    return rcoarse[:n], spec_cor[:, :, :n]
+
+
+def loop_diff(acq1, acq2, win, step, r_uncertainty=None):
+    """range_diff one window at a time, as it used to be"""
+    idxs = np.arange(win // 2, (len(acq1) - win // 2), step)
+    co = np.array([np.corrcoef(acq1[idx - win // 2:idx + win // 2],
+                               acq2[idx - win // 2:idx + win // 2])[1, 0] for idx in idxs])
+    if r_uncertainty is None:
+        return co
+    return co, np.array([np.nanmean(r_uncertainty[i - win // 2:i + win // 2]) for i in idxs])
+
+
+class TestApresRange(unittest.TestCase):
+
+    def test_apres_range(self):
+        dat = random_bursts()
+        rcoarse, spec_cor = loop_range(dat, 2, 30.)
+        apres_range(dat, 2, max_range=30.)
+        self.assertEqual(dat.data.shape, (2, 3, len(rcoarse)))
+        self.assertEqual(dat.snum, len(rcoarse))
+        self.assertEqual(dat.flags.range, 30.)
+        self.assertTrue(np.allclose(dat.Rcoarse, rcoarse))
+        self.assertTrue(np.allclose(dat.data, spec_cor))
+        self.assertEqual(dat.Rfine.shape, dat.data.shape)
+        self.assertTrue(np.allclose(dat.Rfine, phase2range(
+            np.angle(spec_cor), dat.header.lambdac, rcoarse, dat.header.chirp_grad,
+            dat.header.ci)))
+
+        with self.assertRaises(TypeError):
+            apres_range(dat, 2, max_range=30.)
+
+    def test_apres_range_single(self):
+        dat = random_bursts()
+        rcoarse, spec_cor = loop_range(dat, 2, 30.)
+        apres_range(dat, 2, max_range=30., single_precision=True)
+        self.assertEqual(dat.data.dtype, np.complex64)
+        self.assertTrue(np.allclose(dat.Rcoarse, rcoarse))
+        self.assertTrue(np.allclose(dat.data, spec_cor, rtol=1.0e-4,
+                                    atol=1.0e-5 * np.max(np.abs(spec_cor))))
+
+
+class TestRangeDiff(unittest.TestCase):
+
+    def setUp(self):
+        dat = random_bursts(bnum=4, cnum=1)
+        apres_range(dat, 2, max_range=40.)
+        self.dat = dat
+        self.acqs = dat.data[:, 0, :]
+
+    def test_range_diff(self):
+        ds, co, r_diff, r_diff_unc = range_diff(self.dat, self.acqs[0], self.acqs[1], 16, 4)
+        co_loop = loop_diff(self.acqs[0], self.acqs[1], 16, 4)
+        self.assertEqual(co.shape, co_loop.shape)
+        self.assertTrue(np.allclose(co, co_loop))
+        self.assertTrue(np.allclose(ds, self.dat.Rcoarse[np.arange(8, self.dat.snum - 8, 4)]))
+        self.assertTrue(np.allclose(r_diff, phase2range(
+            np.angle(co_loop), self.dat.header.lambdac, ds, self.dat.header.chirp_grad,
+            self.dat.header.ci)))
+        self.assertEqual(r_diff_unc.shape, co.shape)
+
+        # odd windows and steps
+        co = range_diff(self.dat, self.acqs[0], self.acqs[2], 11, 3)[1]
+        self.assertTrue(np.allclose(co, loop_diff(self.acqs[0], self.acqs[2], 11, 3)))
+
+    def test_range_diff_batch(self):
+        ds, co, r_diff, r_diff_unc = range_diff(self.dat, self.acqs[:3], self.acqs[1:], 16, 4)
+        self.assertEqual(co.shape, (3, len(ds)))
+        self.assertEqual(r_diff_unc.shape, co.shape)
+        for i in range(3):
+            self.assertTrue(np.allclose(co[i], loop_diff(self.acqs[i], self.acqs[i + 1], 16, 4)))
+
+    def test_range_diff_uncertainty(self):
+        r_uncertainty = np.random.RandomState(1).random_sample(self.dat.snum)
+        r_uncertainty[5] = np.nan
+        ds, co, r_diff, r_diff_unc = range_diff(self.dat, self.acqs[0], self.acqs[1], 16, 4,
+                                                r_uncertainty=r_uncertainty,
+                                                uncertainty='noise_phasor')
+        self.assertTrue(np.allclose(r_diff_unc, loop_diff(self.acqs[0], self.acqs[1], 16, 4,
+                                                          r_uncertainty=r_uncertainty)[1]))
+
+        with self.assertRaises(ValueError):
+            range_diff(self.dat, self.acqs[0], self.acqs[1], 16, 4, uncertainty='dummy')
+        with self.assertRaises(TypeError):
+            range_diff(self.dat, self.acqs[0], self.acqs[1, :-1], 16, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test reading bursts from raw ApRES files
+"""
+
+import os
+import unittest
+import numpy as np
+from impdar.lib.ApresData import load_apres
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+from impdar.lib.ApresData.ApresHeader import parse_header
+from impdar.lib.ApresData.ApresTimeSeries import ApresTimeSeries
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+APRES_FN = os.path.join(THIS_DIR, 'input_data', 'synthetic_apres.dat')
+
+HEADER = ('\r\n*** Burst Header ***\r\n'
+          'Time stamp=2019-01-0{day:d} 12:00:00\r\n'
+          'Temp1=20.5\r\nTemp2={temp2:.1f}\r\nBatteryVoltage=12.1\r\n'
+          'SW_Issue=101\r\nSamplingFreqMode=0\r\n'
+          'N_ADC_SAMPLES={snum:d}\r\nNSubBursts={nsub:d}\r\nAverage={average:d}\r\n'
+          'nAttenuators=1\r\nAttenuator1=30,0,0,0\r\nAFGain=-14,0,0,0\r\n'
+          'TxAnt=1,0,0,0\r\nRxAnt=1,0,0,0\r\n'
+          'Reg01="000C0820"\r\nReg0B="6666666633333333"\r\n'
+          'Reg0C="000053E200001AD7"\r\nReg0D="07D007D0"\r\n'
+          '*** End Header ***')
+
+
+def write_bursts(fn, bursts, snum=100, nsub=2):
+    """Write some bursts, each a (data, average, day) tuple, like an RMB5"""
+    with open(fn, 'wb') as fid:
+        for i, (data, average) in enumerate(bursts):
+            fid.write(HEADER.format(day=i + 1, temp2=20. + 400. * (i == 1), snum=snum,
+                                    nsub=nsub, average=average).encode())
+            fid.write(data.astype({0: '<u2', 2: '<u4'}[average]).tobytes())
+
+
+class TestApresLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.raw = [np.arange(200) + 1000 * i for i in range(3)]
+        write_bursts(APRES_FN, [(self.raw[0], 0), (self.raw[1][:100] * 2, 2), (self.raw[2], 0)])
+
+    def tearDown(self):
+        for fn in [APRES_FN, APRES_FN + '.index.npz']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_parse_header(self):
+        header = HEADER.format(day=1, temp2=20., snum=100, nsub=2, average=0).encode()
+        for form in [header, str(header)]:
+            values = parse_header(form)
+            self.assertEqual(values['Time stamp'], '2019-01-01 12:00:00')
+            self.assertEqual(values['Reg0B'], '6666666633333333')
+            self.assertEqual(values['TxAnt'], '1,0,0,0')
+            self.assertFalse('*** End Header ***' in values)
+
+    def test_index(self):
+        index = load_apres.index_bursts(APRES_FN)
+        self.assertTrue(os.path.exists(APRES_FN + '.index.npz'))
+        self.assertEqual(len(index['data_offset']), 3)
+        self.assertTrue(np.all(index['cnum'] == [2, 1, 2]))
+        self.assertTrue(np.all(index['average'] == [0, 2, 0]))
+        self.assertTrue(np.allclose(np.diff(index['decday']), 1.))
+        self.assertTrue(np.allclose(index['decday'] % 1, 0.5))
+
+        # the cached version is the same
+        cached = load_apres.index_bursts(APRES_FN)
+        for attr in load_apres.INDEX_ATTRS:
+            self.assertTrue(np.allclose(index[attr], cached[attr], equal_nan=True))
+
+        # a truncated last burst is not in the index
+        with open(APRES_FN, 'ab') as fid:
+            fid.write(load_apres.END_HEADER)
+        with open(APRES_FN, 'r+b') as fid:
+            fid.truncate(os.path.getsize(APRES_FN) - 50)
+        self.assertEqual(len(load_apres.index_bursts(APRES_FN, cache=False)['data_offset']), 2)
+
+    def test_load_bursts(self):
+        for burst in [1, 3]:
+            dat = load_apres.load_apres_single_file(APRES_FN, burst=burst)
+            self.assertEqual(dat.data.shape, (2, 100))
+            self.assertTrue(np.allclose(dat.data.flatten(), self.raw[burst - 1] * 2.5 / 2 ** 16))
+            self.assertEqual(dat.bnum, burst)
+
+        dat = load_apres.load_apres_single_file(APRES_FN, burst=2)
+        self.assertEqual(dat.data.shape, (1, 100))
+        self.assertTrue(np.allclose(dat.data.flatten(), self.raw[1][:100] * 2.5 / 2 ** 16))
+        self.assertEqual(dat.temperature2[0], 420. - 512.)
+
+        with self.assertRaises(TypeError):
+            load_apres.load_apres_single_file(APRES_FN, burst=4)
+
+        dats = list(load_apres.iter_bursts(APRES_FN))
+        self.assertEqual(len(dats), 3)
+        self.assertTrue(np.all(np.diff([dat.decday[0] for dat in dats]) == 1.))
+
+        # the file is indexed once, with the header length we asked for
+        os.remove(APRES_FN + '.index.npz')
+        with patch('impdar.lib.ApresData.load_apres.index_bursts',
+                   wraps=load_apres.index_bursts) as mock_index:
+            dats_long = list(load_apres.iter_bursts(APRES_FN, max_header_len=3000))
+        self.assertEqual(mock_index.call_count, 1)
+        self.assertEqual(mock_index.call_args[1]['max_header_len'], 3000)
+        for dat, dat_long in zip(dats, dats_long):
+            self.assertTrue(np.allclose(dat.data, dat_long.data))
+
+        # every burst of a file goes in a time series
+        series = ApresTimeSeries([APRES_FN], max_range=1000.)
+        self.assertEqual(series.profiles.shape[0], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test differencing a time series of ApRES acquisitions
+"""
+
+import unittest
+import numpy as np
+from impdar.lib.ApresData import ApresData
+from impdar.lib.ApresData.ApresTimeSeries import ApresTimeSeries
+
+DISPS = np.array([0., 0.001, 0.003, 0.0035, 0.006])
+
+
+def synthetic_bursts(disps, cnum=3, snum=4000, reflector_range=200.):
+    """Deramped chirps from a single reflector that moves between bursts"""
+    dat = ApresData(None)
+    header = dat.header
+    header.f0 = 2.0e8
+    header.bandwidth = 2.0e8
+    header.chirp_grad = 2. * np.pi * header.bandwidth
+    header.fc = 3.0e8
+    header.ci = 3.0e8 / np.sqrt(3.18)
+    header.lambdac = header.ci / header.fc
+    t = np.arange(snum) / snum
+    tau = 2. * (reflector_range + disps[:, None, None]) / header.ci
+    dat.data = np.cos(2. * np.pi * header.f0 * tau + header.chirp_grad * tau * t -
+                      header.chirp_grad * tau ** 2. / 2.) * np.ones((1, cnum, 1))
+    dat.bnum, dat.cnum, dat.snum = len(disps), cnum, snum
+    dat.chirp_time = np.arange(dat.bnum)[:, None] * 10. + np.zeros((1, cnum))
+    return dat
+
+
+class TestApresTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.dat = synthetic_bursts(DISPS)
+
+    def test_profiles(self):
+        series = ApresTimeSeries([self.dat], max_range=400.)
+        self.assertEqual(series.profiles.shape, (len(DISPS), len(series.Rcoarse)))
+        self.assertTrue(np.all(series.decday == np.arange(len(DISPS)) * 10.))
+        self.assertTrue(np.abs(series.Rcoarse[np.argmax(np.abs(series.profiles[0]))] - 200.) < 0.5)
+        # the input is untouched
+        self.assertEqual(self.dat.data.shape, (len(DISPS), 3, 4000))
+        self.assertEqual(self.dat.flags.range, 0)
+
+        # Splitting the bursts among acquisitions is the same
+        series_split = ApresTimeSeries([synthetic_bursts(DISPS[:2]), synthetic_bursts(DISPS[2:])],
+                                       max_range=400.)
+        self.assertTrue(np.allclose(series.profiles, series_split.profiles))
+
+    def test_displacement(self):
+        series = ApresTimeSeries([self.dat], max_range=400.)
+        ds, r_diff, r_diff_unc = series.range_diffs(16, 4)
+        self.assertEqual(r_diff.shape, (len(DISPS) - 1, len(ds)))
+        self.assertEqual(r_diff_unc.shape, r_diff.shape)
+        ind = np.argmin(np.abs(ds - 200.))
+        self.assertTrue(np.allclose(r_diff[:, ind], np.diff(DISPS), atol=1.0e-4))
+        disp = series.displacement()
+        self.assertTrue(np.allclose(disp[:, ind], DISPS, atol=2.0e-4))
+        self.assertEqual(series.velocity().shape, r_diff.shape)
+        self.assertTrue(np.allclose(series.velocity()[:, ind],
+                                    np.diff(DISPS) / 10. * 365.25, rtol=0.1))
+        strain_rate = series.strain_rate()
+        self.assertEqual(strain_rate.shape, disp.shape)
+        self.assertTrue(np.allclose(strain_rate, np.gradient(
+            np.gradient(disp, np.arange(len(DISPS)) * 10. / 365.25, axis=0), ds, axis=1)))
+
+        # All pairs, in chunks, should give the same displacement
+        series.range_diffs(16, 4, pairs='all', chunk_size=3)
+        self.assertEqual(len(series.pairs), 10)
+        self.assertTrue(np.allclose(series.displacement()[:, ind], disp[:, ind], atol=1.0e-5))
+
+        with self.assertRaises(ValueError):
+            series.range_diffs(16, 4, pairs='some')
+
+    def test_mismatched_ranges(self):
+        other = synthetic_bursts(DISPS)
+        other.header.bandwidth = 1.0e8
+        with self.assertRaises(ValueError):
+            ApresTimeSeries([self.dat, other], max_range=400.)
+
+
+if __name__ == '__main__':
+    unittest.main()
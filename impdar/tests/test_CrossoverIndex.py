@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test finding crossovers among several profiles
+"""
+
+import os
+import unittest
+import numpy as np
+from impdar.lib.NoInitRadarData import NoInitRadarData
+from impdar.lib.CrossoverIndex import CrossoverIndex
+from impdar.lib.ImpdarError import ImpdarError
+from impdar.lib import Picks
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile(x_coord, y_coord):
+    dat = NoInitRadarData(big=True)
+    dat.x_coord = np.array(x_coord, dtype=float)
+    dat.y_coord = np.array(y_coord, dtype=float)
+    dat.picks = Picks.Picks(dat)
+    return dat
+
+
+class TestCrossoverIndex(unittest.TestCase):
+
+    def setUp(self):
+        # a line along x, one along y crossing it once, and a zigzag crossing twice
+        self.along = profile(np.arange(20), np.zeros((20,)) + 0.1)
+        self.across = profile(np.zeros((20,)) + 5.2, np.arange(20) - 10.)
+        self.zigzag = profile(np.ones((20,)) * 14.,
+                              np.abs(np.arange(20) - 10.) - 5.)
+        self.far = profile(np.arange(20) + 100., np.arange(20) + 100.)
+        self.dats = [self.along, self.across, self.zigzag, self.far]
+
+    def tearDown(self):
+        if os.path.exists(os.path.join(THIS_DIR, 'cross_cache.npz')):
+            os.remove(os.path.join(THIS_DIR, 'cross_cache.npz'))
+
+    def test_find_crossovers(self):
+        xind = CrossoverIndex(self.dats)
+        pairs = list(zip(xind.prof1, xind.prof2))
+        self.assertEqual(pairs.count((0, 1)), 1)
+        self.assertEqual(pairs.count((0, 2)), 2)
+        self.assertEqual(pairs.count((1, 2)), 0)
+        self.assertTrue(3 not in xind.prof2)
+
+        ind = pairs.index((0, 1))
+        self.assertEqual(xind.tnum1[ind], 5)
+        self.assertEqual(xind.tnum2[ind], 10)
+        self.assertTrue(np.all(xind.tnum1[xind.prof2 == 2] == 14))
+        self.assertEqual(set(xind.tnum2[xind.prof2 == 2]), {5, 15})
+
+        # a small tolerance should miss the crossings between traces
+        xind = CrossoverIndex(self.dats, tol=0.05)
+        self.assertEqual(len(xind.prof1), 0)
+
+    def test_pairs(self):
+        xind = CrossoverIndex(self.dats, pairs=[(2, 0), (1, 3)])
+        pairs = list(zip(xind.prof1, xind.prof2))
+        self.assertEqual(pairs.count((0, 1)), 0)
+        self.assertEqual(pairs.count((0, 2)), 2)
+
+    def test_no_coords(self):
+        self.far.x_coord = None
+        with self.assertRaises(ImpdarError):
+            CrossoverIndex(self.dats)
+
+    def test_cache(self):
+        cache_fn = os.path.join(THIS_DIR, 'cross_cache.npz')
+        xind = CrossoverIndex(self.dats, cache_fn=cache_fn)
+        self.assertTrue(os.path.exists(cache_fn))
+
+        # Loading from cache should give the same thing without making trees
+        xind_cached = CrossoverIndex(self.dats, cache_fn=cache_fn)
+        self.assertEqual(len(xind_cached._trees), 0)
+        for attr in xind.attrs:
+            self.assertTrue(np.allclose(getattr(xind, attr),
+                                        getattr(xind_cached, attr)))
+
+        # But if we move a profile, we need to redo it
+        self.far.x_coord = self.far.x_coord - 100.
+        self.far.y_coord = self.far.y_coord - 100.
+        xind_moved = CrossoverIndex(self.dats, cache_fn=cache_fn)
+        self.assertTrue(3 in xind_moved.prof2)
+
+    def test_pick_mismatches(self):
+        for i, dat in enumerate(self.dats):
+            dat.picks.add_pick(1)
+            pick = np.zeros((5, dat.tnum))
+            pick[:, :] = i + 1
+            dat.picks.update_pick(1, pick)
+        self.zigzag.picks.samp2[0, 5] = np.nan
+
+        xind = CrossoverIndex(self.dats)
+        picknums, mismatch = xind.pick_mismatches(target_out='snum')
+        self.assertEqual(picknums, [1])
+        self.assertEqual(mismatch.shape, (len(xind.prof1), 1))
+        pairs = list(zip(xind.prof1, xind.prof2))
+        self.assertEqual(mismatch[pairs.index((0, 1)), 0], -1)
+        zig_mismatch = mismatch[xind.prof2 == 2, 0]
+        zig_tnums = xind.tnum2[xind.prof2 == 2]
+        self.assertTrue(np.isnan(zig_mismatch[zig_tnums == 5][0]))
+        self.assertEqual(zig_mismatch[zig_tnums == 15][0], -2)
+
+        # picks missing from a profile are nans
+        picknums, mismatch = xind.pick_mismatches(picknums=[1, 2],
+                                                  target_out='snum')
+        self.assertTrue(np.all(np.isnan(mismatch[:, 1])))
+
+
+if __name__ == '__main__':
+    unittest.main()
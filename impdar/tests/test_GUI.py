@@ -210,6 +210,37 @@ class TestInteractivePicker(unittest.TestCase):
         self.assertTrue(self.ip._add_pick.called)
         self.assertTrue(self.ip.update_lines.called)
 
+    def test_update_view(self):
+        # zooming shows just the visible traces
+        self.ip.ax.set_xlim(self.ip.xd[2], self.ip.xd[10])
+        self.assertEqual(self.ip.im.get_extent()[0], self.ip.xd[1])
+        self.assertEqual(self.ip.im.get_extent()[1], self.ip.xd[11])
+        self.assertEqual(self.ip.im.get_array().shape[1], 11)
+        self.ip.ax.set_xlim(self.ip.xd[0], self.ip.xd[-1])
+        self.assertEqual(self.ip.im.get_array().shape[1], self.ip.dat.tnum)
+
+    def test_blit_lines(self):
+        self.ip._add_pick(snum=10, tnum=1)
+        self.ip.update_lines()
+        self.ip._set_animated_pick(self.ip._pick_ind)
+        self.ip.fig.canvas.draw()
+        self.assertTrue(self.ip.cline[self.ip._pick_ind].get_animated())
+        self.ip.fig.canvas.draw = MagicMock()
+        self.ip._blit_lines()
+        if self.ip.fig.canvas.supports_blit:
+            self.assertFalse(self.ip.fig.canvas.draw.called)
+
+    def test_update_lines_range(self):
+        self.ip._add_pick(snum=10, tnum=1)
+        self.ip.update_lines()
+        self.ip.current_pick[:3, 2:4] = 5
+        self.ip.update_lines(trace_range=(2, 4))
+        self.assertTrue(np.all(self.ip.cline[self.ip._pick_ind].get_ydata()[2:4] == self.ip.yd[5]))
+        # outside the range is left alone
+        self.ip.current_pick[:3, 5] = 5
+        self.ip.update_lines(trace_range=(2, 4))
+        self.assertTrue(np.isnan(self.ip.cline[self.ip._pick_ind].get_ydata()[5]))
+
     @unittest.skipIf(sys.version_info[0] < 3, 'Mock is only on 3+')
     def test_add_point_pick(self):
         # need to mock a lot to not deal with actually doing any picking
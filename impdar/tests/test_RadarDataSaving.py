@@ -11,14 +11,26 @@
 """
 
 import os
+import sys
+import struct
 import unittest
 import numpy as np
 from impdar.lib.RadarData import RadarData
 from impdar.lib.NoInitRadarData import NoInitRadarData
-from impdar.lib.RadarData._RadarDataSaving import CONVERSIONS_ENABLED
+from impdar.lib.RadarData._RadarDataSaving import CONVERSIONS_ENABLED, PYARROW, output_survey_shp
+from impdar.lib.RadarData._RadarDataSaving import _wkb_points
+from impdar.lib.load.load_pick_table import load_pick_table
 from impdar.lib.RadarFlags import RadarFlags
 from impdar.lib.Picks import Picks
 
+if CONVERSIONS_ENABLED:
+    from osgeo import ogr
+
+if sys.version_info[0] >= 3:
+    from unittest.mock import patch
+else:
+    from mock import patch
+
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
@@ -160,6 +172,73 @@ class TestRadarDataExports(unittest.TestCase):
         # Check geometry
         rd.output_shp(os.path.join(THIS_DIR, 'input_data', 'test4.shp'), t_srs='EPSG:3413')
 
+    @unittest.skipIf(not CONVERSIONS_ENABLED, 'No GDAL on this version')
+    def test_output_survey_shp(self):
+        rd = NoInitRadarData()
+        rd.fn = 'rd.mat'
+        rd.nmo_depth = np.arange(len(rd.travel_time)) * 1.1
+        rd.picks = Picks(rd)
+        rd.picks.add_pick(1)
+        rd.picks.samp2[:] = 1
+        rd2 = NoInitRadarData()
+        rd2.fn = 'rd2.mat'
+        rd2.nmo_depth = np.arange(len(rd.travel_time)) * 1.1
+        rd2.picks = Picks(rd2)
+        rd2.picks.add_pick(2)
+        rd2.picks.samp2[:] = 0
+
+        # Try both the arrow and the feature-by-feature writers
+        for pyarrow in set([PYARROW, False]):
+            with patch('impdar.lib.RadarData._RadarDataSaving.PYARROW', pyarrow):
+                for ext in ['shp', 'gpkg']:
+                    fn = os.path.join(THIS_DIR, 'input_data', 'test5.' + ext)
+                    output_survey_shp([rd, rd2], fn)
+                    data_source = ogr.Open(fn)
+                    layer = data_source.GetLayer(0)
+                    self.assertEqual(layer.GetFeatureCount(), rd.tnum + rd2.tnum)
+                    features = [feature for feature in layer]
+                    self.assertEqual([feature.GetField('FileName') for feature in features],
+                                     ['rd.mat'] * rd.tnum + ['rd2.mat'] * rd2.tnum)
+                    self.assertEqual([feature.GetField('TraceNum') for feature in features],
+                                     list(range(1, rd.tnum + 1)) + list(range(1, rd2.tnum + 1)))
+                    self.assertTrue(np.allclose([feature.GetField('L1_depth')
+                                                 for feature in features[:rd.tnum]], 1.1))
+                    self.assertTrue(np.allclose([feature.GetField('L2_depth')
+                                                 for feature in features[rd.tnum:]], 0.))
+                    self.assertTrue(np.allclose(features[0].GetGeometryRef().GetX(),
+                                                rd._get_output_pts(None)[0][0, 0]))
+                    data_source = None
+                    if ext == 'shp':
+                        for shp_ext in ['shp', 'shx', 'dbf', 'prj']:
+                            os.remove(fn[:-3] + shp_ext)
+                    else:
+                        os.remove(fn)
+
+    @unittest.skipIf(not PYARROW, 'No pyarrow')
+    def test_wkb_points(self):
+        pts = np.array([[1.5, -2.], [1.0e6, 3.25], [-180., 90.]])
+        wkb = _wkb_points(pts)
+        self.assertEqual(len(wkb), 3)
+        for i, point in enumerate(wkb.to_pylist()):
+            self.assertEqual(point, struct.pack('<BIdd', 1, 1, pts[i, 0], pts[i, 1]))
+
+    def test_get_pick_fields(self):
+        rd = NoInitRadarData()
+        rd.nmo_depth = np.arange(len(rd.travel_time)) * 1.1
+        rd.elev = np.arange(rd.tnum) * 1001.
+        self.assertEqual(rd._get_pick_fields(None), ([], []))
+        rd.picks = Picks(rd)
+        rd.picks.add_pick(3)
+        rd.picks.samp2[0, 0] = 1
+        names, vals = rd._get_pick_fields(None)
+        self.assertEqual(names, ['L3_depth'])
+        self.assertTrue(np.allclose(vals[0], [1.1, np.nan], equal_nan=True))
+        names, vals = rd._get_pick_fields('elev')
+        self.assertEqual(names, ['L3_elev'])
+        self.assertTrue(np.allclose(vals[0], [-1.1, np.nan], equal_nan=True))
+        names, vals = rd._get_pick_fields('snum')
+        self.assertTrue(np.allclose(vals[0], [1, np.nan], equal_nan=True))
+
     @unittest.skipIf(CONVERSIONS_ENABLED, 'Version has GDAL, just checking we fail without')
     def test_output_shp_nolayers_nogdal(self):
         rd = NoInitRadarData()
@@ -230,8 +309,61 @@ class TestRadarDataExports(unittest.TestCase):
             # we should have a row per trace, plus a header
             self.assertEqual(len(lines), rd.tnum + 1)
 
+    @unittest.skipIf(not PYARROW, 'No pyarrow on this version')
+    def test_output_parquet(self):
+        rd = NoInitRadarData()
+        rd.fn = 'rd.mat'
+        rd.nmo_depth = np.arange(len(rd.travel_time)) * 1.1
+        rd.output_parquet(os.path.join(THIS_DIR, 'input_data', 'test0.parquet'))
+
+        rd.picks = Picks(rd)
+        rd.picks.add_pick(1)
+        rd.picks.samp2[0, :] = [1, np.nan]
+        rd.picks.power[0, :] = [10., np.nan]
+        rd2 = NoInitRadarData()
+        rd2.fn = 'rd2.mat'
+        rd2.x_coord = np.arange(rd2.tnum) * 1.
+        rd2.picks = Picks(rd2)
+        rd2.picks.add_pick(2)
+        rd2.picks.samp2[0, :] = 0
+        # as loaded from a .mat saved without elevation
+        rd.elev = 0
+        rd.output_parquet(os.path.join(THIS_DIR, 'input_data', 'test1.parquet'))
+        rd2.output_parquet(os.path.join(THIS_DIR, 'input_data', 'test2.feather'))
+
+        table = load_pick_table(os.path.join(THIS_DIR, 'input_data', 'test1.parquet'))
+        self.assertEqual(list(table.keys()), ['FileName', 'TraceNum', 'lat', 'long', 'decday',
+                                              'L1_depth', 'L1_twtt', 'L1_power'])
+        self.assertTrue(np.allclose(table['L1_depth'], [1.1, np.nan], equal_nan=True))
+        self.assertTrue(np.allclose(table['L1_twtt'], [rd.travel_time[1], np.nan], equal_nan=True))
+        self.assertTrue(np.allclose(table['L1_power'], [10., np.nan], equal_nan=True))
+        self.assertEqual(table['TraceNum'].dtype, np.int32)
+
+        table = load_pick_table([os.path.join(THIS_DIR, 'input_data', fn)
+                                 for fn in ['test0.parquet', 'test1.parquet', 'test2.feather']])
+        self.assertEqual(len(table['TraceNum']), 3 * rd.tnum)
+        self.assertEqual(list(table['FileName']), ['rd.mat'] * 4 + ['rd2.mat'] * 2)
+        self.assertTrue(np.all(np.isnan(table['x_coord'][:4])))
+        self.assertTrue(np.allclose(table['L2_twtt'], [np.nan] * 4 + [rd2.travel_time[0]] * 2,
+                                    equal_nan=True))
+
+        table = load_pick_table([os.path.join(THIS_DIR, 'input_data', fn)
+                                 for fn in ['test1.parquet', 'test2.feather']],
+                                columns=['TraceNum', 'L2_twtt'])
+        self.assertEqual(list(table.keys()), ['TraceNum', 'L2_twtt'])
+        self.assertEqual(len(table['L2_twtt']), 4)
+
+    @unittest.skipIf(PYARROW, 'Version has pyarrow, just checking we fail without')
+    def test_output_parquet_nopyarrow(self):
+        rd = NoInitRadarData()
+        with self.assertRaises(ImportError):
+            rd.output_parquet(os.path.join(THIS_DIR, 'input_data', 'test0.parquet'))
+
     def tearDown(self):
         for i in range(6):
+            for ext in ['gpkg', 'parquet', 'feather']:
+                if os.path.exists(os.path.join(THIS_DIR, 'input_data', 'test{:d}.{:s}'.format(i, ext))):
+                    os.remove(os.path.join(THIS_DIR, 'input_data', 'test{:d}.{:s}'.format(i, ext)))
             for fn in ['test_out.mat', 'test{:d}.shp'.format(i), 'test{:d}.shx'.format(i), 'test{:d}.prj'.format(i), 'test{:d}.dbf'.format(i), 'test.csv']:
                 if os.path.exists(os.path.join(THIS_DIR, 'input_data', fn)):
                     os.remove(os.path.join(THIS_DIR, 'input_data', fn))
@@ -0,0 +1,128 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the decimated copies of radargrams used for display
+"""
+
+import os
+import unittest
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from impdar.lib.RadargramPyramid import RadargramPyramid
+from impdar.lib.NoInitRadarData import NoInitRadarData
+from impdar.lib import plot
+from impdar.lib.Picks import Picks
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FN = os.path.join(THIS_DIR, 'input_data', 'test_pyramid.npz')
+
+
+class TestRadargramPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.RandomState(0).normal(size=(20, 10001))
+        self.data[5, 4321] = 10.
+        self.data[6, 1234] = -10.
+        self.data[:, 9000:] = np.nan
+
+    def tearDown(self):
+        if os.path.exists(CACHE_FN):
+            os.remove(CACHE_FN)
+
+    def test_levels(self):
+        pyramid = RadargramPyramid(self.data, min_traces=100)
+        self.assertEqual(pyramid.nlevels, 7)
+        self.assertTrue(pyramid.levels[0] is self.data)
+        for level in pyramid.levels[1:]:
+            # peaks survive
+            self.assertEqual(np.nanmax(level), 10.)
+            self.assertEqual(np.nanmin(level), -10.)
+            self.assertTrue(np.all(np.isnan(level[:, -2:])))
+        self.assertEqual(pyramid.levels[1].shape, (20, 5002))
+
+        self.assertEqual(pyramid.choose_level(10001, 20000), 0)
+        self.assertEqual(pyramid.choose_level(10001, 1000), 3)
+        self.assertEqual(pyramid.choose_level(10001, 10), 6)
+        window, level = pyramid.get_window((4000, 5000), 100, y_range=(0, 10))
+        self.assertEqual(level, 3)
+        self.assertEqual(window.shape, (10, 125))
+        self.assertEqual(np.max(window), 10.)
+
+    def test_cache(self):
+        pyramid = RadargramPyramid(self.data, min_traces=100, cache_fn=CACHE_FN)
+        self.assertTrue(os.path.exists(CACHE_FN))
+        cached = RadargramPyramid(self.data, min_traces=100, cache_fn=CACHE_FN)
+        self.assertEqual(cached.nlevels, pyramid.nlevels)
+        for level, level_cached in zip(pyramid.levels, cached.levels):
+            self.assertTrue(np.allclose(level, level_cached, equal_nan=True))
+
+        # Changed data do not use the cache
+        self.data[:, 1] = 100.
+        changed = RadargramPyramid(self.data, min_traces=100, cache_fn=CACHE_FN)
+        self.assertEqual(np.nanmax(changed.levels[-1]), 100.)
+
+    def test_plot_radargram(self):
+        dat = NoInitRadarData(big=True)
+        dat.data = self.data
+        dat.tnum = self.data.shape[1]
+        dat.snum = self.data.shape[0]
+        im = plot.plot_radargram(dat, return_plotinfo=True)[0]
+        self.assertTrue(im.get_array().shape[1] < 5000)
+        self.assertEqual(np.nanmax(im.get_array()), 10.)
+        im = plot.plot_radargram(dat, return_plotinfo=True, decimate=False)[0]
+        self.assertEqual(im.get_array().shape, self.data.shape)
+
+        # Saving at a higher resolution needs more traces
+        im = plot.plot_radargram(dat, return_plotinfo=True, dpi=1000)[0]
+        self.assertEqual(im.get_array().shape, self.data.shape)
+
+    def test_plot_radargram_pyramid(self):
+        dat = NoInitRadarData(big=True)
+        dat.data = self.data
+        dat.tnum = self.data.shape[1]
+        dat.snum = self.data.shape[0]
+        dat.picks = Picks(dat)
+        dat.picks.add_pick(10)
+        dat.picks.samp2[0, :] = 5
+        dat.picks.samp2[0, ::2] = 7
+        for flatten_layer in [None, 10]:
+            for x_range in [(0, -1), (100, 200)]:
+                im = plot.plot_radargram(dat, return_plotinfo=True, x_range=x_range,
+                                         flatten_layer=flatten_layer)[0]
+                pyramid = plot.get_pyramid(dat, flatten_layer=flatten_layer)
+                # the one we hand over is used rather than making another
+                with patch('impdar.lib.plot.RadargramPyramid') as mock_pyramid:
+                    im_pyramid = plot.plot_radargram(dat, return_plotinfo=True, x_range=x_range,
+                                                     flatten_layer=flatten_layer,
+                                                     pyramid=pyramid)[0]
+                self.assertFalse(mock_pyramid.called)
+                self.assertTrue(np.allclose(im.get_array(), im_pyramid.get_array(),
+                                            equal_nan=True))
+
+    def test_plot_radargram_cache(self):
+        dat = NoInitRadarData(big=True)
+        dat.data = self.data
+        dat.tnum = self.data.shape[1]
+        dat.snum = self.data.shape[0]
+        dat.fn = os.path.join(THIS_DIR, 'input_data', 'small_data.mat')
+        cache_fn = os.path.join(THIS_DIR, 'input_data', 'small_data_pyramid.npz')
+        plot.plot_radargram(dat)
+        self.assertFalse(os.path.exists(cache_fn))
+        plot.plot_radargram(dat, cache=True)
+        self.assertTrue(os.path.exists(cache_fn))
+        os.remove(cache_fn)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the bed roughness calculation
+"""
+
+import unittest
+import numpy as np
+from scipy.signal import detrend
+from impdar.lib.analysis.Roughness import kirchhoff_roughness, _rolling_detrended_rms
+from impdar.lib.NoInitRadarData import NoInitRadarData
+from impdar.lib.Picks import Picks
+
+
+class TestRoughness(unittest.TestCase):
+
+    def test_rolling_detrended_rms(self):
+        rng = np.random.RandomState(0)
+        y = np.arange(200.) * 0.3 + rng.normal(size=200)
+        y[[20, 21, 50]] = np.nan
+        rms = _rolling_detrended_rms(y, 5)
+        self.assertTrue(np.all(np.isnan(rms[:5])))
+        for n in [5, 22, 50, 120, 195]:
+            b = y[n - 5:n + 5]
+            b = b[~np.isnan(b)]
+            self.assertTrue(np.isclose(rms[n], np.sqrt(np.sum(detrend(b) ** 2.) / (len(b) - 1.))))
+
+    def test_kirchhoff_roughness(self):
+        dat = NoInitRadarData(big=True)
+        dat.flags.interp = np.array([1., 1.])
+        dat.trace_int = np.ones((dat.tnum,)) * 0.1
+        dat.elev = np.zeros((dat.tnum,))
+        dat.picks = Picks(dat)
+        dat.picks.z = np.ones((1, dat.tnum)) * 100.
+        dat.picks.z[0, ::2] += 1.
+        ED1, pn = kirchhoff_roughness(dat, 0, 3.0e6, filt_n=1)
+        self.assertTrue(dat.roughness is ED1)
+        self.assertTrue(dat.roughness_power is pn)
+        self.assertTrue(np.all(ED1[np.isfinite(ED1)] > 0.4))
+        self.assertTrue(np.all(pn[np.isfinite(pn)] < 1.))
+
+        del dat.flags.interp
+        with self.assertRaises(KeyError):
+            kirchhoff_roughness(dat, 0, 3.0e6)
+
+
+if __name__ == '__main__':
+    unittest.main()
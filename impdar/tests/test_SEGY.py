@@ -13,40 +13,76 @@ import os
 import unittest
 import numpy as np
 from impdar.lib.NoInitRadarData import NoInitRadarData
-from impdar.lib.load.load_segy import load_segy, SEGY
+from impdar.lib.load.load_segy import load_segy
+from impdar.lib import segylib
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_FN = os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy')
 
 
 class TestSEGY(unittest.TestCase):
 
-    @unittest.skipIf(not SEGY, 'No SEGY on this version')
-    def test_ReadSucceeds(self):
-        load_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200.segy'))
+    def setUp(self):
+        self.data = NoInitRadarData(big=True)
+        self.data.data = np.random.rand(self.data.snum, self.data.tnum)
+        self.data.dt = 1.0e-9
+        self.data.x_coord = np.arange(self.data.tnum) * 1.5
+        self.data.y_coord = np.arange(self.data.tnum) * 2.5
 
-    @unittest.skipIf(not SEGY, 'No SEGY on this version')
     def test_WriteSucceeds(self):
-        data = load_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200.segy'))
-        data.save_as_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy'))
+        self.data.save_as_segy(OUT_FN)
+        self.assertEqual(os.path.getsize(OUT_FN),
+                         3600 + self.data.tnum * (240 + 4 * self.data.snum))
 
-    @unittest.skipIf(not SEGY, 'No SEGY on this version')
     def test_ReadWriteRead(self):
-        data = load_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200.segy'))
-        data.save_as_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy'))
-        data2 = load_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy'))
+        self.data.save_as_segy(OUT_FN)
+        data = load_segy(OUT_FN)
+        self.assertEqual(data.data.shape, self.data.data.shape)
+        self.assertTrue(np.allclose(data.data, self.data.data))
+        self.assertAlmostEqual(data.dt, 1.0e-9)
+        self.assertTrue(np.allclose(data.x_coord, self.data.x_coord))
+        self.assertTrue(np.allclose(data.y_coord, self.data.y_coord))
+
+        data.save_as_segy(OUT_FN)
+        data2 = load_segy(OUT_FN)
         self.assertEqual(data.data.shape, data2.data.shape)
         self.assertTrue(np.all(data.data == data2.data))
 
-    @unittest.skipIf(SEGY, 'SEGY on this version, only a graceful failure test')
     def test_SaveFails(self):
-        print(SEGY)
         data = NoInitRadarData()
-        with self.assertRaises(ImportError):
-            data.save_as_segy(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy'))
+        # dt of 1 s does not fit in the header
+        with self.assertRaises(ValueError):
+            data.save_as_segy(OUT_FN)
+
+    def test_su(self):
+        buf = segylib.encode_su(self.data.data, self.data.dt)
+        self.assertEqual(len(buf), self.data.tnum * (240 + 4 * self.data.snum))
+        data, headers = segylib.decode_su(buf)
+        self.assertTrue(np.allclose(data, self.data.data))
+        self.assertTrue(np.all(headers['ns'] == self.data.snum))
+        self.assertTrue(np.all(headers['tracl'] == np.arange(self.data.tnum) + 1))
+        with self.assertRaises(ValueError):
+            segylib.decode_su(buf[:-1])
+
+    def test_ibm(self):
+        # Write IBM floats by hand, since we only write IEEE
+        self.data.save_as_segy(OUT_FN)
+        traces = np.memmap(OUT_FN, dtype=segylib.trace_dtype(self.data.snum, sample_format='u4'),
+                           mode='r+', offset=3600)
+        traces['data'] = 0x41100000
+        traces['data'][0, 0] = 0xC276A000
+        del traces
+        binary = np.memmap(OUT_FN, dtype=segylib.binary_header_dtype(), mode='r+',
+                           offset=3200, shape=(1,))
+        binary['format'] = 1
+        del binary
+        data = load_segy(OUT_FN)
+        self.assertEqual(data.data[0, 0], -118.625)
+        self.assertTrue(np.all(data.data[1:, :] == 1.))
 
     def tearDown(self):
-        if os.path.exists(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy')):
-            os.remove(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200_resave.segy'))
+        if os.path.exists(OUT_FN):
+            os.remove(OUT_FN)
 
 
 if __name__ == '__main__':
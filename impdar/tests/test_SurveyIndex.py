@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the spatial index of many profiles
+"""
+
+import os
+import unittest
+import numpy as np
+from impdar.lib.NoInitRadarData import NoInitRadarData
+from impdar.lib.SurveyIndex import SurveyIndex
+from impdar.lib.ImpdarError import ImpdarError
+from impdar.lib.RadarFlags import RadarFlags
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+FNS = [os.path.join(THIS_DIR, 'input_data', 'survey_{:d}.mat'.format(i)) for i in range(3)]
+CROSS_FNS = [os.path.join(THIS_DIR, 'input_data', 'survey_cross_{:d}.mat'.format(i)) for i in range(2)]
+INDEX_FN = os.path.join(THIS_DIR, 'input_data', 'survey_index.npz')
+
+
+class TestSurveyIndex(unittest.TestCase):
+
+    def setUp(self):
+        # Three parallel lines, 10 m apart, with 1 m trace spacing
+        for i, fn in enumerate(FNS):
+            dat = NoInitRadarData(big=True)
+            dat.flags = RadarFlags()
+            dat.x_coord = np.arange(dat.tnum) * 1.
+            dat.y_coord = np.ones((dat.tnum,)) * i * 10.
+            dat.save(fn)
+
+    def tearDown(self):
+        for fn in FNS + CROSS_FNS + [INDEX_FN]:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_query(self):
+        index = SurveyIndex(decimate=3)
+        index.add_files(FNS)
+        self.assertEqual(len(index.fns), 3)
+        # 0, 3, ..., 18 and the last trace
+        self.assertEqual(np.sum(index.file_inds == 0), 8)
+
+        matches = index.query_point(5., 1., 2.)
+        self.assertEqual(len(matches), 1)
+        fn, tmin, tmax = matches[0]
+        self.assertEqual(fn, FNS[0])
+        self.assertTrue(tmin <= 3)
+        self.assertTrue(tmax >= 7)
+
+        matches = index.query_point(5., 5., 5.5)
+        self.assertEqual([match[0] for match in matches], FNS[:2])
+        self.assertEqual(index.query_point(100., 100., 1.), [])
+
+        matches = index.query_bbox(15., 5., 30., 25.)
+        self.assertEqual([match[0] for match in matches], FNS[1:])
+        for match in matches:
+            self.assertTrue(match[1] <= 15)
+            self.assertEqual(match[2], 19)
+
+    def test_save_load(self):
+        index = SurveyIndex()
+        index.add_files(FNS)
+        index.save(INDEX_FN)
+        index_loaded = SurveyIndex(INDEX_FN)
+        self.assertEqual(index_loaded.fns, FNS)
+        self.assertEqual(index_loaded.decimate, 10)
+        self.assertTrue(index_loaded.t_srs is None)
+        self.assertEqual(index.query_bbox(0., 0., 5., 5.),
+                         index_loaded.query_bbox(0., 0., 5., 5.))
+
+    def test_load_matches(self):
+        index = SurveyIndex(decimate=2)
+        index.add_files(FNS)
+        dats = index.load(index.query_point(10., 20., 1.))
+        self.assertEqual(len(dats), 1)
+        self.assertTrue(dats[0].tnum < 20)
+        self.assertTrue(np.min(dats[0].x_coord) <= 9.)
+        self.assertTrue(np.max(dats[0].x_coord) >= 11.)
+        self.assertTrue(np.all(dats[0].y_coord == 20.))
+
+    def test_crossovers(self):
+        # one line across all three, and one far away
+        for fn, x_coord, y_coord in ((CROSS_FNS[0], np.ones((20,)) * 5., np.arange(20) * 1.5 - 5.),
+                                     (CROSS_FNS[1], np.arange(20) + 100., np.ones((20,)) * 100.)):
+            dat = NoInitRadarData(big=True)
+            dat.flags = RadarFlags()
+            dat.x_coord = x_coord
+            dat.y_coord = y_coord
+            dat.save(fn)
+        index = SurveyIndex(decimate=3)
+        index.add_files(FNS + CROSS_FNS)
+        self.assertEqual(index.crossing_pairs(tol=1.), [(0, 3), (1, 3), (2, 3)])
+
+        crossovers = index.crossovers(tol=1.)
+        self.assertEqual(crossovers.fns, FNS + CROSS_FNS[:1])
+        self.assertEqual(len(crossovers.prof1), 3)
+        self.assertTrue(np.all(crossovers.prof2 == 3))
+        self.assertTrue(np.all(crossovers.tnum1 == 5))
+
+    def test_no_coords(self):
+        dat = NoInitRadarData(big=True)
+        index = SurveyIndex()
+        with self.assertRaises(ImpdarError):
+            index.add_data(dat)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the empirical attenuation calculations
+"""
+
+import unittest
+import numpy as np
+from impdar.lib.analysis import attenuation
+
+N_TRUE = 12.
+
+
+class Stub():
+    """Holds whatever attributes it is given, standing in for RadarData and Picks"""
+
+    def __init__(self, **kwargs):
+        for key, val in kwargs.items():
+            setattr(self, key, val)
+
+
+def synthetic_picks(tnum=1000, npicks=1, noise=0.5, seed=0):
+    """Picks with power that falls off at N_TRUE dB/km (one way) with depth"""
+    rng = np.random.RandomState(seed)
+    z = 1500. + 300. * np.sin(np.arange(tnum) / 100.)[None, :] + \
+        np.arange(npicks)[:, None] * 100.
+    power = -2. * N_TRUE * z / 1000. + rng.normal(0., noise, z.shape)
+    picks = Stub(z=z, corrected_power=10. ** (power / 10.))
+    return Stub(tnum=tnum, picks=picks)
+
+
+class TestAttenuation(unittest.TestCase):
+
+    def test_method3(self):
+        dat = synthetic_picks()
+        N, win = attenuation.attenuation_method3(dat, 0, win_init=100, win_step=100)
+        self.assertEqual(N.shape, (dat.tnum,))
+        self.assertTrue(np.all(N[:50] == 0.))
+        self.assertTrue(np.abs(np.nanmedian(N[50:-50]) - N_TRUE) <= 1.)
+        self.assertTrue(np.all(win[50:-50] >= 200))
+
+    def test_method2(self):
+        dat = synthetic_picks()
+        N, Nerr = attenuation.attenuation_method2(dat, 0)
+        self.assertTrue(np.abs(N - N_TRUE) < Nerr)
+        N_deming, _ = attenuation.attenuation_method2(synthetic_picks(), 0, sigPc=0.5, sigZ=5.)
+        self.assertTrue(np.abs(N_deming - N_TRUE) < 0.5)
+
+    def test_method5(self):
+        dat = synthetic_picks(npicks=8)
+        dat.picks.z[2, 100:200] = np.nan
+        N, Nerr = attenuation.attenuation_method5(dat, np.arange(8), win=11)
+        self.assertTrue(np.all(np.isnan(N[:5])))
+        self.assertTrue(np.abs(np.nanmedian(N) - N_TRUE) < 0.5)
+        self.assertTrue(np.all(Nerr[5:-5] > 0.))
+        # the depths are left alone
+        self.assertTrue(np.nanmax(dat.picks.z) > 10.)
+
+        # not enough picks
+        N, _ = attenuation.attenuation_method5(synthetic_picks(npicks=2), np.arange(2), win=1)
+        self.assertTrue(np.all(np.isnan(N)))
+
+    def test_method6(self):
+        att_ds = np.arange(1300., 2300., 100.)
+        N, Nerr = attenuation.attenuation_method6a(synthetic_picks(npicks=8), np.arange(8),
+                                                   att_ds, win=300.)
+        self.assertEqual(N.shape, att_ds.shape)
+        self.assertTrue(np.abs(np.nanmedian(N) - N_TRUE) < 0.5)
+        # nothing this deep
+        N, _ = attenuation.attenuation_method6a(synthetic_picks(npicks=8), np.arange(8),
+                                                np.array([5000.]), win=300.)
+        self.assertTrue(np.isnan(N[0]))
+
+        N, win = attenuation.attenuation_method6b(synthetic_picks(npicks=8), np.arange(8),
+                                                  att_ds, win_init=100., win_step=50.)
+        self.assertEqual(N.shape, att_ds.shape)
+        self.assertTrue(np.abs(np.nanmedian(N) - N_TRUE) <= 1.)
+        self.assertTrue(np.all(win >= 100.))
+
+    def test_window_moments(self):
+        rng = np.random.RandomState(1)
+        z = rng.normal(size=50)
+        pc = rng.normal(size=50)
+        csums = attenuation._cumulative_moments(z, pc)
+        n, mz, mp, szz, spp, szp = attenuation._window_moments(csums, np.array([3]), np.array([20]))
+        self.assertEqual(n[0], 17)
+        self.assertTrue(np.isclose(mz[0], np.mean(z[3:20])))
+        self.assertTrue(np.isclose(szz[0], np.sum((z[3:20] - np.mean(z[3:20])) ** 2.)))
+        self.assertTrue(np.isclose(spp[0], np.sum((pc[3:20] - np.mean(pc[3:20])) ** 2.)))
+        self.assertTrue(np.isclose(szp[0], np.sum((z[3:20] - np.mean(z[3:20])) *
+                                                  (pc[3:20] - np.mean(pc[3:20])))))
+
+
+if __name__ == '__main__':
+    unittest.main()
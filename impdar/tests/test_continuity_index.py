@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2019 dlilien <dlilien@berens>
+#
+# Distributed under terms of the GNU GPL3.0 license.
+
+"""
+Test the continuity index
+"""
+
+import unittest
+import numpy as np
+from impdar.lib.NoInitRadarData import NoInitRadarData
+from impdar.lib.Picks import Picks
+from impdar.lib.analysis.continuity_index import continuity_index
+
+
+def picked_data():
+    dat = NoInitRadarData(big=True)
+    dat.data = np.random.RandomState(0).normal(size=(100, dat.tnum)) + 0.1
+    dat.snum = 100
+    dat.picks = Picks(dat)
+    dat.picks.samp1 = np.vstack((np.zeros((dat.tnum,)), np.ones((dat.tnum,)) * 30.))
+    dat.picks.samp1[1, 3] = np.nan
+    dat.picks.samp1[1, 4] = 5.
+    return dat
+
+
+class TestContinuityIndex(unittest.TestCase):
+
+    def test_continuity_index(self):
+        dat = picked_data()
+        cont = continuity_index(dat, 1, s_ind=0)
+        self.assertTrue(cont is dat.continuity_index)
+        self.assertEqual(cont.shape, (dat.tnum,))
+        # unpicked, or too short
+        self.assertTrue(np.isnan(cont[3]))
+        self.assertTrue(np.isnan(cont[4]))
+        P = 10. * np.log10(dat.data[:30, 0] ** 2.)
+        self.assertTrue(np.isclose(cont[0], np.mean(np.abs(np.gradient(P)))))
+
+        cont = continuity_index(dat, 1, cutoff_ratio=0.2)
+        self.assertTrue(np.isclose(cont[0], np.mean(np.abs(np.gradient(P[6:-6])))))
+
+        # a zero makes the trace infinite
+        dat.data[10, 0] = 0.
+        self.assertTrue(np.isnan(continuity_index(dat, 1)[0]))
+
+    def test_batch(self):
+        dats = [picked_data(), picked_data()]
+        conts = continuity_index(dats, 1)
+        self.assertEqual(len(conts), 2)
+        for dat, cont in zip(dats, conts):
+            self.assertTrue(dat.continuity_index is cont)
+
+
+if __name__ == '__main__':
+    unittest.main()
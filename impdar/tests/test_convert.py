@@ -12,8 +12,8 @@ Test converting between filetypes
 import os
 import unittest
 from impdar.lib import convert
+from impdar.lib.load import load_segy
 from impdar.lib.RadarData._RadarDataSaving import CONVERSIONS_ENABLED
-from impdar.lib.load.load_segy import SEGY
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -31,6 +31,15 @@ class TestConvert(unittest.TestCase):
         convert.convert([os.path.join(THIS_DIR, 'input_data', 'test_gssi.DZT')], 'shp')
         self.assertTrue(os.path.exists(os.path.join(THIS_DIR, 'input_data', 'test_gssi.shp')))
 
+    @unittest.skipIf(not CONVERSIONS_ENABLED, 'No GDAL on this version')
+    def test_survey2shp(self):
+        survey_fn = os.path.join(THIS_DIR, 'input_data', 'survey.gpkg')
+        convert.convert([os.path.join(THIS_DIR, 'input_data', 'small_data.mat'),
+                         os.path.join(THIS_DIR, 'input_data', 'test_gssi.DZT')], 'shp',
+                        survey_fn=survey_fn)
+        self.assertTrue(os.path.exists(survey_fn))
+        os.remove(survey_fn)
+
     @unittest.skipIf(not CONVERSIONS_ENABLED, 'No GDAL on this version')
     def test_knownload2shp(self):
         convert.convert(os.path.join(THIS_DIR, 'input_data', 'small_data.mat'), 'shp', in_fmt='mat')
@@ -50,20 +59,12 @@ class TestConvert(unittest.TestCase):
         convert.convert([os.path.join(THIS_DIR, 'input_data', 'test_gssi.DZT')], 'mat', in_fmt='gssi')
         self.assertTrue(os.path.exists(os.path.join(THIS_DIR, 'input_data', 'test_gssi.mat')))
 
-    @unittest.skipIf(SEGY, 'SEGY enabled, this is a failure test')
-    def test_nosegy(self):
-        with self.assertRaises(ImportError):
-            convert.convert([os.path.join(THIS_DIR, 'input_data', 'test_pe.DT1')], 'mat', in_fmt='segy')
-
-        with self.assertRaises(ImportError):
-            convert.convert([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], 'sgy', in_fmt='mat')
-
-    @unittest.skipIf(not SEGY, 'SEGY needed for this test')
     def test_segy_save(self):
         convert.convert(os.path.join(THIS_DIR, 'input_data', 'small_data.mat'), 'sgy', in_fmt='mat')
         self.assertTrue(os.path.exists(os.path.join(THIS_DIR, 'input_data', 'small_data.sgy')))
 
-        convert.convert(os.path.join(THIS_DIR, 'input_data', 'shots0001_0200.segy'), 'mat', in_fmt='segy')
+        data = load_segy.load_segy(os.path.join(THIS_DIR, 'input_data', 'small_data.sgy'))
+        self.assertEqual(data.data.shape, (20, 40))
 
     def test_badinsout(self):
         with self.assertRaises(ValueError):
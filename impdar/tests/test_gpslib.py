@@ -22,6 +22,19 @@ else:
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+def shifted_gps():
+    """GPS with a known shift relative to two radar profiles"""
+    gps_decday = np.linspace(0., 1., 2001)
+    gps_lon = 40. + np.sin(gps_decday * 20.) + gps_decday
+    gps_lat = np.ones_like(gps_decday) * 70.
+    dats = [NoInitRadarData(big=True), NoInitRadarData(big=True)]
+    for dat, start in zip(dats, [0.3, 0.5]):
+        dat.decday = np.linspace(start, start + 0.2, dat.tnum)
+        dat.long = np.interp(dat.decday, gps_decday + 0.02, gps_lon)
+        dat.lat = np.ones_like(dat.decday) * 70.
+    return gps_decday, gps_lon, gps_lat, dats
+
+
 class TestGPS(unittest.TestCase):
 
     @patch('impdar.lib.gpslib.kinematic_gps_control')
@@ -94,6 +107,94 @@ class TestGPS(unittest.TestCase):
         with self.assertRaises(ValueError):
             gpslib.kinematic_gps_mat(dats, os.path.join(THIS_DIR, 'input_data', 'gps_control_badfields.mat'), extrapolate=False)
 
+    def test_guess_offset(self):
+        gps_decday, gps_lon, gps_lat, dats = shifted_gps()
+        offset = gpslib._guess_offset(dats[0].decday, dats[0].long, gps_decday, gps_lon)
+        self.assertTrue(np.abs(offset - 0.02) < 1.0e-3)
+        # coarse to fine finds the same candidate as trying them all
+        self.assertEqual(offset, gpslib._guess_offset(dats[0].decday, dats[0].long, gps_decday,
+                                                      gps_lon, coarse_step=1))
+
+    @unittest.skipIf(sys.version_info[0] < 3, 'No process pools on 2')
+    def test_guess_offset_jobs(self):
+        # should get the same thing in parallel
+        gps_decday, gps_lon, gps_lat, dats = shifted_gps()
+        offsets = [gpslib._guess_offset(dat.decday, dat.long, gps_decday, gps_lon) for dat in dats]
+        gpslib.kinematic_gps_control(dats, gps_lat, gps_lon, gps_lat, gps_decday, guess_offset=True, jobs=2)
+        for dat, offset in zip(dats, offsets):
+            self.assertTrue(np.allclose(dat.long, np.interp(dat.decday, gps_decday + offset, gps_lon)))
+
+    @patch('impdar.lib.gpslib.kinematic_gps_csv')
+    def test_interp_jobs(self, mock_kgc):
+        dats = [NoInitRadarData(big=True)]
+        gpslib.interp(dats, fn='dummy.csv', guess_offset=True, jobs=2)
+        self.assertEqual(mock_kgc.call_args[1]['jobs'], 2)
+        self.assertTrue(mock_kgc.call_args[1]['guess_offset'])
+
+    def test_interp_linear(self):
+        xp = np.arange(5.)
+        fp = xp * 2.
+        x = np.array([[-1., 0.5], [3.5, 5.]])
+        self.assertTrue(np.all(np.isnan(gpslib._interp_linear(x, xp, fp)[[0, 1], [0, 1]])))
+        self.assertTrue(np.allclose(gpslib._interp_linear(x, xp, fp, extrapolate=True), x * 2.))
+
+    def test_kinematic_gps_csv_chunked(self):
+        dat = NoInitRadarData(big=True)
+        dat.decday = np.linspace(5.5, 8.5, dat.tnum)
+        windows = gpslib._gps_windows([dat])
+        for chunk_lines in [1, 3, 100]:
+            data = gpslib._read_csv_windowed(os.path.join(THIS_DIR, 'input_data', 'gps_control.csv'),
+                                             windows, chunk_lines=chunk_lines,
+                                             names='decday,long,lat,elev')
+            # we need the epochs on each side to interpolate
+            self.assertTrue(np.allclose(data['decday'], np.arange(5, 10)))
+
+        # two separate windows, with names in the file
+        fn = os.path.join(THIS_DIR, 'input_data', 'gps_named.csv')
+        with open(fn, 'w') as fout:
+            fout.write('# decday, long, lat, elev\n')
+            for i in range(20):
+                fout.write('{:d}, {:d}, {:f}, {:d}\n'.format(i, i * 10, i * 0.1, i * 100))
+        try:
+            data = gpslib._read_csv_windowed(fn, np.array([[12.5, 13.5], [2., 2.5]]),
+                                             chunk_lines=4, names=True, delimiter=',')
+            self.assertTrue(np.allclose(data['decday'], [1, 2, 3, 12, 13, 14]))
+            # a window between epochs still needs the epochs on either side
+            data = gpslib._read_csv_windowed(fn, np.array([[12.2, 12.4]]),
+                                             chunk_lines=3, names=True, delimiter=',')
+            self.assertTrue(np.allclose(data['decday'], [12, 13]))
+            with self.assertRaises(ValueError):
+                gpslib._read_csv_windowed(fn, np.array([[50., 60.]]), names=True, delimiter=',')
+        finally:
+            os.remove(fn)
+
+        # and this should be the same as reading everything
+        dats = [NoInitRadarData(big=True), NoInitRadarData(big=True)]
+        for dat in dats:
+            dat.decday = np.linspace(5.5, 8.5, dat.tnum)
+        gpslib.kinematic_gps_csv(dats[0], os.path.join(THIS_DIR, 'input_data', 'gps_control.csv'))
+        gpslib.kinematic_gps_csv(dats[1], os.path.join(THIS_DIR, 'input_data', 'gps_control.csv'), chunk_lines=2)
+        self.assertTrue(np.allclose(dats[0].lat, dats[1].lat))
+        self.assertTrue(np.allclose(dats[0].long, dats[1].long))
+
+    @unittest.skipIf(not gpslib.H5, 'No h5py')
+    def test_kinematic_gps_mat73(self):
+        import h5py
+        fn = os.path.join(THIS_DIR, 'input_data', 'gps_control_73.mat')
+        with h5py.File(fn, 'w', userblock_size=512) as fout:
+            for i, name in enumerate(['decday', 'long', 'lat', 'elev']):
+                fout[name] = (np.arange(20.) * [1., 10., 0.1, 100.][i])[None, :]
+        with open(fn, 'r+b') as fout:
+            fout.write(b'MATLAB 7.3 MAT-file'.ljust(116) + b'\x00' * 8 + b'\x00\x02IM')
+        try:
+            dat = NoInitRadarData(big=True)
+            dat.decday = np.linspace(5.5, 8.5, dat.tnum)
+            gpslib.kinematic_gps_mat(dat, fn, chunk_lines=3)
+            self.assertTrue(np.allclose(dat.lat, dat.decday * 0.1))
+            self.assertTrue(np.allclose(dat.elev, dat.decday * 100.))
+        finally:
+            os.remove(fn)
+
     @patch('impdar.lib.gpslib.kinematic_gps_mat')
     @patch('impdar.lib.gpslib.kinematic_gps_csv')
     def test_interp(self, mock_kgc, mock_kgm):
@@ -127,6 +228,38 @@ class TestGPS(unittest.TestCase):
         proj_pts = conv_sps(pts)
         self.assertTrue(np.all(~np.isnan(proj_pts)))
 
+    @unittest.skipIf(not gpslib.conversions_enabled, 'No gdal')
+    def test_conversions_cached(self):
+        # Same zone and hemisphere should reuse the transform
+        conv_utm, wkt = gpslib.get_utm_conversion(-8.0, 10.0)
+        conv_utm_2, wkt_2 = gpslib.get_utm_conversion(-8.5, 10.5)
+        self.assertIs(conv_utm, conv_utm_2)
+        self.assertEqual(wkt, wkt_2)
+        # WKT1, which old osr can parse
+        self.assertTrue(wkt.startswith('PROJCS'))
+        conv_utm_3, _ = gpslib.get_utm_conversion(8.0, 10.0)
+        self.assertIsNot(conv_utm, conv_utm_3)
+
+        conv_sps, _ = gpslib.get_conversion(t_srs='EPSG:3031')
+        conv_sps_2, _ = gpslib.get_conversion(t_srs='EPSG:3031')
+        self.assertIs(conv_sps, conv_sps_2)
+
+        # the fallback for python 2 memoizes too
+        calls = []
+
+        @gpslib._dict_cache(maxsize=2)
+        def memoized(arg):
+            calls.append(arg)
+            return [arg]
+        self.assertIs(memoized(1), memoized(1))
+        self.assertEqual(calls, [1])
+
+        # and whole arrays should come back in one go
+        pts = np.array([[-88., -80.], [-89., -81.], [-89.1, -82.]])
+        proj_pts = np.array(conv_sps(pts))
+        self.assertEqual(proj_pts.shape[0], 3)
+        self.assertTrue(np.all(~np.isnan(proj_pts[:, :2])))
+
     @unittest.skipIf(gpslib.conversions_enabled, 'GDAL found, this is a failure test')
     def test_conversions_off(self):
         # we want to be able to import gpslib but later fail
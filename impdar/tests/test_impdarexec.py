@@ -64,6 +64,13 @@ class TestMain(unittest.TestCase):
         aca, kwca = convert_patch.call_args
         self.assertEqual(kwca['fns_in'], ['fn.mat'])
         self.assertEqual(kwca['out_fmt'], 'shp')
+        self.assertIsNone(kwca['survey_fn'])
+
+        impdarexec.sys.argv = ['dummy', 'convert', 'fn.mat', 'fn2.mat', 'shp', '-survey_fn', 'survey.gpkg']
+        impdarexec.main()
+        aca, kwca = convert_patch.call_args
+        self.assertEqual(kwca['fns_in'], ['fn.mat', 'fn2.mat'])
+        self.assertEqual(kwca['survey_fn'], 'survey.gpkg')
 
         argparse_mock = MagicMock()
         with patch('argparse.ArgumentParser._print_message', argparse_mock):
@@ -9,13 +9,15 @@
 """
 Test the machinery of imppick.
 """
+import os
 import sys
 import unittest
-try:
-    from impdar.bin import imppick
-    QT = True
-except ImportError:
-    QT = False
+import numpy as np
+from impdar.bin import imppick
+from impdar.lib.RadarData import RadarData
+QT = imppick.QT
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
 if sys.version_info[0] >= 3:
     from unittest.mock import patch, MagicMock
@@ -116,5 +118,20 @@ class TestMain(unittest.TestCase):
         pick_patch.assert_called_with(load_patch.return_value[0], xdat='dist', ydat='twtt')
 
 
+    def test_auto(self):
+        fn = os.path.join(THIS_DIR, 'input_data', 'small_data.mat')
+        seed_fn = os.path.join(THIS_DIR, 'input_data', 'auto_seeds.csv')
+        out_fn = os.path.join(THIS_DIR, 'input_data', 'small_data_pick.mat')
+        with open(seed_fn, 'w') as fout:
+            fout.write('pick,tnum,snum\n1,0,10\n1,2,12\n')
+        imppick.sys.argv = ['dummy', fn, '--auto', seed_fn, '--no_extend', '-freq', '500']
+        imppick.main()
+        dat = RadarData(out_fn)
+        self.assertEqual(dat.picks.picknums, [1])
+        self.assertFalse(np.any(np.isnan(dat.picks.samp2[0, :3])))
+        os.remove(seed_fn)
+        os.remove(out_fn)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -66,6 +66,13 @@ class TestMain(unittest.TestCase):
         if 'tr' in kwca:
             self.assertIsNone(kwca['tr'])
 
+        impplot.sys.argv = ['dummy', 'rg', 'fn', 'fn2', '-s', '--jobs', '2']
+        impplot.main()
+        aca, kwca = plot_patch.call_args
+        self.assertEqual(aca[0], ['fn', 'fn2'])
+        self.assertTrue(kwca['s'])
+        self.assertEqual(kwca['jobs'], 2)
+
     @patch('impdar.bin.impplot.plot.plot')
     def test_power(self, plot_patch):
         impplot.sys.argv = ['dummy', 'power', 'fn', '16']
@@ -278,6 +278,18 @@ class TestInputs(unittest.TestCase):
         self.assertEqual(kwca['spacing'], spacing)
         self.assertEqual(kwca['extrapolate'], True)
 
+    @patch('impdar.bin.impproc.geolocate')
+    @patch('impdar.bin.impproc.load')
+    def test_geolocate(self, load_patch, geolocate_patch):
+        load_patch.return_value = [MagicMock(), MagicMock()]
+        impproc.sys.argv = ['dummy', 'geolocate', 'gps.csv', 'dummy.mat', 'dummy2.mat', '--guess', '--jobs', '2']
+        impproc.main()
+        aca, kwca = geolocate_patch.call_args
+        self.assertEqual(aca[0], load_patch.return_value)
+        self.assertEqual(kwca['gps_fn'], 'gps.csv')
+        self.assertTrue(kwca['guess'])
+        self.assertEqual(kwca['jobs'], 2)
+
     @patch('impdar.bin.impproc.concat')
     @patch('impdar.bin.impproc.load')
     def test_cat(self, load_patch, cat_patch):
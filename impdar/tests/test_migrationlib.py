@@ -27,7 +27,6 @@ try:
     CYTHON = True
 except ImportError:
     CYTHON = False
-from impdar.lib.load import load_segy
 from impdar.lib.NoInitRadarData import NoInitRadarData
 
 
@@ -128,7 +127,7 @@ class TestMigration(unittest.TestCase):
         data = NoInitRadarData(big=True)
         data = mig_python.migrationPhaseShift(data, vel_fn=os.path.join(THIS_DIR, 'input_data', 'velocity_lateral.txt'))
 
-    @unittest.skipIf(sp.Popen(['which', 'sumigtk']).wait() != 0 or (not load_segy.SEGY) or (sys.version_info[0] < 3), 'SeisUnix not found')
+    @unittest.skipIf(sp.Popen(['which', 'sumigtk']).wait() != 0 or (sys.version_info[0] < 3), 'SeisUnix not found')
     def test_sumigtk(self):
         data = NoInitRadarData(big=True)
         data.dt = 1.0e-9
@@ -136,22 +135,29 @@ class TestMigration(unittest.TestCase):
         data.fn = os.path.join(THIS_DIR, 'input_data', 'rectangle_sumigtk.mat')
         migrationlib.migrationSeisUnix(data, quiet=True)
 
-    @unittest.skipIf(sp.Popen(['which', 'sumigtk']).wait() != 0 or (not load_segy.SEGY) or (sys.version_info[0] < 3), 'SeisUnix not found')
-    def test_sustolt(self):
+    @unittest.skipIf(sp.Popen(['which', 'sumigtk']).wait() != 0 or (sys.version_info[0] < 3), 'SeisUnix not found')
+    def test_sumigtk_nopipe(self):
         data = NoInitRadarData(big=True)
         data.dt = 1.0e-9
         data.travel_time = data.travel_time * 1.0e-9
-        data.fn = os.path.join(THIS_DIR, 'input_data', 'rectangle_sustolt.mat')
-        migrationlib.migrationSeisUnix(data, quiet=True)
+        data.fn = os.path.join(THIS_DIR, 'input_data', 'rectangle_sumigtk.mat')
+        data_pipe = migrationlib.migrationSeisUnix(data, quiet=True)
+        data = NoInitRadarData(big=True)
+        data.dt = 1.0e-9
+        data.travel_time = data.travel_time * 1.0e-9
+        data.fn = os.path.join(THIS_DIR, 'input_data', 'rectangle_sumigtk.mat')
+        data_files = migrationlib.migrationSeisUnix(data, quiet=True, pipe=False)
+        self.assertTrue(np.allclose(data_pipe.data, data_files.data))
+        # Nothing should be left next to the input
+        self.assertFalse(os.path.exists(os.path.join(THIS_DIR, 'input_data', 'rectangle_sumigtk.sgy')))
 
-    @unittest.skipIf(sp.Popen(['which', 'sustolt']).wait() != 0 or load_segy.SEGY, 'Test of edge case')
-    def test_sustolt_nosegy(self):
+    @unittest.skipIf(sp.Popen(['which', 'sumigtk']).wait() != 0 or (sys.version_info[0] < 3), 'SeisUnix not found')
+    def test_sustolt(self):
         data = NoInitRadarData(big=True)
         data.dt = 1.0e-9
         data.travel_time = data.travel_time * 1.0e-9
         data.fn = os.path.join(THIS_DIR, 'input_data', 'rectangle_sustolt.mat')
-        with self.assertRaises(ImportError):
-            migrationlib.migrationSeisUnix(data)
+        migrationlib.migrationSeisUnix(data, quiet=True)
 
     @unittest.skipIf(sp.Popen(['which', 'sustolt']).wait() == 0, 'Test for no SeisUnix')
     def test_sustolt_seisunix(self):
@@ -17,6 +17,7 @@ import os
 import unittest
 import numpy as np
 from impdar.lib import load
+from impdar.lib.NoInitRadarData import NoInitRadarData
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -29,10 +30,17 @@ class TestLoadNoSEGY(unittest.TestCase):
         data = load.load('mat', os.path.join(THIS_DIR, 'input_data', 'small_data.mat'))
         self.assertEqual(data[0].data.shape, (20, 40))
 
-    def test_segyimporterror(self):
-        # Fail if use segy
-        with self.assertRaises(ImportError):
-            data = load.load('segy', os.path.join(THIS_DIR, 'input_data', 'small_data.segy'))
+    def test_segy(self):
+        # SEGY should work without segyio
+        data = NoInitRadarData(big=True)
+        data.dt = 1.0e-9
+        data.save_as_segy(os.path.join(THIS_DIR, 'input_data', 'nosegyio.segy'))
+        data_segy = load.load('segy', os.path.join(THIS_DIR, 'input_data', 'nosegyio.segy'))
+        self.assertEqual(data_segy[0].data.shape, (10, 20))
+
+    def tearDown(self):
+        if os.path.exists(os.path.join(THIS_DIR, 'input_data', 'nosegyio.segy')):
+            os.remove(os.path.join(THIS_DIR, 'input_data', 'nosegyio.segy'))
 
 
 if __name__ == '__main__':
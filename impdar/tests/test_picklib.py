@@ -11,6 +11,7 @@ Test the methods on the Pick object
 """
 
 import os
+import sys
 import unittest
 import numpy as np
 from impdar.lib.NoInitRadarData import NoInitRadarData
@@ -30,6 +31,18 @@ class BareRadarData(NoInitRadarData):
         self.picks = Picks.Picks(self)
 
 
+def layer_dats():
+    """Two profiles with the same bright, stepped layer"""
+    layer = (100 + np.arange(traces.shape[1]) // 10).astype(int)
+    dats = [BareRadarData() for i in range(2)]
+    for dat in dats:
+        dat.data = np.zeros_like(traces)
+        dat.data[layer, np.arange(traces.shape[1])] = 100.
+        dat.snum, dat.tnum = traces.shape
+        dat.picks.pickparams.freq_update(1.0)
+    return layer, dats
+
+
 class TestPickLib(unittest.TestCase):
 
     def test_midpoint(self):
@@ -115,6 +128,96 @@ class TestPickLib(unittest.TestCase):
         self.assertTrue(np.all(picks[0, :] == 95))
         self.assertTrue(np.all(picks[1, :] == 101))
 
+    def test_packet_pick_batch(self):
+        data = BareRadarData()
+        data.picks.pickparams.freq_update(1.0)
+        midpoints = np.random.randint(0, traces.shape[0], traces.shape[1])
+        # keep away from the edges, which get handed to packet_pick anyway
+        midpoints = np.clip(midpoints, 20, traces.shape[0] - 20).astype(float)
+        for pol in [1, -1]:
+            data.picks.pickparams.pol = pol
+            picks = picklib.packet_pick_batch(traces, data.picks.pickparams, midpoints)
+            for i in range(traces.shape[1]):
+                pickout = picklib.packet_pick(traces[:, i], data.picks.pickparams, midpoints[i])
+                self.assertTrue(np.allclose(picks[:3, i], pickout[:3]))
+                self.assertTrue(np.isnan(picks[3, i]))
+                self.assertTrue(np.isclose(picks[4, i], pickout[4]))
+
+        # traces hanging off the edge should behave like packet_pick
+        midpoints[0] = 0
+        with self.assertRaises(ValueError):
+            picklib.packet_pick_batch(traces, data.picks.pickparams, midpoints)
+
+        # make sure we are consistent with the single version for nans and edges
+        nan_traces = traces.copy()
+        nan_traces[95:105, 1] = np.nan
+        midpoints[0] = 100
+        picks = picklib.packet_pick_batch(nan_traces, data.picks.pickparams, midpoints)
+        pickout = picklib.packet_pick(nan_traces[:, 1], data.picks.pickparams, midpoints[1])
+        self.assertTrue(np.allclose(picks[:, 1], pickout, equal_nan=True))
+
+    def test_track_layer(self):
+        data = BareRadarData()
+        data.picks.pickparams.freq_update(1.0)
+        layer = (100 + np.arange(traces.shape[1]) // 10).astype(int)
+        layer_traces = np.zeros_like(traces)
+        layer_traces[layer, np.arange(traces.shape[1])] = 100.
+        layer_traces[layer - 5, np.arange(traces.shape[1])] = -100.
+        layer_traces[layer + 5, np.arange(traces.shape[1])] = -100.
+
+        picks = picklib.track_layer(layer_traces, [[150, layer[150]], [50, layer[50]]],
+                                    data.picks.pickparams)
+        self.assertEqual(picks.shape, (5, traces.shape[1]))
+        self.assertTrue(np.all(picks[1, :] == layer))
+        self.assertTrue(np.all(picks[0, :] == layer - 5))
+
+        picks = picklib.track_layer(layer_traces, [[50, layer[50]], [150, layer[150]]],
+                                    data.picks.pickparams, extend=False)
+        self.assertTrue(np.all(np.isnan(picks[:, :50])))
+        self.assertTrue(np.all(np.isnan(picks[:, 151:])))
+        self.assertTrue(np.all(picks[1, 50:151] == layer[50:151]))
+
+        with self.assertRaises(ValueError):
+            picklib.track_layer(layer_traces, [[traces.shape[1], 100]], data.picks.pickparams)
+
+    def test_auto_pick(self):
+        layer, dats = layer_dats()
+        picklib.auto_pick(dats, {3: np.array([[50, layer[50]]]),
+                                 5: np.array([[10, layer[10] + 50], [190, layer[190] + 50]])})
+        for dat in dats:
+            self.assertEqual(dat.picks.picknums, [3, 5])
+            self.assertTrue(np.all(dat.picks.samp2[0, :] == layer))
+            self.assertEqual(dat.picks.lasttrace.tnum[0], traces.shape[1] - 1)
+
+        # existing picks are overwritten
+        picklib.auto_pick(dats, {3: np.array([[50, layer[50] + 20]])})
+        for dat in dats:
+            self.assertEqual(dat.picks.picknums, [3, 5])
+            self.assertNotEqual(dat.picks.samp2[0, 50], layer[50])
+
+        with self.assertRaises(ValueError):
+            picklib.auto_pick(dats, [{}])
+
+    @unittest.skipIf(sys.version_info[0] < 3, 'No process pools on 2')
+    def test_auto_pick_jobs(self):
+        layer, dats = layer_dats()
+        seeds = {3: np.array([[50, layer[50]]])}
+        picklib.auto_pick(dats, seeds, jobs=2)
+        serial = layer_dats()[1]
+        picklib.auto_pick(serial, seeds)
+        for dat, dat_serial in zip(dats, serial):
+            self.assertTrue(np.allclose(dat.picks.samp2, dat_serial.picks.samp2, equal_nan=True))
+
+    def test_load_seeds(self):
+        fn = os.path.join(THIS_DIR, 'input_data', 'seeds.csv')
+        with open(fn, 'w') as fout:
+            fout.write('pick,tnum,snum,fn\n1,0,100,\n1,50,110,\n2,10,200,a/test.mat\n')
+        seeds = picklib.load_seeds(fn)
+        os.remove(fn)
+        self.assertEqual(set(seeds.keys()), {None, 'test.mat'})
+        self.assertTrue(np.all(seeds[None][1] == [[0, 100], [50, 110]]))
+        self.assertTrue(np.all(seeds['test.mat'][2] == [[10, 200]]))
+
     def test_intersection(self):
         thisdata = RadarData.RadarData(os.path.join(THIS_DIR, 'input_data', 'along_picked.mat'))
         thatdata = RadarData.RadarData(os.path.join(THIS_DIR, 'input_data', 'cross_picked.mat'))
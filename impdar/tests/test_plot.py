@@ -11,6 +11,7 @@ Test the machinery of plotting. We will not try the "show" lines.
 """
 import sys
 import os
+import shutil
 import unittest
 import numpy as np
 from impdar.lib.RadarData import RadarData
@@ -51,21 +52,21 @@ class TestPlot(unittest.TestCase):
     @patch('impdar.lib.plot.plot_radargram', returns=[DummyFig(), None])
     def test_plotPLOTARGS(self, mock_plot_rad, mock_show):
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')])
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
         mock_plot_rad.reset_called()
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], xd=True)
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
         mock_plot_rad.reset_called()
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], yd=True)
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
         mock_plot_rad.reset_called()
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], xd=True, yd=True)
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
         mock_plot_rad.reset_called()
 
         # Check that we can save
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], xd=True, yd=True, s=True)
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='dist', ydat='depth', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=300)
         mock_plot_rad.reset_called()
 
     @patch('impdar.lib.plot.plt.show')
@@ -78,7 +79,7 @@ class TestPlot(unittest.TestCase):
     @patch('impdar.lib.plot.plot_spectrogram', returns=[DummyFig(), None])
     def test_plotPLOTSPECDENSE(self, mock_plot_specdense, mock_show):
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'small_data.mat')], spectra=(0, 1), window=0, scaling=1)
-        mock_plot_specdense.assert_called_with(Any(RadarData), (0, 1), window=0, scaling=1)
+        mock_plot_specdense.assert_called_with(Any(RadarData), (0, 1), window=0, scaling=1, dpi=None)
 
     @patch('impdar.lib.plot.plt.show')
     @patch('impdar.lib.plot.plot_ft', returns=[DummyFig(), None])
@@ -102,14 +103,40 @@ class TestPlot(unittest.TestCase):
     @patch('impdar.lib.plot.plot_radargram', returns=[DummyFig(), None])
     def test_plotLOADGSSI(self, mock_plot_rad, mock_show):
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'test_gssi.DZT')], filetype='gssi')
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
 
     @patch('impdar.lib.plot.plt.show')
     @patch('impdar.lib.plot.plot_radargram', returns=[DummyFig(), None])
     def test_plotLOADPE(self, mock_plot_rad, mock_show):
         plot.plot([os.path.join(THIS_DIR, 'input_data', 'test_pe.DT1')], filetype='pe')
-        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None)
-
+        mock_plot_rad.assert_called_with(Any(RadarData), xdat='tnum', ydat='twtt', x_range=None, pick_colors=None, clims=None, cmap=Any(object), flatten_layer=None, dpi=None)
+
+
+    def test_plotSAVE(self):
+        fns = [os.path.join(THIS_DIR, 'input_data', 'small_data_{:d}.mat'.format(i)) for i in range(3)]
+        for fn in fns:
+            shutil.copyfile(os.path.join(THIS_DIR, 'input_data', 'small_data.mat'), fn)
+        # figures are closed as soon as they are saved
+        backend = plt.get_backend()
+        plot.plot(fns, s=True, ftype='png', dpi=50)
+        self.assertEqual(len(plt.get_fignums()), 0)
+        self.assertEqual(plt.get_backend(), backend)
+        for fn in fns:
+            self.assertTrue(os.path.exists(fn[:-4] + '.png'))
+            os.remove(fn[:-4] + '.png')
+            os.remove(fn)
+            self.assertFalse(os.path.exists(fn[:-4] + '_pyramid.npz'))
+
+    @unittest.skipIf(sys.version_info[0] < 3, 'No process pools on 2')
+    def test_plotSAVE_jobs(self):
+        fns = [os.path.join(THIS_DIR, 'input_data', 'small_data_{:d}.mat'.format(i)) for i in range(3)]
+        for fn in fns:
+            shutil.copyfile(os.path.join(THIS_DIR, 'input_data', 'small_data.mat'), fn)
+        plot.plot(fns, s=True, jobs=2, ftype='png', dpi=50)
+        for fn in fns:
+            self.assertTrue(os.path.exists(fn[:-4] + '.png'))
+            os.remove(fn[:-4] + '.png')
+            os.remove(fn)
 
     def test_plotBADINPUT(self):
         with self.assertRaises(ValueError):
@@ -269,6 +296,33 @@ class TestPlotRadargram(unittest.TestCase):
         with self.assertRaises(ValueError):
             fig, ax = plot.plot_radargram(dat, flatten_layer=1)
 
+    def test_get_display_data(self):
+        dat = NoInitRadarData(big=True)
+        # big enough to be shifted in more than one block
+        dat.data = np.random.RandomState(0).normal(size=(600, 2000))
+        dat.snum, dat.tnum = dat.data.shape
+        dat.picks = Picks(dat)
+        dat.picks.add_pick(10)
+        dat.picks.samp2[0, :] = np.random.RandomState(1).randint(100, 500, dat.tnum)
+        dat.picks.samp2[0, 5] = np.nan
+
+        expected = np.zeros_like(dat.data) * np.nan
+        offset = plot.get_offset(dat, 10)[0]
+        for j in range(dat.tnum):
+            shift = dat.snum if np.isnan(offset[j]) else int(offset[j])
+            if shift >= dat.snum:
+                continue
+            elif shift >= 0:
+                expected[shift:, j] = dat.data[:dat.snum - shift, j]
+            else:
+                expected[:dat.snum + shift, j] = dat.data[-shift:, j]
+        self.assertTrue(np.allclose(plot.get_display_data(dat, flatten_layer=10), expected,
+                                    equal_nan=True))
+        self.assertTrue(np.allclose(plot.get_display_data(dat, flatten_layer=10,
+                                                          x_range=(1000, 1500)),
+                                    expected[:, 1000:1500], equal_nan=True))
+        self.assertTrue(np.allclose(plot.get_display_data(dat), dat.data))
+
     def tearDown(self):
         plt.close('all')
 
@@ -379,6 +433,31 @@ class TestPlotSpectral(unittest.TestCase):
         with self.assertRaises(ValueError):
             plot.plot_spectrogram(dat, (0.,5), window='dummy')
 
+        # lots of traces get decimated
+        dat.data = np.random.random((dat.snum, 10000))
+        dat.trace_num = np.arange(10000) + 1
+        fig, ax = plot.plot_spectrogram(dat, (0., 5.0))
+        self.assertTrue(ax.collections[0].get_array().shape[1] < 10000)
+
+    def test_cell_edges(self):
+        self.assertTrue(np.allclose(plot._cell_edges([1., 2., 4.]), [0.5, 1.5, 3., 5.]))
+        self.assertTrue(np.allclose(plot._cell_edges([3.]), [2.5, 3.5]))
+
+    def test_spectral_power(self):
+        dat = NoInitRadarData(big=True)
+        freq, power, tnums = plot.spectral_power(dat, window='hamming')
+        self.assertEqual(power.shape, (len(freq), dat.data.shape[1]))
+        self.assertTrue(np.all(tnums == np.arange(dat.data.shape[1])))
+        for i in range(dat.data.shape[1]):
+            self.assertTrue(np.allclose(power[:, i], plot.signal.periodogram(
+                dat.data[:, i], fs=1. / dat.dt, window='hamming', scaling='spectrum')[1]))
+
+        freq, power32, tnums = plot.spectral_power(dat, window='hamming', trace_step=2,
+                                                   single_precision=True)
+        self.assertEqual(power32.dtype, np.float32)
+        self.assertTrue(np.all(tnums == np.arange(0, dat.data.shape[1], 2)))
+        self.assertTrue(np.allclose(power32, power[:, ::2], rtol=1.0e-4))
+
 
     @unittest.skipIf(sys.version_info[0] < 3, 'Att error on 2')
     def test_failure_3(self):